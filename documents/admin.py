@@ -1,6 +1,12 @@
 from django.contrib import admin
+from django.db import transaction
 
-from documents.models import Client, Document, ClientDocumentPriority
+from documents import counters
+from documents.models import (
+    AnalysisCache, Client, Document, DocumentChange, ClientDocumentPriority, PriorityCounter, RefreshJob,
+    SummaryCache,
+)
+from documents.services import assign_documents
 
 
 class ClientDocumentPriorityInline(admin.TabularInline):
@@ -12,17 +18,102 @@ class ClientDocumentPriorityInline(admin.TabularInline):
 class ClientAdmin(admin.ModelAdmin):
     list_display = ['name', 'customer']
     inlines = [ClientDocumentPriorityInline]
+    readonly_fields = ['document_count']
+
+    def save_model(self, request, obj, form, change):
+        """
+        Moving a client to another customer moves its priority counters.
+        """
+        if not (change and 'customer' in form.changed_data):
+            return super().save_model(request, obj, form, change)
+
+        priorities = ClientDocumentPriority.objects.filter(client=obj)
+        counters.forget(priorities)
+        super().save_model(request, obj, form, change)
+        counters.record(obj.customer_id, [(obj.id, None, p) for p in priorities.values_list('priority', flat=True)])
+
+    def save_formset(self, request, form, formset, change):
+        """
+        Save priority inlines through the bulk assignment service instead
+        of one save() per row.
+        """
+        if formset.model is not ClientDocumentPriority:
+            return super().save_formset(request, form, formset, change)
+
+        instances = formset.save(commit=False)
+        # A row moved to another document is replaced, not upserted in place.
+        removed = [obj.pk for obj in formset.deleted_objects]
+        removed += [obj.pk for obj, fields in formset.changed_objects if 'document' in fields]
+        removed = ClientDocumentPriority.objects.filter(pk__in=removed)
+        counters.forget(removed)
+        removed.delete()
+        assign_documents(form.instance, {obj.document_id: obj.priority for obj in instances})
 
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ['title', 'number', 'date', 'status']
-    list_filter = ['date', 'status']
+    list_display = ['title', 'number', 'date', 'status', 'doc_type', 'department']
+    list_filter = ['date', 'status', 'doc_type']
+    readonly_fields = ['doc_type', 'references', 'word_count']
     search_fields = ['title', 'number']
 
 
+@admin.register(DocumentChange)
+class DocumentChangeAdmin(admin.ModelAdmin):
+    list_display = ['document', 'kind', 'changed_at']
+    list_filter = ['kind', 'changed_at']
+    list_select_related = ['document']
+    readonly_fields = ['document', 'kind', 'changes', 'changed_at']
+
+
 @admin.register(ClientDocumentPriority)
 class ClientDocumentPriorityAdmin(admin.ModelAdmin):
     list_display = ['client', 'document', 'priority', 'created_at']
     list_filter = ['priority', 'created_at']
     search_fields = ['client__name', 'document__title']
+
+    def save_model(self, request, obj, form, change):
+        """
+        Keep the counters in step: the old row is counted out, the saved
+        one back in (client and priority may both have changed).
+        """
+        if change:
+            counters.forget(ClientDocumentPriority.objects.filter(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        counters.record(obj.client.customer_id, [(obj.client_id, None, obj.priority)])
+
+    def delete_model(self, request, obj):
+        counters.forget(ClientDocumentPriority.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            counters.forget(queryset)
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(PriorityCounter)
+class PriorityCounterAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'priority', 'count']
+    list_filter = ['priority']
+    readonly_fields = ['customer', 'priority', 'count']
+
+
+@admin.register(RefreshJob)
+class RefreshJobAdmin(admin.ModelAdmin):
+    list_display = ['day', 'status', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['status', 'day']
+    readonly_fields = ['result', 'error', 'created_at', 'started_at', 'finished_at']
+
+
+@admin.register(SummaryCache)
+class SummaryCacheAdmin(admin.ModelAdmin):
+    list_display = ['url', 'hits', 'misses', 'etag', 'last_modified', 'updated_at']
+    readonly_fields = ['content_hash', 'hits', 'misses', 'updated_at']
+
+
+@admin.register(AnalysisCache)
+class AnalysisCacheAdmin(admin.ModelAdmin):
+    list_display = ['analyzer', 'content_hash', 'created_at']
+    list_filter = ['analyzer']
+    readonly_fields = ['content_hash', 'analyzer', 'result', 'created_at']
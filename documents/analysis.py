@@ -0,0 +1,286 @@
+"""
+Document analysis backends and their persistent result cache.
+
+- An analyzer turns a Document into a short text; `settings.ANALYZER`
+  picks one of ANALYZERS ("mock" by default, "openai" for a chat
+  completions API, which tests point at a local fake server).
+- Results are stored in AnalysisCache keyed by the hash of every field
+  the analyzer reads (`Analyzer.fields`) and its version, so each
+  document is analyzed once per content and backend/prompt, and
+  `analyze_document` is a lookup.
+- `analyze_many` pre-analyzes a set of documents with bounded
+  parallelism; refresh jobs run it after ingesting a day.
+- `astream` yields the analysis as the backend produces it, for the
+  server-sent events view; `aanalyze` is the async `analyze` of the
+  JSON view.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .httpclient import get_client
+from .models import AnalysisCache
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisError(Exception):
+    """
+    The analysis backend failed or returned an unusable answer.
+    """
+
+
+class Analyzer:
+    """
+    Base analyzer.
+    - `version` must change whenever the output for the same content
+      would change (model, prompt, rules), invalidating cached results.
+    - `fields` lists every Document field the output depends on; a
+      change to any of them is a new content hash.
+    - `analyze` must not touch the database: batch mode runs it in
+      worker threads.
+    """
+    name = None
+    version = "1"
+    fields = ("title",)
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.version}"
+
+    def analyze(self, document):
+        raise NotImplementedError
+
+    async def astream(self, document):
+        """
+        Yield the analysis in chunks as they become available; joined,
+        they must equal `analyze(document)`.
+        - Default: the whole result at once, computed in a thread.
+        """
+        yield await sync_to_async(self.analyze, thread_sensitive=False)(document)
+
+
+class MockAnalyzer(Analyzer):
+    """
+    Offline analyzer built from the fields extracted at ingest.
+    """
+    name = "mock"
+    fields = ("title", "doc_type", "word_count", "references")
+
+    def analyze(self, document):
+        return (
+            f"Summary (simulated AI): This document titled '{document.title}' "
+            f"({document.get_doc_type_display()}) contains {document.word_count} words. "
+            f"Detected entities: {', '.join(document.references) if document.references else 'None'}."
+        )
+
+    async def astream(self, document):
+        # Word by word, like a model emitting tokens
+        for token in re.findall(r"\S+\s*", self.analyze(document)):
+            yield token
+            await asyncio.sleep(0)
+
+
+class OpenAIAnalyzer(Analyzer):
+    """
+    OpenAI-compatible chat completions endpoint (`ANALYZER_URL`).
+    """
+    name = "openai"
+    fields = ("title", "department")
+    prompt_version = "1"
+    prompt = (
+        "Eres un asistente jurídico. Resume en dos frases el siguiente documento "
+        "del Boletín Oficial del Estado e indica las normas que cita."
+    )
+
+    def __init__(self):
+        self.url = settings.ANALYZER_URL.rstrip("/") + "/chat/completions"
+        self.model = settings.ANALYZER_MODEL
+        self.timeout = settings.ANALYZER_TIMEOUT
+        self.version = f"{self.model}/{self.prompt_version}"
+
+    def messages(self, document):
+        return [
+            {"role": "system", "content": self.prompt},
+            {"role": "user", "content": f"{document.title}\n\nDepartamento: {document.department or 'N/A'}"},
+        ]
+
+    def analyze(self, document):
+        try:
+            # No retries: a slow model call is not worth repeating inline
+            response = get_client().post(
+                self.url,
+                retries=0,
+                json={"model": self.model, "messages": self.messages(document)},
+                headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"].strip()
+        except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+            raise AnalysisError(str(e)) from e
+
+    async def astream(self, document):
+        """
+        Relay the `stream=True` completion deltas as they arrive.
+        - Leaving the generator early (client gone) closes the upstream
+          request, so the model stops generating.
+        """
+        payload = {"model": self.model, "messages": self.messages(document), "stream": True}
+        try:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                async with client.stream(
+                    "POST", self.url, json=payload,
+                    headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            return
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+        except (httpx.HTTPError, ValueError, KeyError, IndexError) as e:
+            raise AnalysisError(str(e)) from e
+
+
+ANALYZERS = {
+    "mock": MockAnalyzer,
+    "openai": OpenAIAnalyzer,
+}
+
+
+def get_analyzer(name=None):
+    """
+    Instance of the analyzer `name`, defaulting to `settings.ANALYZER`.
+    """
+    return ANALYZERS[name or settings.ANALYZER]()
+
+
+def content_hash(document, analyzer):
+    """
+    SHA-256 of the analyzer's key (backend, model and prompt version) and
+    of every field it reads from `document`.
+    """
+    values = [analyzer.key, *(getattr(document, field) for field in analyzer.fields)]
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def _store(analyzer, results):
+    AnalysisCache.objects.bulk_create(
+        [
+            AnalysisCache(content_hash=digest, analyzer=analyzer.key, result=result)
+            for digest, result in results.items()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def analyze(document, analyzer=None):
+    """
+    Analysis of `document`, from the cache when available.
+    - A miss runs the analyzer and stores the result; concurrent misses
+      for the same content are resolved by the unique constraint.
+    Returns:
+        str: The analysis text.
+    Raises:
+        AnalysisError: The backend failed (nothing is cached).
+    """
+    analyzer = analyzer or get_analyzer()
+    digest = content_hash(document, analyzer)
+    result = AnalysisCache.objects.filter(
+        content_hash=digest, analyzer=analyzer.key
+    ).values_list("result", flat=True).first()
+    if result is None:
+        result = analyzer.analyze(document)
+        _store(analyzer, {digest: result})
+    return result
+
+
+def analyze_many(documents, workers=None, analyzer=None):
+    """
+    Pre-analyze `documents`, skipping content already in the cache.
+    - One query finds the cached hashes; the misses are analyzed by at
+      most `workers` threads (`settings.ANALYZER_WORKERS` by default),
+      and stored with a single `bulk_create`.
+    - Documents sharing the same content are analyzed once.
+    - A failing document is logged and counted, the others are kept.
+    Returns:
+        dict: `analyzed`, `cached` and `failed` counts.
+    """
+    analyzer = analyzer or get_analyzer()
+    pending = {}
+    for document in documents:
+        pending.setdefault(content_hash(document, analyzer), document)
+    cached = set(AnalysisCache.objects.filter(
+        content_hash__in=pending, analyzer=analyzer.key
+    ).values_list("content_hash", flat=True))
+    misses = {digest: doc for digest, doc in pending.items() if digest not in cached}
+
+    def run(item):
+        digest, document = item
+        try:
+            return digest, analyzer.analyze(document)
+        except AnalysisError as e:
+            logger.warning("Analysis of document %s failed: %s", document.pk, e)
+            return digest, None
+
+    results = {}
+    if misses:
+        with ThreadPoolExecutor(max_workers=max(1, workers or settings.ANALYZER_WORKERS)) as pool:
+            results = dict(pool.map(run, misses.items()))
+    stored = {digest: result for digest, result in results.items() if result is not None}
+    if stored:
+        _store(analyzer, stored)
+
+    return {"analyzed": len(stored), "cached": len(cached), "failed": len(results) - len(stored)}
+
+
+async def acached(document, analyzer):
+    """
+    Cached analysis of `document` by `analyzer`, or None.
+    """
+    return await AnalysisCache.objects.filter(
+        content_hash=content_hash(document, analyzer), analyzer=analyzer.key
+    ).values_list("result", flat=True).afirst()
+
+
+async def astream(document, analyzer=None):
+    """
+    Yield the analysis of `document` chunk by chunk as the backend
+    produces it, and cache the full text once it is complete.
+    - Nothing is cached when the stream fails or is cancelled.
+    """
+    analyzer = analyzer or get_analyzer()
+    chunks = []
+    async for chunk in analyzer.astream(document):
+        chunks.append(chunk)
+        yield chunk
+    await AnalysisCache.objects.abulk_create(
+        [AnalysisCache(content_hash=content_hash(document, analyzer), analyzer=analyzer.key, result="".join(chunks).strip())],
+        ignore_conflicts=True,
+    )
+
+
+async def aanalyze(document, analyzer=None):
+    """
+    Async `analyze`: the cached analysis, or the streamed one joined.
+    Raises:
+        AnalysisError: The backend failed (nothing is cached).
+    """
+    analyzer = analyzer or get_analyzer()
+    result = await acached(document, analyzer)
+    if result is None:
+        result = "".join([chunk async for chunk in astream(document, analyzer)]).strip()
+    return result
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import requests
+
+from .httpclient import RETRY_STATUSES, HttpClient
+from .scraping import BASE_URL, ingest_documents, parse_documents, summary_url
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter allowing at most `rate` requests per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Checkpoint:
+    """
+    JSON file recording the days already ingested by a backfill run.
+    - Written atomically after every day, so an interrupted run can be
+      restarted with the same arguments and skips finished days.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = set(json.load(f).get("done", []))
+
+    def __contains__(self, day):
+        return day.isoformat() in self.done
+
+    def mark(self, day):
+        self.done.add(day.isoformat())
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+
+def date_range(start, end):
+    """
+    Days from `start` to `end`, both included.
+    """
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+
+def fetch_summary(client, day, base_url=BASE_URL):
+    """
+    Download the summary page for `day` through `client` (an HttpClient),
+    which retries network errors and 429/5xx answers, each attempt paced
+    by the client's limiter.
+    - Any other non-200 answer (e.g. days without BOE) counts as empty.
+    Returns:
+        bytes | None: Raw page body, or None if there is nothing for that day.
+    Raises:
+        requests.RequestException: Still failing after the retries, or the
+        host's circuit is open.
+    """
+    response = client.get(summary_url(day, base_url))
+    if response.status_code == 200:
+        return response.content
+    if response.status_code in RETRY_STATUSES:
+        raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+    return None
+
+
+def backfill(start, end, base_url=BASE_URL, workers=4, rate=2.0, retries=3, backoff=1.0,
+             checkpoint=None, on_day=None):
+    """
+    Fetch and ingest every BOE summary between `start` and `end`.
+    - Pages are downloaded concurrently by a bounded thread pool sharing
+      one pooled HttpClient (keep-alive, retries with `backoff`, circuit
+      breaker) and one rate limiter, which every attempt, retries
+      included, waits for.
+    - Parsing and DB writes happen in the calling thread as pages arrive,
+      so SQLite only ever sees a single writer.
+    - `on_day(day, counts)` is called after each day is stored.
+    Returns:
+        dict: `days`, `skipped_days`, `inserted`, `failed` and `seconds`.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    days = [day for day in date_range(start, end) if day not in checkpoint]
+    totals = {"days": 0, "skipped_days": 0, "inserted": 0, "failed": []}
+    started = time.perf_counter()
+
+    client = HttpClient(pool_size=workers, retries=retries, backoff=backoff, limiter=RateLimiter(rate))
+    with client, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_summary, client, day, base_url): day
+            for day in days
+        }
+        for future in as_completed(futures):
+            day = futures[future]
+            try:
+                content = future.result()
+            except requests.RequestException as e:
+                totals["failed"].append((day, str(e)))
+                continue
+
+            if content is None:
+                counts = {"inserted": 0, "updated": 0, "skipped": 0}
+                totals["skipped_days"] += 1
+            else:
+                counts = ingest_documents(parse_documents(content), day)
+            checkpoint.mark(day)
+            totals["days"] += 1
+            totals["inserted"] += counts["inserted"]
+            if on_day:
+                on_day(day, counts)
+
+    totals["seconds"] = time.perf_counter() - started
+    return totals
+
+
+def parse_day(value):
+    """
+    argparse type for YYYY-MM-DD dates.
+    """
+    return date.fromisoformat(value)
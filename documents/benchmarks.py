@@ -0,0 +1,284 @@
+"""
+Helpers shared by the `bench_*` management commands.
+"""
+import json
+import platform
+import subprocess
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+DEPARTMENTS = [
+    "MINISTERIO DE HACIENDA",
+    "MINISTERIO DE TRABAJO Y ECONOMÍA SOCIAL",
+    "MINISTERIO DE TRANSPORTES Y MOVILIDAD SOSTENIBLE",
+    "COMUNIDAD AUTÓNOMA DE ANDALUCÍA",
+]
+
+TITLES = [
+    "Ley {n}/2025, de 1 de enero, de medidas urgentes en materia número {i}.",
+    "Real Decreto {n}/2025, de 1 de enero, por el que se regula el procedimiento {i}.",
+    "Resolución de 1 de enero de 2025, de la Dirección General número {i}.",
+    "Orden HAC/{n}/2025, de 1 de enero, por la que se aprueba el modelo {i}.",
+]
+
+
+def build_summary_html(count, start=1):
+    """
+    Build a synthetic BOE summary page with `count` `li.dispo` items.
+    - Mirrors the markup of boe.es summaries: page chrome, section and
+      department headings, and per-item PDF/HTML links.
+    """
+    parts = [
+        "<!DOCTYPE html><html lang=\"es\"><head><meta charset=\"utf-8\">"
+        "<title>BOE.es - Sumario</title></head><body>"
+        "<div id=\"header\"><ul class=\"menu\">"
+        + "".join(f"<li><a href=\"/seccion/{i}\">Sección {i}</a></li>" for i in range(20))
+        + "</ul></div><div class=\"sumario\"><h3>I. Disposiciones generales</h3>"
+    ]
+    for offset, i in enumerate(range(start, start + count)):
+        if offset % 10 == 0:
+            if offset:
+                parts.append("</ul>")
+            parts.append(f"<h4>{DEPARTMENTS[(offset // 10) % len(DEPARTMENTS)]}</h4><ul>")
+        title = TITLES[i % len(TITLES)].format(n=i % 100 + 1, i=i)
+        parts.append(
+            '<li class="dispo">'
+            f'<p>{title}</p>'
+            '<div class="enlacesDoc"><ul>'
+            f'<li class="puntoPDF"><a href="/boe/dias/2025/01/01/pdfs/BOE-A-2025-{i}.pdf">PDF (BOE-A-2025-{i})</a></li>'
+            f'<li class="puntoHTML"><a href="/diario_boe/txt.php?id=BOE-A-2025-{i}">Otros formatos</a></li>'
+            '</ul></div>'
+            '</li>'
+        )
+    if count:
+        parts.append("</ul>")
+    parts.append("</div><div id=\"footer\"><p>Agencia Estatal Boletín Oficial del Estado</p></div></body></html>")
+    return "".join(parts)
+
+
+@contextmanager
+def measure():
+    """
+    Time a block and count its SQL queries.
+    Yields a dict filled with `seconds` and `queries` on exit.
+    """
+    stats = {}
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        yield stats
+        stats["seconds"] = time.perf_counter() - start
+    stats["queries"] = len(ctx.captured_queries)
+
+
+@contextmanager
+def rollback():
+    """
+    Run a block inside a transaction that is always rolled back, so
+    benchmarks never leave rows behind.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """
+    Nearest-rank percentiles of `samples`.
+    Returns:
+        dict: `p50`, `p95`, `p99` (one key per point) and `max`; zeros
+        when there are no samples.
+    """
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        index = max(0, -(-len(ordered) * point // 100) - 1)
+        result[f"p{point}"] = ordered[index] if ordered else 0
+    result["max"] = ordered[-1] if ordered else 0
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path, benchmark, params, results):
+    """
+    Write a benchmark run as JSON, with what is needed to compare runs:
+    commit, database vendor, Python/Django versions and parameters.
+    - `results` maps a case name to its measurements.
+    """
+    import django
+
+    run = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(value, baseline):
+    """
+    " (+12%)"-style change of `value` against `baseline`, or "".
+    """
+    if not baseline:
+        return ""
+    return f" ({(value - baseline) / baseline:+.0%})"
+
+
+def _pdf_string(text):
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return "(" + escaped + ")"
+
+
+def build_pdf(pages):
+    """
+    Build a minimal PDF with one FlateDecode content stream per page.
+    - `pages` is a list of pages, each a list of text lines (Latin-1).
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for lines in pages:
+        ops = "BT /F1 11 Tf 14 TL 72 770 Td " + " ".join(f"{_pdf_string(line)} Tj T*" for line in lines) + " ET"
+        stream = zlib.compress(ops.encode("cp1252", errors="replace"))
+        objects.append(stream)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        if isinstance(obj, bytes):
+            out += f"{number} 0 obj\n<< /Length {len(obj)} /Filter /FlateDecode >>\nstream\n".encode()
+            out += obj + b"\nendstream\nendobj\n"
+        else:
+            out += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def document_pdf(n, pages=3):
+    """
+    Synthetic PDF of BOE document `n`.
+    """
+    return build_pdf([
+        [TITLES[n % len(TITLES)].format(n=n % 100 + 1, i=n), f"Página {page + 1}"]
+        + [f"Artículo {line + 1}. Texto del expediente {n} sobre contratación pública y energía."
+           for line in range(40)]
+        for page in range(pages)
+    ])
+
+
+class PdfFixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serves `/pdfs/<n>.pdf` (see `document_pdf`); `/pdfs/same/<n>.pdf`
+    always returns the same file, to exercise deduplication.
+    - `latency` (seconds) simulates the round trip to a remote host.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive, so client pooling shows
+    disable_nagle_algorithm = True  # headers and body are written separately
+    latency = 0
+    requests = 0
+
+    def do_GET(self):
+        PdfFixtureHandler.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        name = self.path.rsplit("/", 1)[-1]
+        if not name.endswith(".pdf") or not name[:-4].isdigit():
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = document_pdf(0 if "/same/" in self.path else int(name[:-4]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ChatFixtureHandler(BaseHTTPRequestHandler):
+    """
+    Slow OpenAI-compatible chat completions endpoint: answers after
+    `latency` seconds with a fixed summary, streamed word by word when
+    the request asks for `stream`.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0
+    answer = "Resumen simulado del documento, que cita la Ley 1/2025."
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.latency:
+            time.sleep(self.latency)
+        if payload.get("stream"):
+            chunks = [
+                json.dumps({"choices": [{"delta": {"content": word + " "}}]})
+                for word in self.answer.split(" ")
+            ] + ["[DONE]"]
+            body = "".join(f"data: {chunk}\n\n" for chunk in chunks).encode()
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps({"choices": [{"message": {"role": "assistant", "content": self.answer}}]}).encode()
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def serve(handler):
+    """
+    Run a local fixture HTTP server; yields its base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,78 @@
+"""
+HTTP conditional responses (ETag / Last-Modified / 304).
+
+Validators are derived from the fragment version stamps (`fragments.py`),
+which every write to documents or priorities bumps, so checking them
+costs one primary key query: an unchanged resource is answered with 304
+before the view runs.
+"""
+import hashlib
+from asyncio import iscoroutinefunction
+from functools import wraps
+from datetime import date, datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .fragments import request_versions, scoped
+
+
+def conditional(*namespaces, per_user=False):
+    """
+    Decorator adding ETag/Last-Modified validators and 304 responses.
+    - `namespaces`: data sets the response depends on.
+    - `per_user`: the response differs per user; the CSRF cookie is part
+      of the ETag too so cached pages never carry a stale token, and
+      PER_USER namespaces are read for that user (`fragments.scoped`).
+    - HTMX and full-page responses share URLs, so `HX-Request` is part
+      of the ETag and of `Vary`.
+    - Responses are `private, no-cache`: browsers keep them but always
+      revalidate.
+    - Works on sync and async views.
+    """
+    def stamps(request):
+        if per_user:
+            return request_versions(request, scoped(namespaces, request.user.pk))
+        return request_versions(request, namespaces)
+
+    def etag(request, *args, **kwargs):
+        parts = [
+            request.path,
+            request.GET.urlencode(),
+            request.headers.get("HX-Request", ""),
+            date.today().isoformat(),
+            *stamps(request),
+        ]
+        if per_user:
+            parts += [request.user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")]
+        return hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        # Stamps are the time (in ns) of the last change of each data set
+        return datetime.fromtimestamp(max(stamps(request)) / 1e9, tz=timezone.utc)
+
+    def finish(response):
+        patch_vary_headers(response, ["HX-Request"])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                # The validators run synchronously: read the user and
+                # stamps first
+                await sync_to_async(stamps)(request)
+                return finish(await conditional_view(request, *args, **kwargs))
+        else:
+            @wraps(view)
+            def wrapped(request, *args, **kwargs):
+                return finish(conditional_view(request, *args, **kwargs))
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,73 @@
+"""
+Content-addressed file store for downloaded documents.
+
+Files are named after the SHA-256 of their bytes (`ab/cd/abcd….pdf`), so
+identical PDFs are stored once and a file never changes after it has
+been written. Reads are memory-mapped: text extraction scans the page
+cache directly instead of copying whole files into Python bytes.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class ContentStore:
+    def __init__(self, root=None, suffix=".pdf"):
+        self.root = str(root or settings.CONTENT_STORE_DIR)
+        self.suffix = suffix
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + self.suffix)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def write(self, chunks):
+        """
+        Store the bytes yielded by `chunks`, hashing them while they are
+        written to a temporary file in the store.
+        - The file is moved into place atomically; if the same content is
+          already stored the copy is discarded.
+        Returns:
+            tuple[str, int, bool]: digest, size in bytes and whether the
+            content was new.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            digest = digest.hexdigest()
+            target = self.path(digest)
+            if os.path.exists(target):
+                os.remove(tmp)
+                return digest, size, False
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp, target)
+            return digest, size, True
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @contextmanager
+    def open(self, digest):
+        """
+        Read-only memory map of a stored file (bytes-like, supports
+        slicing, `find` and `re`).
+        """
+        with open(self.path(digest), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
@@ -0,0 +1,148 @@
+"""
+Denormalized priority counters.
+
+`Client.document_count` and `PriorityCounter` (customer x priority) let the
+dashboards read totals in O(1) instead of aggregating every assignment.
+They are updated in the same transaction as the write that changes
+ClientDocumentPriority rows:
+
+- services.py reports its bulk upserts/deletes through `record()`.
+- Cascading deletes of a Client or Document go through `forget()` from
+  the pre_delete receivers in signals.py.
+
+`rebuild()` (the `rebuild_counters` command) reconciles any drift.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from . import fragments
+from .models import Client, ClientDocumentPriority, PriorityCounter
+
+
+def _increment(queryset, field, deltas, key):
+    """
+    Add `deltas[k]` to `field` of the rows where `key` is k, in a single
+    UPDATE ... SET field = field + CASE key WHEN k THEN delta ... END.
+    """
+    deltas = {value: delta for value, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    step = Case(
+        *[When(**{key: value}, then=Value(delta)) for value, delta in deltas.items()],
+        output_field=IntegerField(),
+    )
+    queryset.filter(**{f"{key}__in": list(deltas)}).update(**{field: F(field) + step})
+
+
+def record(customer_id, changes):
+    """
+    Apply the counter deltas of a write to one customer's assignments.
+    - `changes` yields (client_id, old_priority, new_priority) with None
+      for "no row" on either side.
+    - Must run inside the transaction of the write.
+    """
+    client_deltas = Counter()
+    priority_deltas = Counter()
+    changed = False
+    for client_id, old, new in changes:
+        if old == new:
+            continue
+        changed = True
+        if old is None:
+            client_deltas[client_id] += 1
+        elif new is None:
+            client_deltas[client_id] -= 1
+        if old is not None:
+            priority_deltas[old] -= 1
+        if new is not None:
+            priority_deltas[new] += 1
+
+    _increment(Client.objects.all(), "document_count", client_deltas, "id")
+
+    new_counters = [p for p, delta in priority_deltas.items() if delta > 0]
+    if new_counters:
+        PriorityCounter.objects.bulk_create(
+            [PriorityCounter(customer_id=customer_id, priority=p) for p in new_counters],
+            ignore_conflicts=True,
+        )
+    _increment(PriorityCounter.objects.filter(customer_id=customer_id), "count", priority_deltas, "priority")
+    # Every priority write goes through here: invalidate cached tables too,
+    # even when the totals are unchanged (e.g. two priorities swapped).
+    if changed:
+        fragments.bump(fragments.PRIORITIES, user_id=customer_id)
+
+
+def forget(priorities):
+    """
+    Record the removal of every row in the `priorities` queryset; call
+    before deleting them.
+    """
+    by_customer = defaultdict(list)
+    for client_id, customer_id, priority in priorities.values_list("client_id", "client__customer_id", "priority"):
+        by_customer[customer_id].append((client_id, priority, None))
+    for customer_id, changes in by_customer.items():
+        record(customer_id, changes)
+
+
+def summary(customer):
+    """
+    Returns:
+        dict: priority -> count for `customer`, e.g. {"alta": 3}.
+    """
+    return dict(PriorityCounter.objects.filter(customer=customer, count__gt=0).values_list("priority", "count"))
+
+
+def _rebuild(client_model, priority_model, counter_model):
+    fixed_clients = []
+    expected = dict(priority_model.objects.values("client").annotate(n=Count("id")).values_list("client", "n"))
+    for client in client_model.objects.only("id", "document_count"):
+        if client.document_count != expected.get(client.id, 0):
+            client.document_count = expected.get(client.id, 0)
+            fixed_clients.append(client)
+    client_model.objects.bulk_update(fixed_clients, ["document_count"], batch_size=500)
+
+    expected = {
+        (row["client__customer"], row["priority"]): row["n"]
+        for row in priority_model.objects.values("client__customer", "priority").annotate(n=Count("id"))
+    }
+    current = {
+        (customer_id, priority): count
+        for customer_id, priority, count in counter_model.objects.values_list("customer_id", "priority", "count")
+    }
+    fixed_counters = [
+        counter_model(customer_id=customer_id, priority=priority, count=expected.get((customer_id, priority), 0))
+        for customer_id, priority in expected.keys() | current.keys()
+        if expected.get((customer_id, priority), 0) != current.get((customer_id, priority))
+    ]
+    counter_model.objects.bulk_create(
+        fixed_counters,
+        update_conflicts=True,
+        unique_fields=["customer", "priority"],
+        update_fields=["count"],
+        batch_size=500,
+    )
+    return len(fixed_clients), len(fixed_counters)
+
+
+def rebuild():
+    """
+    Recompute every counter from ClientDocumentPriority and fix the ones
+    that drifted.
+    Returns:
+        tuple[int, int]: corrected client and priority counters.
+    """
+    with transaction.atomic():
+        return _rebuild(Client, ClientDocumentPriority, PriorityCounter)
+
+
+def populate(apps, schema_editor):
+    """
+    Migration helper filling the counters for existing data.
+    """
+    _rebuild(
+        apps.get_model("documents", "Client"),
+        apps.get_model("documents", "ClientDocumentPriority"),
+        apps.get_model("documents", "PriorityCounter"),
+    )
@@ -0,0 +1,120 @@
+"""
+Enrichment of BOE records at ingest time.
+
+Classification and reference extraction run once per document when it
+is stored (see `scraping.ingest_documents`), instead of on every render
+or analysis. `enrich_documents` backfills existing rows.
+"""
+import re
+
+# (value, label, pattern matched at the start of the title); first match wins.
+DOC_TYPES = [
+    ("ley_organica", "Ley Orgánica", r"Ley Org[aá]nica\b"),
+    ("ley", "Ley", r"Ley\b"),
+    ("real_decreto_ley", "Real Decreto-ley", r"Real Decreto-ley\b"),
+    ("real_decreto", "Real Decreto", r"Real Decreto\b"),
+    ("decreto", "Decreto", r"Decreto\b"),
+    ("orden", "Orden", r"Orden\b"),
+    ("resolucion", "Resolución", r"Resoluci[oó]n\b"),
+    ("acuerdo", "Acuerdo", r"Acuerdo\b"),
+    ("anuncio", "Anuncio", r"Anuncio\b"),
+    ("correccion", "Corrección de errores", r"Correcci[oó]n de error"),
+]
+OTHER = "otro"
+# Document columns filled by `enrich`.
+FIELDS = ["doc_type", "references", "word_count"]
+DOC_TYPE_CHOICES = [(value, label) for value, label, _ in DOC_TYPES] + [(OTHER, "Documento")]
+
+_TYPE_PATTERNS = [(value, re.compile(pattern, re.IGNORECASE)) for value, _, pattern in DOC_TYPES]
+
+# "Ley 39/2015", "Real Decreto-ley 4/2025", "Orden HAC/123/2025", ...
+REFERENCE_RE = re.compile(
+    r"\b(Ley Org[aá]nica|Ley|Real Decreto-ley|Real Decreto Legislativo|Real Decreto|Decreto-ley|Decreto"
+    r"|Orden(?: [A-Z]{2,5})?|Resoluci[oó]n)[ /](\d+/\d{4})"
+)
+
+
+def classify(title):
+    """
+    Document type from the leading words of the title, or "otro".
+    """
+    title = title.lstrip()
+    for value, pattern in _TYPE_PATTERNS:
+        if pattern.match(title):
+            return value
+    return OTHER
+
+
+def references(title):
+    """
+    Legal references cited in the title, in order and without repeats,
+    e.g. ["Ley 39/2015", "Orden HAC/123/2025"].
+    """
+    found = []
+    for kind, number in REFERENCE_RE.findall(title):
+        reference = f"{kind}/{number}" if kind.startswith("Orden ") else f"{kind} {number}"
+        if reference not in found:
+            found.append(reference)
+    return found
+
+
+def enrich(title):
+    """
+    Returns:
+        dict: `doc_type`, `references` and `word_count` for a title.
+    """
+    return {
+        "doc_type": classify(title),
+        "references": references(title),
+        "word_count": len(title.split()),
+    }
+
+
+def backfill(batch_size=1000, everything=False, on_batch=None):
+    """
+    Enrich stored documents in id order, `batch_size` rows at a time.
+    - By default only rows never enriched (`word_count == 0`) are read;
+      `everything=True` re-runs the rules over all rows.
+    - Each batch is one keyset read and one `bulk_update` of the rows
+      whose values changed, in its own transaction, so an interrupted
+      run keeps its progress.
+    - Departments only come from the summary pages and are left as is.
+    Returns:
+        dict: `processed`, `updated` and `batches` counts.
+    """
+    from django.db import transaction
+
+    from . import fragments
+    from .models import Document
+
+    documents = Document.objects.only("id", "title", *FIELDS).order_by("id")
+    if not everything:
+        documents = documents.filter(word_count=0)
+
+    totals = {"processed": 0, "updated": 0, "batches": 0}
+    last_id = 0
+    while True:
+        batch = list(documents.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        changed = []
+        for doc in batch:
+            values = enrich(doc.title)
+            if any(getattr(doc, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(doc, field, value)
+                changed.append(doc)
+        if changed:
+            with transaction.atomic():
+                Document.objects.bulk_update(changed, FIELDS)
+                fragments.bump(fragments.DOCUMENTS)
+
+        totals["processed"] += len(batch)
+        totals["updated"] += len(changed)
+        totals["batches"] += 1
+        if on_batch:
+            on_batch(totals)
+
+    return totals
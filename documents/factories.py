@@ -0,0 +1,167 @@
+"""
+Synthetic data for benchmarks and load tests (factory_boy + Faker).
+
+- The factories build realistic rows: BOE-like titles, enrichment
+  fields computed like at ingest, customers with clients and priorities.
+- `seed` bulk-creates whole datasets (10^3-10^6 documents, thousands of
+  clients) in batches; every seeded row is tagged so `clear_seed`
+  removes exactly those rows.
+"""
+import functools
+import random
+
+import factory
+import factory.random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Q
+from factory.django import DjangoModelFactory
+
+from . import counters, enrichment, fragments
+from .benchmarks import DEPARTMENTS, TITLES
+from .models import Client, ClientDocumentPriority, Document, DocumentChange, DocumentContent
+from .scraping import FIELDS, record_hash
+
+PREFIX = "SEED"
+PRIORITIES = [value for value, _ in ClientDocumentPriority.PRIORITY_CHOICES]
+
+
+@functools.cache
+def _password():
+    # Hashing is deliberately slow; every seeded user shares one hash
+    return make_password("seed")
+
+
+class UserFactory(DjangoModelFactory):
+    class Meta:
+        model = User
+        django_get_or_create = ("username",)
+
+    username = factory.Sequence(lambda n: f"{PREFIX.lower()}-{n}")
+    email = factory.LazyAttribute(lambda user: f"{user.username}@example.com")
+    password = factory.LazyFunction(_password)
+
+
+class DocumentFactory(DjangoModelFactory):
+    class Meta:
+        model = Document
+
+    number = factory.Sequence(lambda n: f"{PREFIX}-A-{n}")
+    date = factory.Faker("date_between", start_date="-3y", end_date="today")
+    title = factory.LazyAttributeSequence(
+        lambda doc, n: TITLES[n % len(TITLES)].format(n=n % 100 + 1, i=n)[:-1]
+        + ", " + doc.subject[0].lower() + doc.subject[1:]
+    )
+    status = "Publicado"
+    url = factory.LazyAttribute(lambda doc: f"https://www.boe.es/boe/dias/pdfs/{doc.number}.pdf")
+    department = factory.Faker("random_element", elements=DEPARTMENTS)
+    doc_type = factory.LazyAttribute(lambda doc: enrichment.classify(doc.title))
+    references = factory.LazyAttribute(lambda doc: enrichment.references(doc.title))
+    word_count = factory.LazyAttribute(lambda doc: len(doc.title.split()))
+    content_hash = factory.LazyAttribute(lambda doc: record_hash({field: getattr(doc, field) for field in FIELDS}))
+
+    class Params:
+        subject = factory.Faker("sentence", nb_words=8, locale="es_ES")
+
+
+class ClientFactory(DjangoModelFactory):
+    class Meta:
+        model = Client
+
+    customer = factory.SubFactory(UserFactory)
+    name = factory.Faker("company", locale="es_ES")
+
+
+class ClientDocumentPriorityFactory(DjangoModelFactory):
+    class Meta:
+        model = ClientDocumentPriority
+
+    client = factory.SubFactory(ClientFactory)
+    document = factory.SubFactory(DocumentFactory)
+    priority = factory.Faker("random_element", elements=PRIORITIES)
+
+
+def seed(documents=1000, customers=10, clients=100, priorities=20, batch_size=5000, seed=42, on_batch=None):
+    """
+    Bulk-create a synthetic dataset.
+    - `documents` spread over the last three years; `clients` split
+      among `customers` users (username `seed-<n>`, password "seed"),
+      each client with `priorities` assigned documents.
+    - Rows are built by the factories and saved with `bulk_create` per
+      `batch_size`; counters are rebuilt once at the end.
+    - Deterministic for a given `seed`.
+    - `on_batch(kind, done)` is called after each saved batch.
+    Returns:
+        dict: created `documents`, `customers`, `clients` and `priorities`.
+    """
+    factory.random.reseed_random(seed)
+    rng = random.Random(seed)
+    offset = Document.objects.filter(number__startswith=f"{PREFIX}-").count()
+
+    for start in range(0, documents, batch_size):
+        size = min(batch_size, documents - start)
+        batch = [
+            DocumentFactory.build(number=f"{PREFIX}-A-{offset + start + i}")
+            for i in range(size)
+        ]
+        with transaction.atomic():
+            Document.objects.bulk_create(batch)
+        if on_batch:
+            on_batch("documents", start + size)
+    # bulk_create returns no ids on every backend; read them back
+    document_ids = list(Document.objects.filter(number__startswith=f"{PREFIX}-").values_list("id", flat=True))
+
+    users = [UserFactory(username=f"{PREFIX.lower()}-{n}") for n in range(customers)]
+    client_rows = Client.objects.bulk_create(
+        [ClientFactory.build(customer=users[n % len(users)]) for n in range(clients)],
+        batch_size=batch_size,
+    )
+    if not connection.features.can_return_rows_from_bulk_insert:
+        client_rows = list(Client.objects.filter(customer__in=users))
+
+    created = 0
+    pending = []
+    for client in client_rows:
+        for document_id in rng.sample(document_ids, min(priorities, len(document_ids))):
+            pending.append(ClientDocumentPriority(
+                client=client, document_id=document_id, priority=rng.choice(PRIORITIES),
+            ))
+        if len(pending) >= batch_size:
+            ClientDocumentPriority.objects.bulk_create(pending, ignore_conflicts=True)
+            created += len(pending)
+            pending = []
+            if on_batch:
+                on_batch("priorities", created)
+    ClientDocumentPriority.objects.bulk_create(pending, ignore_conflicts=True)
+    created += len(pending)
+
+    counters.rebuild()
+    fragments.bump(fragments.DOCUMENTS, fragments.PRIORITIES)
+    return {"documents": documents, "customers": len(users), "clients": len(client_rows), "priorities": created}
+
+
+def clear_seed():
+    """
+    Delete everything `seed` created.
+    - Documents go through a plain DELETE: the ORM would send delete
+      signals row by row.
+    Returns:
+        int: deleted documents.
+    """
+    with transaction.atomic():
+        users = User.objects.filter(username__startswith=f"{PREFIX.lower()}-")
+        seeded = Document.objects.filter(number__startswith=f"{PREFIX}-")
+        ClientDocumentPriority.objects.filter(Q(client__customer__in=users) | Q(document__in=seeded)).delete()
+        DocumentContent.objects.filter(document__in=seeded).delete()
+        DocumentChange.objects.filter(document__in=seeded).delete()
+        users.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Document._meta.db_table} WHERE number LIKE %s",
+                [f"{PREFIX}-%"],
+            )
+            deleted = cursor.rowcount
+        counters.rebuild()
+        fragments.bump(fragments.DOCUMENTS, fragments.PRIORITIES)
+    return deleted
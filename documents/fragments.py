@@ -0,0 +1,150 @@
+"""
+Versioned fragment cache for HTMX partials.
+
+A rendered partial is cached under its template, the request's query
+string, an optional scope (e.g. the user) and the current version stamp
+of every data set it depends on. Writes bump the stamps (`bump`), so an
+outdated fragment is never served again and simply expires.
+
+Version stamps live in the database (DataVersion), so a bump made by the
+refresh worker or the scheduler reaches every web process whatever the
+cache backend; reading them costs one primary key query per request
+(`request_versions`). Fragments and hit/miss counters live in the
+default cache: with the per-process locmem backend each process keeps
+its own copies and counts, use the file or Redis backend
+(CACHE_BACKEND) to share them.
+"""
+import hashlib
+import time
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from .models import DataVersion
+
+DOCUMENTS = "documents"
+PRIORITIES = "priorities"
+# Also versioned per customer: a user's writes only invalidate that
+# user's fragments and pages (see `scoped`).
+PER_USER = {PRIORITIES}
+
+TIMEOUT = 300
+
+_HITS_KEY = "fragment-stats:hits"
+_MISSES_KEY = "fragment-stats:misses"
+
+
+def _new_version():
+    # Time based, so Last-Modified can be derived from it (conditional.py)
+    return time.time_ns()
+
+
+def versions(*namespaces):
+    """
+    Current version stamp of each namespace, read with one query.
+    - Namespaces never bumped read as 0; the global ones are created by
+      their migration, so only per-customer stamps (`scoped`) do.
+    """
+    found = dict(DataVersion.objects.filter(namespace__in=namespaces).values_list("namespace", "version"))
+    return [found.get(namespace, 0) for namespace in namespaces]
+
+
+def scoped(namespaces, user_id):
+    """
+    The namespaces a user's view depends on: PER_USER namespaces are
+    followed by their per-customer variant, e.g. "priorities:42".
+    """
+    result = []
+    for namespace in namespaces:
+        result.append(namespace)
+        if namespace in PER_USER:
+            result.append(f"{namespace}:{user_id}")
+    return result
+
+
+def request_versions(request, namespaces):
+    """
+    `versions(*namespaces)`, read at most once per request and namespace.
+    """
+    if not hasattr(request, "_data_versions"):
+        request._data_versions = {}
+    missing = [namespace for namespace in namespaces if namespace not in request._data_versions]
+    if missing:
+        request._data_versions.update(zip(missing, versions(*missing)))
+    return [request._data_versions[namespace] for namespace in namespaces]
+
+
+def bump(*namespaces, user_id=None):
+    """
+    Invalidate every fragment depending on `namespaces`, once the current
+    transaction (if any) commits.
+    - With `user_id`, PER_USER namespaces are only bumped for that
+      customer; without it, for everyone.
+    - One upsert, so concurrent bumps never fail.
+    """
+    if user_id is not None:
+        namespaces = [f"{namespace}:{user_id}" if namespace in PER_USER else namespace for namespace in namespaces]
+
+    def _bump():
+        version = _new_version()
+        DataVersion.objects.bulk_create(
+            [DataVersion(namespace=namespace, version=version) for namespace in namespaces],
+            update_conflicts=True,
+            unique_fields=["namespace"],
+            update_fields=["version"],
+        )
+
+    transaction.on_commit(_bump)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    """
+    Returns:
+        dict: `hits`, `misses` and `ratio` (hits / lookups, None if none).
+    """
+    counts = cache.get_many([_HITS_KEY, _MISSES_KEY])
+    hits, misses = counts.get(_HITS_KEY, 0), counts.get(_MISSES_KEY, 0)
+    return {"hits": hits, "misses": misses, "ratio": hits / (hits + misses) if hits + misses else None}
+
+
+def reset_stats():
+    cache.delete_many([_HITS_KEY, _MISSES_KEY])
+
+
+def render_fragment(request, template_name, get_context, depends_on, scope=""):
+    """
+    Render `template_name` with `get_context()`, or serve it from cache.
+    - `depends_on`: namespaces whose version is part of the key.
+    - `scope`: extra key part for per-user fragments.
+    - `get_context` is only called on a miss, so cached responses skip
+      the queries too. Fragments must not contain per-request data such
+      as CSRF tokens.
+    - The `X-Fragment-Cache` header tells whether it was a hit.
+    """
+    parts = [
+        template_name, scope, request.GET.urlencode(), date.today().isoformat(),
+        *request_versions(request, depends_on),
+    ]
+    key = "fragment:" + hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+
+    html = cache.get(key)
+    hit = html is not None
+    if not hit:
+        html = render_to_string(template_name, get_context(), request)
+        cache.set(key, html, TIMEOUT)
+    _incr(_HITS_KEY if hit else _MISSES_KEY)
+
+    response = HttpResponse(html)
+    response["X-Fragment-Cache"] = "hit" if hit else "miss"
+    return response
@@ -0,0 +1,294 @@
+"""
+Shared client for outbound HTTP traffic (BOE summaries and PDFs, the
+analyzer API).
+
+- Requests go through a keep-alive `requests.Session` whose pool holds
+  `settings.HTTP_POOL_SIZE` connections per host, with separate connect
+  and read timeouts (`HTTP_CONNECT_TIMEOUT`, `HTTP_READ_TIMEOUT`).
+- Network errors, 429 and 5xx answers are retried `HTTP_RETRIES` times
+  with exponential backoff and full jitter (`HTTP_BACKOFF` seconds
+  base), honouring a numeric Retry-After.
+- Per host, at most `HTTP_MAX_PER_HOST` requests are in flight in this
+  process, and a circuit breaker fails fast with `CircuitOpenError` for
+  `HTTP_BREAKER_RESET` seconds after `HTTP_BREAKER_THRESHOLD`
+  consecutive failed requests; then one probe request decides whether
+  it closes again.
+- Per host metrics (requests, errors, retries, bytes received, latency
+  percentiles) are kept in process memory: see `metrics`.
+- An optional `limiter` (any object with a blocking `wait()`, e.g.
+  backfill.RateLimiter) paces every attempt, retries included.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; anything else is the server's final answer.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Longest Retry-After honoured, in seconds
+MAX_RETRY_AFTER = 60
+# Latency samples kept per host for the percentiles
+SAMPLES = 1000
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    The host failed repeatedly; the request was not sent.
+    """
+
+
+class _Host:
+    """
+    Concurrency limit, circuit breaker and metrics of one host.
+    """
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.slots = threading.BoundedSemaphore(limit)
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.counts = Counter()
+        self.latencies = deque(maxlen=SAMPLES)
+
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at < settings.HTTP_BREAKER_RESET:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        """
+        Raise CircuitOpenError while the breaker is open; once the reset
+        time has passed, let a single probe request through.
+        """
+        with self.lock:
+            state = self.state()
+            if state == "open":
+                self.counts["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            if state == "half-open":
+                self.probing = True
+
+    def add(self, key, value=1):
+        with self.lock:
+            self.counts[key] += value
+
+    def observe(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds * 1000)
+
+    def record(self, failed):
+        """
+        Count a finished request and update the breaker.
+        """
+        with self.lock:
+            self.counts["requests"] += 1
+            self.probing = False
+            if not failed:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.counts["errors"] += 1
+            self.failures += 1
+            if self.failures >= settings.HTTP_BREAKER_THRESHOLD:
+                if self.opened_at is None:
+                    logger.warning("%s failed %d times in a row, opening its circuit", self.name, self.failures)
+                self.opened_at = time.monotonic()
+
+
+_hosts = {}
+_lock = threading.Lock()
+_default = None
+
+
+def _host(url):
+    name = urlsplit(url).netloc
+    with _lock:
+        if name not in _hosts:
+            _hosts[name] = _Host(name, settings.HTTP_MAX_PER_HOST)
+        return _hosts[name]
+
+
+class HttpClient:
+    """
+    Pooled session with timeouts, retries, per-host limits and metrics.
+    - Thread-safe; hosts state (limits, breakers, metrics) is shared by
+      every client of the process.
+    - `request` and `stream` return the final response whatever its
+      status, like `requests`; they raise `requests.RequestException`
+      (including CircuitOpenError) when no response was received.
+    """
+
+    def __init__(self, pool_size=None, timeout=None, retries=None, backoff=None, limiter=None):
+        self.timeout = timeout or (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+        self.retries = settings.HTTP_RETRIES if retries is None else retries
+        self.backoff = settings.HTTP_BACKOFF if backoff is None else backoff
+        self.limiter = limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size or settings.HTTP_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retry number `attempt + 1`.
+        """
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_RETRY_AFTER)
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _send(self, host, method, url, retries, stream, kwargs):
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault("timeout", self.timeout)
+        failed = True
+        try:
+            for attempt in range(retries + 1):
+                if attempt:
+                    host.add("retries")
+                if self.limiter:
+                    self.limiter.wait()
+                start = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, stream=stream, **kwargs)
+                    if not stream:
+                        host.add("bytes", len(response.content))
+                except requests.RequestException as e:
+                    if attempt == retries:
+                        raise
+                    logger.info("%s %s failed (%s), retrying", method, url, e)
+                    time.sleep(self.delay(attempt))
+                    continue
+                host.observe(time.perf_counter() - start)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    failed = response.status_code in RETRY_STATUSES
+                    return response
+                response.close()
+                logger.info("%s %s answered %d, retrying", method, url, response.status_code)
+                time.sleep(self.delay(attempt, response.headers.get("Retry-After")))
+        finally:
+            host.record(failed)
+
+    def request(self, method, url, retries=None, **kwargs):
+        """
+        Send a request and read its body; `retries` overrides the client
+        default, other arguments go to `requests.Session.request`.
+        - Fails fast while the host's circuit is open; otherwise waits for
+          a host slot and holds it for the whole call, backoff included.
+        Returns:
+            requests.Response: The final response.
+        """
+        host = _host(url)
+        host.allow()
+        with host.slots:
+            return self._send(host, method, url, retries, False, kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    @contextmanager
+    def stream(self, method, url, retries=None, **kwargs):
+        """
+        Like `request` with `stream=True`; yields the response, whose body
+        is read inside the block.
+        - The host slot is held, and the response kept open, until the
+          block exits; only failures before the body are retried.
+        """
+        host = _host(url)
+        host.allow()
+        with host.slots:
+            response = self._send(host, method, url, retries, True, kwargs)
+            with response:
+                try:
+                    yield response
+                finally:
+                    host.add("bytes", response.raw.tell())
+
+
+def get_client():
+    """
+    The process-wide client with the default settings.
+    """
+    global _default
+    with _lock:
+        if _default is None:
+            _default = HttpClient()
+        return _default
+
+
+def _percentile(ordered, point):
+    return ordered[max(0, math.ceil(point / 100 * len(ordered)) - 1)] if ordered else 0.0
+
+
+def metrics():
+    """
+    Counters of every host contacted by this process.
+    Returns:
+        dict: host -> `requests`, `errors`, `error_rate`, `retries`,
+        `bytes`, `rejected` (failed fast while open), `circuit` state and
+        latency `p50`/`p95`/`p99` in ms over the last SAMPLES attempts.
+    """
+    snapshot = {}
+    with _lock:
+        hosts = list(_hosts.values())
+    for host in hosts:
+        with host.lock:
+            counts = dict(host.counts)
+            ordered = sorted(host.latencies)
+            state = host.state()
+        requests_ = counts.get("requests", 0)
+        snapshot[host.name] = {
+            "requests": requests_,
+            "errors": counts.get("errors", 0),
+            "error_rate": counts.get("errors", 0) / requests_ if requests_ else 0.0,
+            "retries": counts.get("retries", 0),
+            "bytes": counts.get("bytes", 0),
+            "rejected": counts.get("rejected", 0),
+            "circuit": state,
+            **{f"p{point}": _percentile(ordered, point) for point in (50, 95, 99)},
+        }
+    return snapshot
+
+
+def format_metrics():
+    """
+    One summary line per host, for command output and logs.
+    """
+    return [
+        f"{name}: {m['requests']} request(s), {m['errors']} error(s) ({m['error_rate']:.1%}), "
+        f"{m['retries']} retries, {m['rejected']} rejected, {m['bytes'] / 1e6:.1f} MB, "
+        f"p50 {m['p50']:.0f} ms, p95 {m['p95']:.0f} ms, circuit {m['circuit']}"
+        for name, m in metrics().items()
+    ]
+
+
+def reset():
+    """
+    Forget every host's breaker state and metrics.
+    """
+    with _lock:
+        _hosts.clear()
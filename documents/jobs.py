@@ -0,0 +1,117 @@
+import logging
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .analysis import analyze_many
+from .models import Document, RefreshJob
+from .scraping import fetch_documents
+
+logger = logging.getLogger(__name__)
+
+# A job running, or still pending, for longer than this is assumed to
+# belong to a dead worker.
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue_refresh(day):
+    """
+    Queue a BOE refresh for `day`, coalescing with any active job.
+    - Returns the pending/running job for that day if there is one.
+    - Jobs left running, or never claimed, for STALE_AFTER are failed
+      first, so a dead worker can't hold the day forever.
+    - The partial unique constraint on RefreshJob guarantees that two
+      concurrent requests can't both create a job for the same day.
+    Returns:
+        RefreshJob: The job that will (or already does) cover `day`.
+    """
+    stale = timezone.now() - STALE_AFTER
+    RefreshJob.objects.filter(
+        Q(status='running', started_at__lt=stale) | Q(status='pending', created_at__lt=stale), day=day,
+    ).update(status='failed', error='Worker timeout', finished_at=timezone.now())
+
+    job = RefreshJob.objects.filter(day=day, status__in=RefreshJob.ACTIVE_STATUSES).first()
+    if job:
+        return job
+
+    try:
+        with transaction.atomic():
+            return RefreshJob.objects.create(day=day)
+    except IntegrityError:
+        # Another request queued the same day in the meantime.
+        return RefreshJob.objects.get(day=day, status__in=RefreshJob.ACTIVE_STATUSES)
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest pending job to `running`.
+    Returns:
+        RefreshJob | None: The claimed job, or None if the queue is empty.
+    """
+    while True:
+        job = RefreshJob.objects.filter(status='pending').order_by('created_at').first()
+        if job is None:
+            return None
+
+        now = timezone.now()
+        claimed = RefreshJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', started_at=now
+        )
+        if claimed:
+            job.status = 'running'
+            job.started_at = now
+            return job
+        # Lost the race against another worker; try the next one.
+
+
+def run_job(job):
+    """
+    Execute a claimed refresh job and store its outcome.
+    - New or changed documents are pre-analyzed (see `analysis.py`), so
+      `analyze_document` only reads the cache.
+    """
+    try:
+        job.result = fetch_documents(job.day)
+        if job.result["inserted"] or job.result["updated"]:
+            job.result["analysis"] = analyze_many(Document.objects.filter(date=job.day))
+        job.status = 'done'
+    except Exception as e:
+        logger.exception("Refresh job %s failed", job.pk)
+        job.error = str(e)
+        job.status = 'failed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'error', 'status', 'finished_at'])
+    return job
+
+
+def run_pending_jobs():
+    """
+    Drain the queue in the current process.
+    Returns:
+        int: Number of jobs executed.
+    """
+    count = 0
+    while (job := claim_next_job()) is not None:
+        run_job(job)
+        count += 1
+    return count
+
+
+def poll(days=1, today=None):
+    """
+    One scheduler tick: refresh the last `days` BOE days, today included.
+    - Jobs coalesce with refreshes already queued by users, then the
+      queue is drained here; an unchanged summary is answered by a 304
+      or its page hash (`fetch_documents`), so a quiet tick costs one
+      request and a few queries per day.
+    Returns:
+        list[RefreshJob]: The jobs covering those days, reloaded.
+    """
+    today = today or date.today()
+    jobs = [enqueue_refresh(today - timedelta(days=offset)) for offset in range(days)]
+    run_pending_jobs()
+    for job in jobs:
+        job.refresh_from_db()
+    return jobs
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from documents.analysis import ANALYZERS, analyze_many, get_analyzer
+from documents.backfill import parse_day
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = "Pre-analyze the documents of a day into the analysis cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", dest="day", type=parse_day, default=None,
+                            help="Day to analyze (YYYY-MM-DD), today by default.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Concurrent analyzer calls (ANALYZER_WORKERS by default).")
+        parser.add_argument("--analyzer", default=None, choices=sorted(ANALYZERS),
+                            help="Analyzer backend (ANALYZER by default).")
+
+    def handle(self, *args, **options):
+        day = options["day"] or date.today()
+        analyzer = get_analyzer(options["analyzer"])
+        totals = analyze_many(Document.objects.filter(date=day), workers=options["workers"], analyzer=analyzer)
+        self.stdout.write(self.style.SUCCESS(
+            f"{day} ({analyzer.key}): {totals['analyzed']} analyzed, "
+            f"{totals['cached']} already cached, {totals['failed']} failed"
+        ))
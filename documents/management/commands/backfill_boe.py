@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from documents import httpclient
+from documents.backfill import Checkpoint, backfill, parse_day
+from documents.scraping import BASE_URL
+
+
+class Command(BaseCommand):
+    help = "Fetch and store BOE summaries for a range of past days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=parse_day, required=True,
+                            help="First day to fetch (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", type=parse_day, required=True,
+                            help="Last day to fetch, included (YYYY-MM-DD).")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Concurrent downloads.")
+        parser.add_argument("--rate", type=float, default=2.0,
+                            help="Maximum requests per second to the BOE host.")
+        parser.add_argument("--retries", type=int, default=3)
+        parser.add_argument("--backoff", type=float, default=1.0,
+                            help="Base backoff in seconds between retries.")
+        parser.add_argument("--checkpoint", default=".backfill_boe.json",
+                            help="Checkpoint file used to resume interrupted runs.")
+        parser.add_argument("--base-url", default=BASE_URL)
+
+    def handle(self, *args, **options):
+        if options["start"] > options["end"]:
+            raise CommandError("--from must not be after --to")
+
+        def report(day, counts):
+            self.stdout.write(f"{day}: {counts['inserted']} inserted, {counts['skipped']} skipped")
+
+        totals = backfill(
+            options["start"],
+            options["end"],
+            base_url=options["base_url"],
+            workers=options["workers"],
+            rate=options["rate"],
+            retries=options["retries"],
+            backoff=options["backoff"],
+            checkpoint=Checkpoint(options["checkpoint"]),
+            on_day=report,
+        )
+
+        for day, error in totals["failed"]:
+            self.stderr.write(f"{day}: failed ({error})")
+
+        minutes = totals["seconds"] / 60
+        rate = totals["days"] / minutes if minutes else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['days']} day(s) processed ({totals['skipped_days']} without BOE), "
+            f"{totals['inserted']} document(s) inserted, {len(totals['failed'])} failed, "
+            f"{rate:.1f} days/minute"
+        ))
+        for line in httpclient.format_metrics():
+            self.stdout.write(line)
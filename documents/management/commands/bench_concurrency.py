@@ -0,0 +1,167 @@
+import multiprocessing
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+
+from documents import counters, fragments
+from documents.analysis import content_hash, get_analyzer
+from documents.benchmarks import build_summary_html, percentiles
+from documents.models import AnalysisCache, ClientDocumentPriority, Document, DocumentChange, DocumentContent
+from documents.queries import document_filters, filter_documents
+from documents.scraping import ingest_documents, parse_documents
+
+# Refreshed days are written far before any real BOE date and deleted at the end
+FIRST_DAY = date(1900, 1, 1)
+
+
+def list_page():
+    """
+    The queries of an unfiltered document list: count and first page.
+    """
+    documents = filter_documents(document_filters({}))
+    documents.count()
+    list(documents[:10])
+
+
+def clear_days(days):
+    """
+    Delete the documents of the `days` refreshed days from FIRST_DAY on,
+    and the rows that depend on them.
+    - Documents go through a plain DELETE: the ORM would send delete
+      signals row by row.
+    Returns:
+        int: deleted documents.
+    """
+    if not days:
+        return 0
+    with transaction.atomic():
+        written = Document.objects.filter(date__range=(FIRST_DAY, FIRST_DAY + timedelta(days=days - 1)))
+        priorities = ClientDocumentPriority.objects.filter(document__in=written)
+        counters.forget(priorities)
+        priorities.delete()
+        analyzer = get_analyzer()
+        hashes = [content_hash(document, analyzer) for document in written.only(*analyzer.fields)]
+        AnalysisCache.objects.filter(content_hash__in=hashes, analyzer=analyzer.key).delete()
+        DocumentContent.objects.filter(document__in=written).delete()
+        DocumentChange.objects.filter(document__in=written).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Document._meta.db_table} WHERE date BETWEEN %s AND %s",
+                [FIRST_DAY, FIRST_DAY + timedelta(days=days - 1)],
+            )
+            deleted = cursor.rowcount
+        fragments.bump(fragments.DOCUMENTS)
+    return deleted
+
+
+class Command(BaseCommand):
+    help = "Measure document list latency while a refresh is writing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4, help="Concurrent reader processes.")
+        parser.add_argument("--seconds", type=float, default=5, help="Duration of each phase.")
+        parser.add_argument("--items", type=int, default=2000, help="Documents written per refresh.")
+        parser.add_argument("--journal-mode", nargs="+", default=None,
+                            help="SQLite journal modes to compare, e.g. delete wal (SQLITE_PRAGMAS by default).")
+
+    def run_phase(self, readers, seconds, items, write):
+        """
+        Run `readers` reader processes (like gunicorn workers) for
+        `seconds`, with a refresh writer process when `write`.
+        Returns:
+            tuple[list, list, list, int]: reader latencies (ms), errors,
+            refresh durations (ms) and days written from FIRST_DAY on.
+        """
+        context = multiprocessing.get_context("fork")
+        stop = context.Event()
+        results = context.Queue()
+
+        def reader():
+            latencies, errors = [], []
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    list_page()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except OperationalError as e:
+                    errors.append(str(e))
+            results.put((latencies, errors, [], 0))
+
+        def writer():
+            refreshes, errors = [], []
+            day = 0
+            while not stop.is_set():
+                html = build_summary_html(items, start=day * items)
+                start = time.perf_counter()
+                try:
+                    ingest_documents(parse_documents(html), FIRST_DAY + timedelta(days=day))
+                    refreshes.append((time.perf_counter() - start) * 1000)
+                except OperationalError as e:
+                    errors.append(str(e))
+                day += 1
+            results.put(([], errors, refreshes, day))
+
+        # Children must open their own connections
+        connections.close_all()
+        processes = [context.Process(target=reader) for _ in range(readers)]
+        if write:
+            processes.append(context.Process(target=writer))
+        for process in processes:
+            process.start()
+        time.sleep(seconds)
+        stop.set()
+        latencies, errors, refreshes, days = [], [], [], 0
+        for _ in processes:
+            part = results.get()
+            latencies += part[0]
+            errors += part[1]
+            refreshes += part[2]
+            days = max(days, part[3])
+        for process in processes:
+            process.join()
+        return latencies, errors, refreshes, days
+
+    def handle(self, *args, **options):
+        modes = options["journal_mode"]
+        if modes and connection.vendor != "sqlite":
+            raise CommandError("--journal-mode only applies to SQLite.")
+        if connection.vendor == "sqlite" and connection.settings_dict["NAME"] in ("", ":memory:"):
+            raise CommandError("Concurrent readers need a file-backed database.")
+
+        from django.conf import settings
+        for mode in modes or [None]:
+            pragmas = dict(settings.SQLITE_PRAGMAS)
+            if mode:
+                pragmas["journal_mode"] = mode
+            # New connections, so the hook applies the journal mode
+            connections.close_all()
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                label = mode or connection.vendor
+                if connection.vendor == "sqlite":
+                    with connection.cursor() as cursor:
+                        label = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+                days = 0
+                try:
+                    for write in (False, True):
+                        latencies, errors, refreshes, written = self.run_phase(
+                            options["readers"], options["seconds"], options["items"], write
+                        )
+                        days = max(days, written)
+                        stats = percentiles(latencies)
+                        line = (
+                            f"{label:>7} {'writing' if write else 'idle':>7}: "
+                            f"{len(latencies) / options['seconds']:7.0f} pages/s, "
+                            f"p50 {stats['p50']:7.1f} ms, p95 {stats['p95']:7.1f} ms, "
+                            f"p99 {stats['p99']:7.1f} ms, max {stats['max']:7.1f} ms, {len(errors)} errors"
+                        )
+                        if write:
+                            line += f"; {len(refreshes)} refreshes, p50 {percentiles(refreshes)['p50']:.0f} ms"
+                        self.stdout.write(line)
+                        if errors:
+                            self.stdout.write(f"         first error: {errors[0]}")
+                finally:
+                    clear_days(days)
+            connections.close_all()
@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from documents.benchmarks import build_summary_html, measure, rollback
+from documents.models import Document
+from documents.scraping import ingest_documents, parse_documents
+
+
+def legacy_ingest(items, doc_date):
+    """
+    Previous ingestion path: one get_or_create per item.
+    Kept here only as a benchmark baseline.
+    """
+    count = 0
+    for item in items:
+        _, created = Document.objects.get_or_create(
+            number=item["number"],
+            date=doc_date,
+            defaults={
+                "title": item["title"],
+                "status": "Publicado",
+                "url": item["url"],
+            }
+        )
+        if created:
+            count += 1
+    return count
+
+
+class Command(BaseCommand):
+    help = "Compare the bulk ingestion path against per-item get_or_create."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=500,
+                            help="Number of li.dispo items in the synthetic summary.")
+
+    def handle(self, *args, **options):
+        items = parse_documents(build_summary_html(options["items"]))
+        doc_date = date(2000, 1, 1)
+
+        for name, ingest in (("legacy", legacy_ingest), ("bulk", ingest_documents)):
+            # First pass inserts everything, second pass is a no-op refresh.
+            with rollback():
+                with measure() as cold:
+                    ingest(items, doc_date)
+                with measure() as warm:
+                    ingest(items, doc_date)
+            self.stdout.write(
+                f"{name:>6}: insert {cold['seconds'] * 1000:8.1f} ms / {cold['queries']:5d} queries, "
+                f"re-run {warm['seconds'] * 1000:8.1f} ms / {warm['queries']:5d} queries"
+            )
@@ -0,0 +1,59 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.benchmarks import build_summary_html
+from documents.scraping import PARSERS, parse_documents
+
+
+class Command(BaseCommand):
+    help = "Compare parse time and peak memory of the BOE summary parser backends."
+
+    def add_arguments(self, parser):
+        parser.add_argument("pages", nargs="*",
+                            help="Saved BOE summary pages; synthetic pages are used if omitted.")
+        parser.add_argument("--items", type=int, nargs="+", default=[50, 300, 1000],
+                            help="Item counts of the synthetic pages.")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def load_pages(self, options):
+        if options["pages"]:
+            pages = []
+            for path in options["pages"]:
+                with open(path, "rb") as f:
+                    pages.append((path, f.read()))
+            return pages
+        return [
+            (f"synthetic-{count}", build_summary_html(count).encode())
+            for count in options["items"]
+        ]
+
+    def handle(self, *args, **options):
+        for name, content in self.load_pages(options):
+            self.stdout.write(f"{name} ({len(content) / 1024:.0f} KiB)")
+            reference = None
+            for backend in PARSERS:
+                try:
+                    items = parse_documents(content, backend)
+                except ImportError as e:
+                    self.stdout.write(f"  {backend:>9}: skipped ({e})")
+                    continue
+                if reference is None:
+                    reference = items
+                elif items != reference:
+                    raise CommandError(f"{backend} output differs from {next(iter(PARSERS))}")
+
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    parse_documents(content, backend)
+                elapsed = (time.perf_counter() - start) / options["repeat"]
+
+                tracemalloc.start()
+                parse_documents(content, backend)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f"  {backend:>9}: {elapsed * 1000:8.2f} ms, peak {peak / 1024:8.0f} KiB, {len(items)} items"
+                )
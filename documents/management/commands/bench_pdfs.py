@@ -0,0 +1,48 @@
+import tempfile
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from documents.benchmarks import PdfFixtureHandler, measure, rollback, serve
+from documents.contentstore import ContentStore
+from documents.models import Document
+from documents.pdfs import fetch_pdfs
+
+
+class Command(BaseCommand):
+    help = "Measure PDF fetch/extract throughput against a local fixture server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=500)
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 8],
+                            help="Worker counts to compare.")
+        parser.add_argument("--backend", default=None, help="Text extractor (PDF_TEXT_BACKEND by default).")
+        parser.add_argument("--latency", type=float, default=50,
+                            help="Simulated round trip per download, in ms.")
+
+    def handle(self, *args, **options):
+        PdfFixtureHandler.latency = options["latency"] / 1000
+        with serve(PdfFixtureHandler) as base_url:
+            for workers in options["workers"]:
+                with rollback(), tempfile.TemporaryDirectory() as root:
+                    Document.objects.bulk_create([
+                        Document(title=f"Documento {i}", number=f"BENCH-PDF-{i}", date=date(2000, 1, 1),
+                                 status="Publicado", url=f"{base_url}/pdfs/{i}.pdf")
+                        for i in range(options["docs"])
+                    ])
+                    documents = Document.objects.filter(number__startswith="BENCH-PDF-")
+                    store = ContentStore(root)
+
+                    with measure() as cold:
+                        totals = fetch_pdfs(documents, workers=workers, store=store, backend=options["backend"])
+                    start = time.perf_counter()
+                    rerun = fetch_pdfs(documents, workers=workers, store=store, backend=options["backend"])
+                    rerun_ms = (time.perf_counter() - start) * 1000
+
+                self.stdout.write(
+                    f"workers={workers:3d}: {totals['fetched']} PDFs in {cold['seconds']:.2f} s "
+                    f"({totals['fetched'] / cold['seconds']:.0f} docs/s, "
+                    f"{totals['bytes'] / 1e6 / cold['seconds']:.1f} MB/s, {cold['queries']} queries); "
+                    f"re-run {rerun_ms:.1f} ms, {rerun['skipped']} skipped"
+                )
@@ -0,0 +1,67 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from documents.benchmarks import rollback
+from documents.models import Document
+from documents.search import rank_documents, search_filter
+
+WORDS = (
+    "Resolución Orden Real Decreto Ley Anuncio Acuerdo Dirección General Ministerio "
+    "Hacienda Trabajo Economía Social Transportes Movilidad Sostenible Comunidad Autónoma "
+    "Andalucía Cataluña Galicia convocatoria subvenciones procedimiento modelo tributario "
+    "personal funcionario oposición nombramiento cese régimen jurídico contratación pública "
+    "medio ambiente energía vivienda educación sanidad cultura deporte agricultura pesca"
+).split()
+
+QUERIES = ["resolución", "Resolucion subvenciones", "contratacion publica", "energía vivienda", "expediente 4242"]
+
+
+class Command(BaseCommand):
+    help = "Compare full-text search latency against title__icontains."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=100_000,
+                            help="Synthetic documents to index (e.g. 1000000).")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def seed(self, count):
+        rng = random.Random(42)
+        start = date(2000, 1, 1)
+        batch = []
+        for i in range(count):
+            batch.append(Document(
+                title=" ".join(rng.choices(WORDS, k=12)) + f" expediente {rng.randrange(count)}",
+                number=f"BENCH-{i}",
+                date=start + timedelta(days=i // 300),
+                status="Publicado",
+                url="N/A",
+            ))
+            if len(batch) == 5000:
+                Document.objects.bulk_create(batch)
+                batch = []
+        Document.objects.bulk_create(batch)
+
+    def time_query(self, queryset, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            # First page, as rendered by document_list
+            list(queryset[:10])
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        with rollback():
+            start = time.perf_counter()
+            self.seed(options["docs"])
+            self.stdout.write(f"Seeded {options['docs']} documents in {time.perf_counter() - start:.1f} s")
+
+            for query in QUERIES:
+                like = Document.objects.filter(title__icontains=query).order_by("-date")
+                fts = rank_documents(Document.objects.filter(search_filter(query)), query)
+                self.stdout.write(
+                    f"{query!r:>26}: icontains {self.time_query(like, options['repeat']):8.1f} ms "
+                    f"({like.count()} hits), fts {self.time_query(fts, options['repeat']):8.1f} ms "
+                    f"({fts.count()} hits)"
+                )
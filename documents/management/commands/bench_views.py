@@ -0,0 +1,130 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from documents.benchmarks import (
+    build_summary_html, compare, load_results, percentiles, rollback, save_results,
+)
+from documents.factories import PREFIX
+from documents.models import Client, ClientDocumentPriority
+from documents.scraping import ingest_documents, parse_documents
+
+
+def _body(response):
+    if getattr(response, "streaming", False):
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmarks of ingestion and the main views on seeded data (see seed_benchmark)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--items", type=int, default=500, help="Items in the synthetic BOE summary.")
+        parser.add_argument("--warm-cache", action="store_true",
+                            help="Keep the fragment cache between runs (default: cold on every run).")
+        parser.add_argument("--only", nargs="+", help="Run only these cases.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Earlier --output file to compare p50 against.")
+
+    def cases(self, items):
+        """
+        Case name -> (setup, run): both run once per repetition inside a
+        rolled back transaction, only `run` is measured.
+        """
+        user = User.objects.filter(username=f"{PREFIX.lower()}-0").first()
+        if user is None:
+            raise CommandError("No seeded data: run `manage.py seed_benchmark` first.")
+        client = Client.objects.filter(customer=user).first()
+        priority = ClientDocumentPriority.objects.filter(client=client).first()
+        http = TestClient()
+        http.force_login(user)
+        htmx = {"HTTP_HX_REQUEST": "true"}
+        today = date.today()
+        html = build_summary_html(items)
+        parsed = parse_documents(html)
+        day = date(1900, 1, 1)
+
+        def ingest():
+            return ingest_documents(parsed, day)
+
+        cases = {
+            "parse": lambda: parse_documents(html),
+            "ingest": ingest,
+            "document_list": lambda: http.get(reverse("documents:list")),
+            "document_list_htmx": lambda: http.get(reverse("documents:list"), **htmx),
+            "document_list_search": lambda: http.get(reverse("documents:list") + "?q=resolucion", **htmx),
+            "document_list_type": lambda: http.get(reverse("documents:list") + "?type=orden", **htmx),
+            "export_csv": lambda: http.get(
+                reverse("documents:export_csv") + f"?date_from={today - timedelta(days=90)}&date_to={today}"
+            ),
+            "priority_list": lambda: http.get(reverse("documents:priority_list")),
+            "priority_list_htmx": lambda: http.get(reverse("documents:priority_list") + "?priority=alta", **htmx),
+            "client_documents": lambda: http.get(reverse("documents:client_documents", args=[client.pk])),
+            "update_priority": lambda: http.post(
+                reverse("documents:update_priority", args=[client.pk, priority.document_id]),
+                {"priority": "baja" if priority.priority == "alta" else "alta"}, **htmx,
+            ),
+        }
+        cases = {name: (None, run) for name, run in cases.items()}
+        # A refresh of a day that is already stored
+        cases["ingest_unchanged"] = (ingest, ingest)
+        return cases
+
+    def measure(self, setup, run, repeat, warm_cache):
+        timings, queries, size = [], 0, 0
+        for i in range(repeat + 1):  # the first run only warms up
+            if not warm_cache:
+                cache.clear()
+            with rollback():
+                if setup:
+                    setup()
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    result = run()
+                    if hasattr(result, "status_code"):
+                        if result.status_code >= 400:
+                            raise CommandError(f"HTTP {result.status_code}")
+                        size = len(_body(result))
+                    elapsed = (time.perf_counter() - start) * 1000
+            if i:
+                timings.append(elapsed)
+                queries = len(ctx.captured_queries)
+        stats = percentiles(timings)
+        return {
+            "runs": repeat,
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            **{key: round(value, 3) for key, value in stats.items()},
+            "queries": queries,
+            "bytes": size,
+        }
+
+    def handle(self, *args, **options):
+        baseline = load_results(options["baseline"])["results"] if options["baseline"] else {}
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for name, (setup, run) in self.cases(options["items"]).items():
+                if options["only"] and name not in options["only"]:
+                    continue
+                stats = self.measure(setup, run, options["repeat"], options["warm_cache"])
+                results[name] = stats
+                self.stdout.write(
+                    f"{name:>22}: p50 {stats['p50']:8.2f} ms"
+                    f"{compare(stats['p50'], baseline.get(name, {}).get('p50')):8}, "
+                    f"p95 {stats['p95']:8.2f} ms, p99 {stats['p99']:8.2f} ms, "
+                    f"{stats['queries']:3d} queries"
+                )
+
+        if options["output"]:
+            params = {key: options[key] for key in ("repeat", "items", "warm_cache")}
+            save_results(options["output"], "views", params, results)
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from documents.enrichment import backfill
+
+
+class Command(BaseCommand):
+    help = "Classify stored documents and extract their references in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows read and updated per batch.")
+        parser.add_argument("--all", action="store_true", dest="everything",
+                            help="Re-enrich every document, not only the ones never enriched.")
+
+    def handle(self, *args, **options):
+        def report(totals):
+            self.stdout.write(f"batch {totals['batches']}: {totals['processed']} processed, {totals['updated']} updated")
+
+        totals = backfill(options["batch_size"], everything=options["everything"], on_batch=report)
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['processed']} document(s) processed in {totals['batches']} batch(es), "
+            f"{totals['updated']} updated"
+        ))
@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents import httpclient
+from documents.backfill import parse_day
+from documents.models import Document
+from documents.pdfs import EXTRACTORS, fetch_pdfs
+
+
+class Command(BaseCommand):
+    help = "Download the PDFs of stored documents, extract their text and index it for search."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=parse_day, default=None,
+                            help="First day (YYYY-MM-DD), today by default.")
+        parser.add_argument("--to", dest="end", type=parse_day, default=None,
+                            help="Last day, included (YYYY-MM-DD), --from by default.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Concurrent downloads (PDF_WORKERS by default).")
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--backend", choices=sorted(EXTRACTORS), default=None,
+                            help="Text extractor (PDF_TEXT_BACKEND by default).")
+        parser.add_argument("--force", action="store_true",
+                            help="Fetch again documents whose content is already stored.")
+
+    def handle(self, *args, **options):
+        start = options["start"] or date.today()
+        end = options["end"] or start
+        if start > end:
+            raise CommandError("--from must not be after --to")
+
+        totals = fetch_pdfs(
+            Document.objects.filter(date__range=(start, end)),
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            force=options["force"],
+            backend=options["backend"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['fetched']} PDF(s) fetched ({totals['bytes'] / 1e6:.1f} MB, "
+            f"{totals['deduplicated']} duplicate(s)), {totals['skipped']} already stored, "
+            f"{totals['failed']} failed"
+        ))
+        for line in httpclient.format_metrics():
+            self.stdout.write(line)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from documents import fragments
+
+
+class Command(BaseCommand):
+    help = "Report the hit ratio of the HTMX fragment cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true",
+                            help="Reset the counters after reporting.")
+
+    def handle(self, *args, **options):
+        stats = fragments.stats()
+        ratio = "n/a" if stats["ratio"] is None else f"{stats['ratio']:.1%}"
+        self.stdout.write(f"hits={stats['hits']} misses={stats['misses']} hit ratio={ratio}")
+        if options["reset"]:
+            fragments.reset_stats()
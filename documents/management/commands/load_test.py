@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from datetime import date
+
+import httpx
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+from documents.analysis import content_hash, get_analyzer
+from documents.benchmarks import ChatFixtureHandler, compare, load_results, percentiles, save_results, serve
+from documents.factories import PREFIX
+from documents.models import AnalysisCache, Client, ClientDocumentPriority, Document
+
+HTMX = {"HX-Request": "true"}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = "Load-test the app under several server workers and report latency percentiles and RPS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi",
+                            help="Deployment mode (SERVER_MODE in gunicorn.conf.py).")
+        parser.add_argument("--scenario", choices=["browse", "analysis"], default="browse",
+                            help="browse: weighted mix of the main pages; analysis: uncached "
+                                 "analyze_document calls against a slow fake model.")
+        parser.add_argument("--model-latency", type=float, default=200,
+                            help="analysis scenario: fake model response time, in ms.")
+        parser.add_argument("--workers", type=int, default=2, help="Server worker processes.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight.")
+        parser.add_argument("--duration", type=float, default=10, help="Measured seconds.")
+        parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds first.")
+        parser.add_argument("--url", help="Load an already running server instead of starting gunicorn.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Earlier --output file to compare RPS and p95 against.")
+
+    def session_cookie(self):
+        """
+        Log the first seeded customer in, like `Client.force_login`.
+        """
+        user = User.objects.filter(username=f"{PREFIX.lower()}-0").first()
+        if user is None:
+            raise CommandError("No seeded data: run `manage.py seed_benchmark` first.")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return user, {settings.SESSION_COOKIE_NAME: session.session_key}
+
+    def browse(self, user):
+        """
+        Weighted request mix: (name, method, path, headers, data).
+        """
+        client = Client.objects.filter(customer=user).first()
+        priority = ClientDocumentPriority.objects.filter(client=client).first()
+        documents = reverse("documents:list")
+        priorities = reverse("documents:priority_list")
+        mix = [
+            (4, ("document_list", "GET", documents, {}, None)),
+            (4, ("document_list_htmx", "GET", documents, HTMX, None)),
+            (2, ("document_list_search", "GET", documents + "?q=resolucion", HTMX, None)),
+            (2, ("document_list_type", "GET", documents + "?type=orden", HTMX, None)),
+            (2, ("priority_list", "GET", priorities, {}, None)),
+            (2, ("priority_list_htmx", "GET", priorities + "?priority=alta", HTMX, None)),
+            (1, ("client_documents", "GET", reverse("documents:client_documents", args=[client.pk]), {}, None)),
+            (1, ("export_csv", "GET", reverse("documents:export_csv"), {}, None)),
+            (1, ("update_priority", "POST",
+                 reverse("documents:update_priority", args=[client.pk, priority.document_id]),
+                 HTMX, {"priority": priority.priority})),
+        ]
+        return [request for weight, request in mix for _ in range(weight)]
+
+    @contextmanager
+    def analysis_documents(self, count):
+        """
+        Create `count` of today's documents with distinct titles, so every
+        analysis is a cache miss; yields their ids and deletes them after.
+        """
+        Document.objects.bulk_create([
+            Document(number=f"{PREFIX}-LOAD-{n}", date=date.today(), status="Publicado", url="N/A",
+                     title=f"Resolución de carga {n} del Ministerio de Hacienda.")
+            for n in range(count)
+        ])
+        documents = Document.objects.filter(number__startswith=f"{PREFIX}-LOAD-")
+        try:
+            yield list(documents.values_list("id", flat=True))
+        finally:
+            analyzer = get_analyzer("openai")  # the one the analysis scenario serves
+            hashes = [content_hash(document, analyzer) for document in documents.only(*analyzer.fields)]
+            AnalysisCache.objects.filter(content_hash__in=hashes, analyzer=analyzer.key).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {Document._meta.db_table} WHERE number LIKE %s", [f"{PREFIX}-LOAD-%"],
+                )
+
+    async def drive(self, base_url, cookies, plan, concurrency, warmup, duration):
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, cookies=cookies, limits=limits, timeout=30) as http:
+            measure_from = time.perf_counter() + warmup
+            stop_at = measure_from + duration
+
+            async def user():
+                while (now := time.perf_counter()) < stop_at:
+                    name, method, path, headers, data = next(plan)
+                    try:
+                        response = await http.request(method, path, headers=headers, data=data)
+                        await response.aread()
+                        failed = response.status_code >= 400
+                    except httpx.HTTPError:
+                        failed = True
+                    if now >= measure_from:
+                        if failed:
+                            errors[name] += 1
+                        else:
+                            samples[name].append((time.perf_counter() - now) * 1000)
+
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+        return samples, errors
+
+    def start_server(self, mode, workers, env):
+        port = _free_port()
+        command = [
+            sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py",
+            "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning",
+        ]
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE, "SERVER_MODE": mode, **env}
+        server = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR)
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(base_url + settings.LOGIN_URL, timeout=1)
+                return server, base_url
+            except httpx.HTTPError:
+                if server.poll() is not None:
+                    raise CommandError("The server exited during startup.")
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError("The server did not start within 30 s.")
+
+    def handle(self, *args, **options):
+        user, cookies = self.session_cookie()
+        with ExitStack() as stack:
+            server_env = {}
+            if options["scenario"] == "analysis":
+                ChatFixtureHandler.latency = options["model_latency"] / 1000
+                server_env = {"ANALYZER": "openai", "ANALYZER_URL": stack.enter_context(serve(ChatFixtureHandler))}
+                # More documents than the run can possibly analyze
+                ids = stack.enter_context(self.analysis_documents(20_000))
+                names = ["analyze_document"]
+                plan = (
+                    ("analyze_document", "GET", reverse("documents:analyze_document", args=[pk]), {}, None)
+                    for pk in ids
+                )
+            else:
+                requests = self.browse(user)
+                names = list(dict.fromkeys(request[0] for request in requests))
+                plan = itertools.cycle(requests)
+
+            base_url = options["url"]
+            if not base_url:
+                server, base_url = self.start_server(options["server"], options["workers"], server_env)
+                stack.callback(server.wait)
+                stack.callback(server.terminate)
+            samples, errors = asyncio.run(self.drive(
+                base_url, cookies, plan, options["concurrency"], options["warmup"], options["duration"],
+            ))
+
+        baseline = load_results(options["baseline"])["results"] if options["baseline"] else {}
+        results = {}
+        for name in names:
+            stats = percentiles(samples[name])
+            results[name] = {
+                "requests": len(samples[name]),
+                "errors": errors[name],
+                "rps": round(len(samples[name]) / options["duration"], 1),
+                **{key: round(value, 2) for key, value in stats.items()},
+            }
+        every = [latency for latencies in samples.values() for latency in latencies]
+        results["total"] = {
+            "requests": len(every),
+            "errors": sum(errors.values()),
+            "rps": round(len(every) / options["duration"], 1),
+            **{key: round(value, 2) for key, value in percentiles(every).items()},
+        }
+
+        for name, stats in results.items():
+            old = baseline.get(name, {})
+            self.stdout.write(
+                f"{name:>22}: {stats['rps']:7.1f} rps{compare(stats['rps'], old.get('rps')):8}, "
+                f"p50 {stats['p50']:7.1f} ms, p95 {stats['p95']:7.1f} ms"
+                f"{compare(stats['p95'], old.get('p95')):8}, p99 {stats['p99']:7.1f} ms, {stats['errors']} errors"
+            )
+
+        if options["output"]:
+            params = {
+                key: options[key]
+                for key in ("server", "scenario", "workers", "concurrency", "duration", "model_latency", "url")
+            }
+            save_results(options["output"], "load", params, results)
+            self.stdout.write(f"Results written to {options['output']}")
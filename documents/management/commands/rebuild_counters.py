@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from documents.counters import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized priority counters and fix any drift"
+
+    def handle(self, *args, **options):
+        clients, counters = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Counters reconciled: {clients} client(s) and {counters} priority counter(s) corrected"
+        ))
@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.jobs import poll
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Poll the BOE summary on a fixed cadence and ingest what changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=settings.BOE_POLL_INTERVAL,
+                            help="Seconds between polls (BOE_POLL_INTERVAL).")
+        parser.add_argument("--days", type=int, default=settings.BOE_POLL_DAYS,
+                            help="Days polled, counting back from today (BOE_POLL_DAYS).")
+        parser.add_argument("--once", action="store_true",
+                            help="Poll once and exit.")
+
+    def handle(self, *args, **options):
+        next_run = time.monotonic()
+        while True:
+            try:
+                jobs = poll(options["days"])
+            except Exception:
+                # A failed poll (e.g. the database briefly unavailable)
+                # must not stop the scheduler; the next one retries.
+                logger.exception("BOE poll failed")
+                jobs = []
+            for job in jobs:
+                if job.status == "done":
+                    result = job.result
+                    self.stdout.write(
+                        f"{job.day}: {result['inserted']} inserted, {result['updated']} updated"
+                        f"{' (unchanged)' if result.get('cache') == 'hit' else ''}"
+                    )
+                else:
+                    self.stdout.write(f"{job.day}: {job.get_status_display()} {job.error}".rstrip())
+            if options["once"]:
+                return
+            # Fixed cadence; a poll that overran starts the next one at once
+            next_run = max(next_run + options["interval"], time.monotonic())
+            time.sleep(max(0, next_run - time.monotonic()))
@@ -0,0 +1,37 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents import httpclient
+from documents.jobs import run_pending_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Process queued BOE refresh jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                count = run_pending_jobs()
+            except Exception:
+                # Failing jobs are recorded by run_job; this is the queue
+                # itself (e.g. the database briefly unavailable). Keep the
+                # worker alive and retry after the usual sleep.
+                logger.exception("Refresh queue failed")
+                count = 0
+            if count:
+                self.stdout.write(f"Processed {count} refresh job(s)")
+                for line in httpclient.format_metrics():
+                    self.stdout.write(f"  {line}")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.factories import clear_seed, seed
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic documents, clients and priorities for benchmarks and load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=10_000, help="e.g. 1000 to 1000000.")
+        parser.add_argument("--customers", type=int, default=10)
+        parser.add_argument("--clients", type=int, default=1000)
+        parser.add_argument("--priorities", type=int, default=20, help="Assigned documents per client.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded rows first.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            self.stdout.write(f"Deleted {clear_seed()} seeded documents")
+
+        def progress(kind, done):
+            if kind == "documents" and done % 100_000 == 0:
+                self.stdout.write(f"  {done} documents")
+
+        start = time.perf_counter()
+        created = seed(
+            documents=options["documents"],
+            customers=options["customers"],
+            clients=options["clients"],
+            priorities=options["priorities"],
+            seed=options["seed"],
+            on_batch=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {created['documents']} documents, {created['customers']} customers, "
+            f"{created['clients']} clients and {created['priorities']} priorities "
+            f"in {time.perf_counter() - start:.1f} s (log in as seed-0 / seed)"
+        ))
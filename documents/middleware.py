@@ -0,0 +1,104 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Warn when the same statement runs this many times in one request.
+DUPLICATE_THRESHOLD = 3
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """
+    Normalize a statement so the same query with different parameters
+    (or IN-lists of different length) maps to the same fingerprint.
+    """
+    return _SPACES.sub(" ", _IN_LIST.sub("IN (...)", sql)).strip()
+
+
+class QueryRecorder:
+    """
+    `connection.execute_wrapper` callable collecting query count, total
+    DB time and statement fingerprints.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """
+        Fingerprints executed more than once, most repeated first.
+        """
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n > 1]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the SQL issued while building each response.
+    - Adds a `Server-Timing` header with query count and DB time, plus
+      the number of repeated statements (likely N+1 patterns).
+    - Logs a warning when a statement repeats DUPLICATE_THRESHOLD times.
+    - Streaming responses only account for queries run before the first
+      chunk is produced.
+    - Sync and async: under ASGI the recorder is installed on the
+      connection of the request's thread-sensitive worker thread, where
+      sync views and the async ORM run their queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        return self._finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        wrappers = ExitStack()
+        await sync_to_async(lambda: wrappers.enter_context(connection.execute_wrapper(recorder)))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+        return self._finish(request, response, recorder)
+
+    def _finish(self, request, response, recorder):
+        duplicates = recorder.duplicates
+        metrics = [f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"']
+        if duplicates:
+            metrics.append(f'db-dup;desc="{sum(n - 1 for _, n in duplicates)} repeated"')
+        response["Server-Timing"] = ", ".join(metrics)
+
+        for sql, n in duplicates:
+            if n >= DUPLICATE_THRESHOLD:
+                logger.warning("%s %s ran %d times: %s", request.method, request.path, n, sql)
+
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:30
+
+import django.db.models.deletion
+import documents.models
+import documents.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_summarycache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSearch',
+            fields=[
+                ('document', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='documents.document')),
+                ('title', documents.models.SearchTextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'documents_document_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(documents.search.install, documents.search.uninstall),
+    ]
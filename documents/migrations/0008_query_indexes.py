@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clientdocumentpriority',
+            index=models.Index(fields=['client', 'created_at', 'id'], name='cdp_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientdocumentpriority',
+            index=models.Index(fields=['client', 'priority', 'created_at'], name='cdp_client_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['date', 'id'], name='document_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refreshjob',
+            index=models.Index(fields=['status', 'created_at'], name='refreshjob_status_created_idx'),
+        ),
+    ]
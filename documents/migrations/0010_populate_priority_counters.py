@@ -0,0 +1,15 @@
+import documents.counters
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Separate from 0009: the counters' unique constraint, which the
+    # populate upsert relies on, only exists once 0009 has finished.
+
+    dependencies = [
+        ('documents', '0009_priority_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(documents.counters.populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:50
+
+import documents.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_populate_priority_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='department',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='doc_type',
+            field=models.CharField(choices=[('ley_organica', 'Ley Orgánica'), ('ley', 'Ley'), ('real_decreto_ley', 'Real Decreto-ley'), ('real_decreto', 'Real Decreto'), ('decreto', 'Decreto'), ('orden', 'Orden'), ('resolucion', 'Resolución'), ('acuerdo', 'Acuerdo'), ('anuncio', 'Anuncio'), ('correccion', 'Corrección de errores'), ('otro', 'Documento')], default='otro', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='references',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['doc_type', 'date', 'id'], name='document_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['department'], name='document_department_idx'),
+        ),
+        # Adding columns rebuilds documents_document on SQLite, dropping
+        # the full-text triggers.
+        migrations.RunPython(documents.search.install, migrations.RunPython.noop),
+    ]
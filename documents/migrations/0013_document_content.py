@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:00
+
+import django.db.models.deletion
+import documents.models
+import documents.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0012_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentContent',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='documents.document')),
+                ('pdf_hash', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('pages', models.PositiveIntegerField(default=0)),
+                ('text', models.TextField(blank=True)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DocumentContentSearch',
+            fields=[
+                ('content', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='documents.documentcontent')),
+                ('text', documents.models.SearchTextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'documents_documentcontent_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(documents.search.install_content, documents.search.uninstall_content),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:28
+
+import hashlib
+
+import django.db.models.deletion
+import documents.search
+from django.db import migrations, models
+
+# Frozen copies of scraping.FIELDS and scraping.record_hash as of this
+# migration, so replaying it never depends on later changes to them.
+FIELDS = ('title', 'url', 'department', 'status')
+
+
+def record_hash(record):
+    return hashlib.sha256('\x1f'.join(record[field] for field in FIELDS).encode()).hexdigest()
+
+
+def hash_documents(apps, schema_editor):
+    # Existing rows would otherwise all look changed on their next refresh
+    Document = apps.get_model('documents', 'Document')
+    batch = []
+    for doc in Document.objects.only('id', *FIELDS).iterator(chunk_size=2000):
+        doc.content_hash = record_hash({field: getattr(doc, field) for field in FIELDS})
+        batch.append(doc)
+        if len(batch) == 2000:
+            Document.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    Document.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0013_document_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        # Adding columns rebuilds documents_document on SQLite, dropping
+        # the full-text triggers.
+        migrations.RunPython(documents.search.install, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='DocumentChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('created', 'Nuevo'), ('updated', 'Actualizado')], max_length=10)),
+                ('changes', models.JSONField(blank=True, default=dict)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='documents.document')),
+            ],
+            options={
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['changed_at'], name='documentchange_changed_idx')],
+            },
+        ),
+        migrations.RunPython(hash_documents, migrations.RunPython.noop),
+    ]
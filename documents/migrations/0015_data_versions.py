@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:43
+
+import time
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    # Pages cached before the upgrade must not match the new stamps
+    DataVersion = apps.get_model('documents', 'DataVersion')
+    DataVersion.objects.bulk_create([
+        DataVersion(namespace=namespace, version=time.time_ns()) for namespace in ('documents', 'priorities')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0014_document_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('namespace', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
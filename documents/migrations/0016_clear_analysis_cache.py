@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+def clear_analysis_cache(apps, schema_editor):
+    # Keys were hashed from the title alone; no current key can match them
+    apps.get_model('documents', 'AnalysisCache').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0015_data_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_analysis_cache, migrations.RunPython.noop),
+    ]
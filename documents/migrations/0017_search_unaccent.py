@@ -0,0 +1,15 @@
+import documents.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # PostgreSQL only: match titles and texts regardless of accents, as
+    # the SQLite FTS5 tables already do.
+
+    dependencies = [
+        ('documents', '0016_clear_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(documents.search.reindex_unaccent, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Lookup
+
+from .enrichment import DOC_TYPE_CHOICES, OTHER
 
 
 class Document(models.Model):
@@ -8,14 +11,125 @@ class Document(models.Model):
     date = models.DateField()
     status = models.CharField(max_length=100)
     url = models.URLField()
+    # Filled once at ingest by enrichment.enrich (backfill: enrich_documents)
+    doc_type = models.CharField(max_length=20, choices=DOC_TYPE_CHOICES, default=OTHER)
+    references = models.JSONField(default=list, blank=True)
+    word_count = models.PositiveIntegerField(default=0)
+    department = models.CharField(max_length=255, blank=True)
+    # scraping.record_hash of the scraped fields, to find changed rows
+    content_hash = models.CharField(max_length=64, blank=True)
 
     class Meta:
         unique_together = ("number", "date")
+        indexes = [
+            # document_list / export: filter by date range, keyset on (date, id)
+            models.Index(fields=["date", "id"], name="document_date_id_idx"),
+            # document_list filtered by type, keyset on (date, id); type facets
+            models.Index(fields=["doc_type", "date", "id"], name="document_type_date_idx"),
+            models.Index(fields=["department"], name="document_department_idx"),
+        ]
 
     def __str__(self):
         return f"{self.number} - {self.title}"
 
 
+class DocumentChange(models.Model):
+    """
+    Change log written by `scraping.ingest_documents`: one row per
+    inserted document, and per document whose scraped fields changed,
+    with their `[old, new]` values.
+    """
+    CREATED = "created"
+    UPDATED = "updated"
+    KIND_CHOICES = [
+        (CREATED, "Nuevo"),
+        (UPDATED, "Actualizado"),
+    ]
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="changes")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    changes = models.JSONField(default=dict, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-changed_at"]
+        indexes = [
+            models.Index(fields=["changed_at"], name="documentchange_changed_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id} {self.get_kind_display()} ({self.changed_at:%Y-%m-%d %H:%M})"
+
+
+class SearchTextField(models.TextField):
+    """
+    Column of a full-text index; supports the `match` lookup.
+    """
+
+
+@SearchTextField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+class DocumentSearch(models.Model):
+    """
+    SQLite FTS5 index over Document titles (see migration 0007).
+    - Kept in sync with `documents_document` by triggers, so bulk inserts
+      and updates are indexed too.
+    - Accent- and case-insensitive: "Resolucion" matches "Resolución".
+    """
+    document = models.OneToOneField(
+        Document, on_delete=models.DO_NOTHING, primary_key=True,
+        db_column='rowid', related_name='search',
+    )
+    title = SearchTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'documents_document_fts'
+
+
+class DocumentContent(models.Model):
+    """
+    Text of a document's PDF (see pdfs.py); the file itself lives in the
+    content store under `pdf_hash`.
+    - Kept out of Document so list queries never load the text.
+    """
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name='content')
+    pdf_hash = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveIntegerField(default=0)
+    pages = models.PositiveIntegerField(default=0)
+    text = models.TextField(blank=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.document_id} ({self.pdf_hash[:12]})"
+
+
+class DocumentContentSearch(models.Model):
+    """
+    SQLite FTS5 index over DocumentContent texts (see migration 0013),
+    kept in sync by triggers like DocumentSearch.
+    """
+    content = models.OneToOneField(
+        DocumentContent, on_delete=models.DO_NOTHING, primary_key=True,
+        db_column='rowid', related_name='search',
+    )
+    text = SearchTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'documents_documentcontent_fts'
+
+
 class ClientDocumentPriority(models.Model):
     PRIORITY_CHOICES = [
         ('alta', 'Alta'),
@@ -31,6 +145,12 @@ class ClientDocumentPriority(models.Model):
     class Meta:
         unique_together = ('client', 'document')
         ordering = ['-created_at']
+        indexes = [
+            # Priority dashboard: client filter, keyset on (created_at, id)
+            models.Index(fields=['client', 'created_at', 'id'], name='cdp_client_created_idx'),
+            # Priority dashboard filtered by priority
+            models.Index(fields=['client', 'priority', 'created_at'], name='cdp_client_priority_idx'),
+        ]
     
     def __str__(self):
         return f"{self.client.name} - {self.document.title} ({self.get_priority_display()})"
@@ -40,6 +160,111 @@ class Client(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     documents = models.ManyToManyField(Document, through='ClientDocumentPriority', blank=True)
+    # Denormalized number of assigned documents, maintained by counters.py
+    document_count = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
+
+
+class RefreshJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En curso'),
+        ('done', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    day = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # run_worker: oldest pending job first
+            models.Index(fields=['status', 'created_at'], name='refreshjob_status_created_idx'),
+        ]
+        constraints = [
+            # At most one queued/running refresh per BOE day: concurrent
+            # clicks coalesce onto the same job.
+            models.UniqueConstraint(
+                fields=['day'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_refresh_job_per_day',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class SummaryCache(models.Model):
+    """
+    Validators and content hash of the last processed BOE summary page.
+    """
+    url = models.URLField(unique=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    hits = models.PositiveIntegerField(default=0)
+    misses = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+
+class PriorityCounter(models.Model):
+    """
+    Denormalized number of ClientDocumentPriority rows per customer and
+    priority, maintained by counters.py.
+    """
+    customer = models.ForeignKey(User, on_delete=models.CASCADE)
+    priority = models.CharField(max_length=5, choices=ClientDocumentPriority.PRIORITY_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('customer', 'priority')
+
+    def __str__(self):
+        return f"{self.customer} - {self.priority}: {self.count}"
+
+
+class AnalysisCache(models.Model):
+    """
+    Result of one analyzer version for one document content hash
+    (see analysis.py).
+    """
+    content_hash = models.CharField(max_length=64)
+    analyzer = models.CharField(max_length=100)
+    result = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'analyzer')
+
+    def __str__(self):
+        return f"{self.analyzer} {self.content_hash[:12]}"
+
+
+class DataVersion(models.Model):
+    """
+    Version stamp of a data set (e.g. "documents"), bumped on every write
+    to it by fragments.py and shared by every process through the
+    database.
+    """
+    namespace = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.namespace}: {self.version}"
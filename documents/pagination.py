@@ -0,0 +1,133 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with `WHERE (key) < (last key seen) ORDER BY key LIMIT n`
+instead of `OFFSET`, so page 1000 costs the same as page 1 when the keys
+are indexed. Cursors are signed, opaque tokens.
+"""
+import hashlib
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+SALT = "documents.pagination"
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset, exposing the bits the
+    pagination templates need.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, count=None):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+
+def encode_cursor(values, direction):
+    return signing.dumps({"k": values, "d": direction}, salt=SALT, compress=True)
+
+
+def decode_cursor(token):
+    """
+    Returns:
+        tuple[list, str] | None: Key values and direction, or None if the
+        token is missing or was tampered with.
+    """
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=SALT)
+        return data["k"], data["d"]
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def _after(keys, values, descending):
+    """
+    Q object for rows strictly after `values` in the (keys) ordering,
+    e.g. `date < d OR (date = d AND id < i)` for descending keys.
+    """
+    op = "lt" if descending else "gt"
+    condition = Q()
+    for i in reversed(range(len(keys))):
+        equal = {keys[j]: values[j] for j in range(i)}
+        condition = Q(**equal, **{f"{keys[i]}__{op}": values[i]}) | condition
+    return condition
+
+
+def _key_values(obj, keys):
+    values = []
+    for key in keys:
+        value = getattr(obj, key)
+        values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+    return values
+
+
+def cached_count(queryset, timeout=60):
+    """
+    `queryset.count()` memoized in the cache for `timeout` seconds.
+    - Good enough for a "~N results" label without a COUNT(*) per page.
+    """
+    key = "keyset-count:" + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, timeout)
+
+
+def keyset_paginate(queryset, cursor=None, keys=("date", "id"), per_page=10, descending=True, count=False):
+    """
+    Return the page of `queryset` designated by `cursor`.
+    - `keys` must identify rows uniquely (end with the primary key).
+    - `count=True` adds a cached total count to the page.
+    Returns:
+        KeysetPage
+    """
+    model = queryset.model
+    total = cached_count(queryset) if count else None
+    decoded = decode_cursor(cursor)
+    direction = "next"
+
+    if decoded:
+        raw_values, direction = decoded
+        values = [model._meta.get_field(key).to_python(value) for key, value in zip(keys, raw_values)]
+        # Walking backwards flips the comparison and the ordering.
+        desc = descending if direction == "next" else not descending
+        queryset = queryset.filter(_after(keys, values, desc))
+    else:
+        desc = descending
+
+    ordering = [f"-{key}" if desc else key for key in keys]
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == "prev":
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, decoded is not None
+
+    next_cursor = encode_cursor(_key_values(rows[-1], keys), "next") if rows and has_next else None
+    previous_cursor = encode_cursor(_key_values(rows[0], keys), "prev") if rows and has_previous else None
+
+    return KeysetPage(rows, has_next, has_previous, next_cursor, previous_cursor, count=total)
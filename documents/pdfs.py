@@ -0,0 +1,222 @@
+"""
+PDF download and text extraction pipeline.
+
+- `fetch_pdfs` downloads the PDFs of a set of documents through the
+  shared HTTP client (httpclient.py) on a bounded thread pool, into the
+  content store (contentstore.py); documents whose content was already fetched are
+  skipped, and identical files are stored and extracted once.
+- Text is extracted page by page from the memory-mapped file, with
+  `pypdf` when installed (`settings.PDF_TEXT_BACKEND`, "auto" by
+  default) or a built-in extractor for simple text PDFs otherwise.
+- The text is saved in DocumentContent, whose full-text index makes it
+  searchable together with the titles (see `search.py`).
+"""
+import logging
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from django.conf import settings
+from django.db import transaction
+
+from . import fragments
+from .contentstore import ContentStore
+from .httpclient import HttpClient
+from .models import DocumentContent
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Stream dictionary (one level of nested dictionaries) and its data
+_STREAM = re.compile(rb"<<((?:[^<>]|<<[^<>]*>>)*)>>\s*stream\r?\n(.*?)\r?\nendstream", re.S)
+_TEXT_OP = re.compile(rb"\((?:\\.|[^\\)])*\)\s*(?:Tj|'|\")|\[(?:\\.|[^\]])*\]\s*TJ|T\*|\bET\b", re.S)
+_STRING = re.compile(rb"\((?:\\.|[^\\)])*\)", re.S)
+_ESCAPE = re.compile(rb"\\([0-7]{1,3}|.)", re.S)
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def _unescape(match):
+    value = match.group(1)
+    if value[:1].isdigit():
+        return bytes([int(value, 8) & 0xFF])
+    return _ESCAPES.get(value, value if value != b"\n" else b"")
+
+
+def _decode(literal):
+    return _ESCAPE.sub(_unescape, literal[1:-1]).decode("cp1252", errors="replace")
+
+
+def _pages_raw(data):
+    """
+    Built-in extractor: text-showing operators of every content stream,
+    one item per stream.
+    - Handles uncompressed and FlateDecode streams with single-byte
+      fonts, which covers simple generated PDFs; embedded CID fonts
+      (most BOE PDFs) need `pypdf`.
+    """
+    for match in _STREAM.finditer(data):
+        header, body = match.groups()
+        if b"/Subtype" in header or b"/Length1" in header or b"/Type" in header:
+            continue  # images, fonts, object streams
+        if b"/FlateDecode" in header:
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                continue
+        elif b"/Filter" in header:
+            continue
+        parts = []
+        for op in _TEXT_OP.finditer(body):
+            token = op.group(0)
+            if token in (b"T*", b"ET"):
+                parts.append("\n")
+            else:
+                parts.extend(_decode(s.group(0)) for s in _STRING.finditer(token))
+        text = "".join(parts).strip()
+        if text:
+            yield text
+
+
+def _pages_pypdf(data):
+    from pypdf import PdfReader
+
+    reader = PdfReader(BytesIO(data) if isinstance(data, bytes) else data)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def _pages_auto(data):
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return _pages_raw(data)
+    return _pages_pypdf(data)
+
+
+EXTRACTORS = {
+    "raw": _pages_raw,
+    "pypdf": _pages_pypdf,
+    "auto": _pages_auto,
+}
+
+
+def extract_text(data, backend=None):
+    """
+    Extract the text of a PDF page by page.
+    - `data` is bytes or a memory map (see `ContentStore.open`).
+    - Stops adding pages once `settings.PDF_TEXT_MAX_CHARS` is reached.
+    Returns:
+        tuple[str, int]: The text and the number of pages read.
+    """
+    limit = settings.PDF_TEXT_MAX_CHARS
+    parts, size, pages = [], 0, 0
+    for text in EXTRACTORS[backend or settings.PDF_TEXT_BACKEND](data):
+        pages += 1
+        parts.append(text)
+        size += len(text)
+        if size >= limit:
+            break
+    return "\n\n".join(parts)[:limit], pages
+
+
+def _download(client, store, document):
+    try:
+        with client.stream("GET", document.url) as response:
+            response.raise_for_status()
+            digest, size, _ = store.write(response.iter_content(CHUNK_SIZE))
+        return document, digest, size
+    except (requests.RequestException, OSError) as e:
+        logger.warning("Download of %s failed: %s", document.url, e)
+        return document, None, 0
+
+
+def _extract(store, digest, backend):
+    try:
+        with store.open(digest) as data:
+            return digest, extract_text(data, backend)
+    except Exception as e:
+        # Malformed PDFs must not stop the batch.
+        logger.warning("Text extraction of %s failed: %s", digest, e)
+        return digest, None
+
+
+def pending_documents(documents, force=False):
+    """
+    Documents of `documents` with a PDF link, without the ones whose
+    content was already fetched unless `force`.
+    """
+    documents = documents.filter(url__endswith=".pdf").only("id", "url").order_by("id")
+    if not force:
+        documents = documents.filter(content__isnull=True)
+    return documents
+
+
+def fetch_pdfs(documents, workers=None, batch_size=200, force=False, store=None, backend=None):
+    """
+    Download, store and extract the PDFs of `documents`.
+    - Works in id batches of `batch_size`: the downloads of a batch run
+      on `workers` threads sharing one pooled HttpClient (at most
+      `settings.HTTP_MAX_PER_HOST` per host at a time), then the new
+      files are extracted on the same pool, and the batch is saved
+      with one `bulk_create`.
+    - Files whose hash already has extracted text (in the database or
+      earlier in the run) are not extracted again.
+    - Failed downloads/extractions are logged and retried by the next
+      run, since no content row is stored for them.
+    Returns:
+        dict: `fetched`, `skipped`, `deduplicated`, `failed` and `bytes`.
+    """
+    workers = workers or settings.PDF_WORKERS
+    store = store or ContentStore()
+    totals = {"fetched": 0, "skipped": 0, "deduplicated": 0, "failed": 0, "bytes": 0}
+    if not force:
+        totals["skipped"] = documents.filter(url__endswith=".pdf", content__isnull=False).count()
+    todo = pending_documents(documents, force)
+
+    texts = {}  # digest -> (text, pages)
+    used = set()
+    last_id = 0
+    with HttpClient(pool_size=workers) as client, ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(todo.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            downloads = list(pool.map(lambda doc: _download(client, store, doc), batch))
+            digests = {digest for _, digest, _ in downloads if digest} - set(texts)
+            for digest, text, pages in DocumentContent.objects.filter(
+                pdf_hash__in=digests
+            ).values_list("pdf_hash", "text", "pages"):
+                texts[digest] = (text, pages)
+                used.add(digest)
+            new = [digest for digest in digests if digest not in texts]
+            for digest, extracted in pool.map(lambda d: _extract(store, d, backend), new):
+                if extracted is not None:
+                    texts[digest] = extracted
+
+            rows = []
+            for document, digest, size in downloads:
+                if digest is None or digest not in texts:
+                    totals["failed"] += 1
+                    continue
+                text, pages = texts[digest]
+                rows.append(DocumentContent(document=document, pdf_hash=digest, size=size, pages=pages, text=text))
+                totals["bytes"] += size
+                totals["deduplicated"] += digest in used
+                used.add(digest)
+            totals["fetched"] += len(rows)
+            if rows:
+                with transaction.atomic():
+                    DocumentContent.objects.bulk_create(
+                        rows,
+                        update_conflicts=True,
+                        unique_fields=["document"],
+                        update_fields=["pdf_hash", "size", "pages", "text", "fetched_at"],
+                    )
+                    fragments.bump(fragments.DOCUMENTS)
+
+    return totals
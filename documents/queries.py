@@ -0,0 +1,117 @@
+from datetime import date
+
+from django.db.models import Count
+
+from . import counters
+from .enrichment import DOC_TYPE_CHOICES
+from .models import ClientDocumentPriority, Document
+from .search import search_filter
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def document_filters(params):
+    """
+    Read the document list filters from a GET QueryDict.
+    - `q`: full-text search on the title (see `search.py`).
+    - `date_from` / `date_to`: inclusive YYYY-MM-DD bounds; invalid
+      values are ignored.
+    - `type`: one of the document type choices, otherwise ignored.
+    Returns:
+        dict: `q`, `date_from`, `date_to` and `type` (None when absent).
+    """
+    doc_type = params.get("type")
+    return {
+        "q": params.get("q", ""),
+        "date_from": _parse_date(params.get("date_from")),
+        "date_to": _parse_date(params.get("date_to")),
+        "type": doc_type if doc_type in dict(DOC_TYPE_CHOICES) else None,
+    }
+
+
+def filter_documents(filters, queryset=None):
+    """
+    Apply `document_filters()` output to a Document queryset.
+    """
+    documents = Document.objects.all() if queryset is None else queryset
+    if filters["q"]:
+        documents = documents.filter(search_filter(filters["q"]))
+    if filters["date_from"]:
+        documents = documents.filter(date__gte=filters["date_from"])
+    if filters["date_to"]:
+        documents = documents.filter(date__lte=filters["date_to"])
+    if filters["type"]:
+        documents = documents.filter(doc_type=filters["type"])
+    return documents
+
+
+def type_facets(filters):
+    """
+    Number of documents per type under the current filters, ignoring
+    the type filter itself, with one grouped query on the type index.
+    Returns:
+        list[dict]: `value`, `label` and `count` of the types present,
+        in DOC_TYPE_CHOICES order.
+    """
+    counts = dict(
+        filter_documents({**filters, "type": None})
+        .order_by()
+        .values_list("doc_type")
+        .annotate(count=Count("id"))
+    )
+    return [
+        {"value": value, "label": label, "count": counts[value]}
+        for value, label in DOC_TYPE_CHOICES
+        if counts.get(value)
+    ]
+
+
+def priority_filters(params):
+    """
+    Read the priority dashboard filters from a GET QueryDict.
+    - `priority`: one of the priority choices, otherwise ignored.
+    - `client`: client id, ignored when not an integer.
+    - `search`: full-text search on the document title.
+    Returns:
+        dict: `priority`, `client` and `search` (None / "" when absent).
+    """
+    priority = params.get("priority")
+    try:
+        client = int(params.get("client"))
+    except (TypeError, ValueError):
+        client = None
+    return {
+        "priority": priority if priority in dict(ClientDocumentPriority.PRIORITY_CHOICES) else None,
+        "client": client,
+        "search": params.get("search", ""),
+    }
+
+
+def filter_priorities(user, filters):
+    """
+    The user's priorities matching `priority_filters()` output, newest
+    first, with client and document loaded.
+    """
+    priorities = ClientDocumentPriority.objects.filter(
+        client__customer=user
+    ).select_related("client", "document").order_by("-created_at")
+    if filters["priority"]:
+        priorities = priorities.filter(priority=filters["priority"])
+    if filters["client"] is not None:
+        priorities = priorities.filter(client_id=filters["client"])
+    if filters["search"]:
+        priorities = priorities.filter(search_filter(filters["search"], prefix="document__"))
+    return priorities
+
+
+def priority_summary(user):
+    """
+    Number of the user's priorities per priority value, e.g.
+    {"alta": 3, "media": 10}, read from the denormalized counters.
+    """
+    return counters.summary(user)
@@ -1,54 +1,354 @@
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+
+from asgiref.sync import async_to_sync, sync_to_async
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime
-from .models import Document
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from . import enrichment, fragments
+from .httpclient import get_client
+from .models import Document, DocumentChange, SummaryCache
 
 BASE_URL = "https://www.boe.es"
 
 
-def fetch_documents():
+def _record(title, href, department=None):
+    """
+    Build a document record from an item's title, PDF link and the
+    department heading (`h4`) it is listed under.
+    - Items without a PDF link get "N/A" as number and URL.
+    """
+    url_doc = BASE_URL + href if href else None
+
+    number = None
+    if url_doc and "BOE-A" in url_doc:
+        number = url_doc.split("/")[-1].replace(".pdf", "")
+
+    return {
+        "number": number or "N/A",
+        "title": title or "Sin título",
+        "url": url_doc or "N/A",
+        "department": (department or "")[:255],
+    }
+
+
+def _parse_soup(content):
+    """
+    Reference backend: full html.parser tree plus CSS selects per item.
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    items = []
+    department = None
+
+    for item in soup.select("h4, li.dispo"):
+        if item.name == "h4":
+            department = item.get_text().strip()
+            continue
+        title_tag = item.select_one("p")
+        pdf_tag = item.select_one(".puntoPDF a")
+        items.append(_record(
+            title_tag.text.strip() if title_tag else None,
+            pdf_tag['href'] if pdf_tag else None,
+            department,
+        ))
+
+    return items
+
+
+class _ItemStrainer(SoupStrainer):
+    """
+    Only build `li.dispo` subtrees and the department `h4` headings.
+    """
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        if name == "h4":
+            return True
+        return name == "li" and "dispo" in str((attrs or {}).get("class", "")).split()
+
+
+def _parse_strainer(content):
+    """
+    Default backend: html.parser restricted to `li.dispo` subtrees and
+    department headings.
+    - Page chrome and menus are never turned into tags.
+    """
+    soup = BeautifulSoup(content, "html.parser", parse_only=_ItemStrainer())
+    items = []
+    department = None
+
+    for item in soup.find_all(["h4", "li"], recursive=False):
+        if item.name == "h4":
+            department = item.get_text().strip()
+            continue
+        title_tag = item.find("p")
+        pdf_item = item.find("li", class_="puntoPDF")
+        pdf_tag = pdf_item.find("a", href=True) if pdf_item else None
+        items.append(_record(
+            title_tag.get_text().strip() if title_tag else None,
+            pdf_tag['href'] if pdf_tag else None,
+            department,
+        ))
+
+    return items
+
+
+def _parse_lxml(content):
+    """
+    Optional C backend; requires the `lxml` package.
+    """
+    from lxml import html as lxml_html
+
+    tree = lxml_html.fromstring(content)
+    items = []
+    department = None
+
+    for item in tree.xpath('//h4 | //li[contains(concat(" ", normalize-space(@class), " "), " dispo ")]'):
+        if item.tag == "h4":
+            department = item.text_content().strip()
+            continue
+        title_tag = item.find(".//p")
+        pdf_tags = [a for li in item.find_class("puntoPDF") for a in li.iter("a") if a.get("href")]
+        items.append(_record(
+            title_tag.text_content().strip() if title_tag is not None else None,
+            pdf_tags[0].get("href") if pdf_tags else None,
+            department,
+        ))
+
+    return items
+
+
+def _parse_auto(content):
+    """
+    lxml when installed, the strainer backend otherwise.
+    """
+    try:
+        return _parse_lxml(content)
+    except ImportError:
+        return _parse_strainer(content)
+
+
+PARSERS = {
+    "soup": _parse_soup,
+    "strainer": _parse_strainer,
+    "lxml": _parse_lxml,
+    "auto": _parse_auto,
+}
+
+
+def parse_documents(content, backend=None):
     """
-    Fetch today's BOE documents and save them into the database.
-    - Scrapes data from the BOE summary page for today's date.
-    - Creates new Document records if they do not already exist.
+    Parse a BOE summary page into plain document records.
+    - `content` may be the raw response bytes; the parser detects the
+      encoding itself, so the body is never decoded twice.
+    - `backend` is one of PARSERS, defaulting to `settings.BOE_PARSER`.
     Returns:
-        int: Number of new documents inserted.
+        list[dict]: Records with `number`, `title`, `url` and
+        `department` keys, in page order.
     """
-    # Use today's date for BOE URL
-    today_str = datetime.now().strftime('%Y/%m/%d')
-    url = f"{BASE_URL}/boe/dias/{today_str}/"
+    return PARSERS[backend or settings.BOE_PARSER](content)
 
-    response = requests.get(url, timeout=5)
+
+# Scraped fields of a document; the rest is derived from them.
+FIELDS = ("title", "url", "department", "status")
+DEFAULT_STATUS = "Publicado"
+
+
+def record_hash(record):
+    """
+    SHA-256 of the scraped FIELDS of `record` (a dict).
+    """
+    return hashlib.sha256("\x1f".join(record[field] for field in FIELDS).encode()).hexdigest()
+
+
+# Advisory lock namespace ("BOE") for `_lock_day`
+_LOCK_NAMESPACE = 0x424F45
+
+
+def _lock_day(doc_date):
+    """
+    Serialize the ingestion of `doc_date` until the transaction ends, so
+    the rows read at its start are the only ones a bulk insert can skip.
+    - PostgreSQL: a transaction-level advisory lock per day.
+    - SQLite needs nothing: transactions begin IMMEDIATE (settings), with
+      the database write lock held before the first read.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [_LOCK_NAMESPACE, doc_date.toordinal()])
+
+
+def ingest_documents(items, doc_date):
+    """
+    Save parsed BOE records for one day in a single set-based pass.
+    - Loads the number and `record_hash` of the existing rows for
+      `doc_date` with one query; records whose hash matches are skipped
+      without looking at their fields.
+    - Inserts new rows with one `bulk_create`, ignoring rows that a
+      concurrent writer may have inserted in the meantime; `inserted`
+      counts, and CREATED logs, only the rows this call added (see
+      `_lock_day`).
+    - Rewrites the scraped fields (title, URL, department and status,
+      "Publicado" unless the record has one) of rows whose hash changed.
+    - Every insert and real change is logged in DocumentChange, with one
+      `bulk_create`.
+    - Classification, references and word count are computed here, once
+      per stored title (see `enrichment.enrich`).
+    - Everything runs inside one transaction, so the SQLite write lock
+      is taken once per refresh instead of once per item.
+    Returns:
+        dict: `inserted`, `updated` and `skipped` counts.
+    """
+    # Later duplicates of the same number on a page are ignored, matching
+    # the previous get_or_create behaviour.
+    records = {}
+    for item in items:
+        records.setdefault(item["number"], {
+            "title": item["title"],
+            "url": item["url"],
+            "department": item.get("department", ""),
+            "status": item.get("status", DEFAULT_STATUS),
+        })
+    duplicates = len(items) - len(records)
+    hashes = {number: record_hash(record) for number, record in records.items()}
+
+    with transaction.atomic():
+        _lock_day(doc_date)
+        stored = dict(Document.objects.filter(date=doc_date).values_list("number", "content_hash"))
+        new = [number for number in records if number not in stored]
+        changed = [number for number in records if number in stored and stored[number] != hashes[number]]
+
+        to_create = [
+            Document(
+                number=number,
+                date=doc_date,
+                content_hash=hashes[number],
+                **records[number],
+                **enrichment.enrich(records[number]["title"]),
+            )
+            for number in new
+        ]
+        to_update = []
+        log = []
+        if changed:
+            for doc in Document.objects.filter(date=doc_date, number__in=changed).only("id", "number", *FIELDS):
+                record = records[doc.number]
+                diff = {
+                    field: [getattr(doc, field), value]
+                    for field, value in record.items() if getattr(doc, field) != value
+                }
+                for field, value in {**record, **enrichment.enrich(record["title"])}.items():
+                    setattr(doc, field, value)
+                doc.content_hash = hashes[doc.number]
+                to_update.append(doc)
+                # Rows hashed before a field was added only get their hash
+                if diff:
+                    log.append(DocumentChange(document=doc, kind=DocumentChange.UPDATED, changes=diff))
+
+        inserted = 0
+        if to_create:
+            last_id = Document.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+            Document.objects.bulk_create(to_create, ignore_conflicts=True)
+            # ignore_conflicts sets no pks and hides skipped rows: the day's
+            # rows past `last_id` are the ones this call added
+            created = list(Document.objects.filter(date=doc_date, id__gt=last_id).values_list("id", flat=True))
+            inserted = len(created)
+            log.extend(DocumentChange(document_id=pk, kind=DocumentChange.CREATED) for pk in created)
+        if to_update:
+            Document.objects.bulk_update(to_update, [*FIELDS, "content_hash", *enrichment.FIELDS])
+        if log:
+            DocumentChange.objects.bulk_create(log)
+        if to_create or to_update:
+            fragments.bump(fragments.DOCUMENTS)
+
+    return {
+        "inserted": inserted,
+        "updated": len(to_update),
+        "skipped": len(records) - inserted - len(to_update) + duplicates,
+    }
+
+
+def summary_url(day, base_url=BASE_URL):
+    """
+    URL of the BOE summary page for `day`.
+    """
+    return f"{base_url}/boe/dias/{day.strftime('%Y/%m/%d')}/"
+
+
+def _record_hit(entry, response):
+    """
+    Count a cache hit and keep the latest validators the server sent.
+    """
+    entry.etag = response.headers.get("ETag", entry.etag)
+    entry.last_modified = response.headers.get("Last-Modified", entry.last_modified)
+    entry.hits = F("hits") + 1
+    entry.save(update_fields=["etag", "last_modified", "hits", "updated_at"])
+
+
+async def afetch_documents(day=None, base_url=BASE_URL):
+    """
+    Fetch a day's BOE documents and save them into the database.
+    - Scrapes data from the BOE summary page for `day` (today by default).
+    - Sends the ETag/Last-Modified of the previous fetch; a 304, or a body
+      whose hash matches the last processed one, skips parsing and DB work.
+    - Creates new Document records in bulk if they do not already exist.
+    - The download goes through the shared HTTP client (httpclient.py:
+      keep-alive, retries, circuit breaker) in a worker thread, and the
+      bookkeeping through the async ORM; parsing and ingestion, which
+      need one transaction, run in a thread.
+    Returns:
+        dict: `inserted`, `updated` and `skipped` counts (all zero if the
+        page can't be fetched or is unchanged), plus `cache` ("hit"/"miss").
+    """
+    doc_date = day or datetime.now().date()
+    url = summary_url(doc_date, base_url)
+    unchanged = {"inserted": 0, "updated": 0, "skipped": 0, "cache": "hit"}
+
+    entry = await SummaryCache.objects.filter(url=url).afirst()
+    headers = {}
+    if entry and entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry and entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+
+    response = await sync_to_async(get_client().get, thread_sensitive=False)(url, headers=headers)
+    if response.status_code == 304 and entry:
+        await sync_to_async(_record_hit)(entry, response)
+        return unchanged
     if response.status_code != 200:
-        return 0  # If page can't be fetched, nothing to add
+        # If page can't be fetched, nothing to add
+        return {"inserted": 0, "updated": 0, "skipped": 0, "cache": "miss"}
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    count = 0
+    content_hash = hashlib.sha256(response.content).hexdigest()
+    if entry and entry.content_hash == content_hash:
+        await sync_to_async(_record_hit)(entry, response)
+        return unchanged
 
-    doc_date = datetime.now().date()
+    counts = await sync_to_async(
+        lambda: ingest_documents(parse_documents(response.content), doc_date)
+    )()
 
-    for item in soup.select("li.dispo"):
-        title_tag = item.select_one("p")
-        title = title_tag.text.strip() if title_tag else "Sin título"
+    # Only remember the page once it has been stored successfully.
+    validators = {
+        "etag": response.headers.get("ETag", ""),
+        "last_modified": response.headers.get("Last-Modified", ""),
+        "content_hash": content_hash,
+        "updated_at": timezone.now(),
+    }
+    if entry:
+        await SummaryCache.objects.filter(pk=entry.pk).aupdate(misses=F("misses") + 1, **validators)
+    else:
+        await SummaryCache.objects.acreate(url=url, misses=1, **validators)
 
-        pdf_tag = item.select_one(".puntoPDF a")
-        url_doc = BASE_URL + pdf_tag['href'] if pdf_tag else None
-
-        number = None
-        if url_doc and "BOE-A" in url_doc:
-            number = url_doc.split("/")[-1].replace(".pdf", "")
-
-        # Save to database only if it doesn't exist
-        _, created = Document.objects.get_or_create(
-            number=number or "N/A",
-            date=doc_date,
-            defaults={
-                "title": title,
-                "status": "Publicado",
-                "url": url_doc or "N/A",
-            }
-        )
-        if created:
-            count += 1
-
-    return count
+    counts["cache"] = "miss"
+    return counts
+
+
+def fetch_documents(day=None, base_url=BASE_URL):
+    """
+    Blocking version of `afetch_documents`, for the refresh worker.
+    """
+    return async_to_sync(afetch_documents)(day, base_url)
@@ -0,0 +1,265 @@
+"""
+Full-text search over document titles and PDF texts.
+
+- SQLite: FTS5 external-content tables `documents_document_fts` and
+  `documents_documentcontent_fts` (mapped by the unmanaged
+  DocumentSearch / DocumentContentSearch models), tokenized with
+  `unicode61 remove_diacritics 2` so matching ignores case and accents,
+  and kept in sync with their tables by triggers.
+- PostgreSQL: GIN indexes on the `tsvector` of title and text in the
+  `spanish_unaccent` configuration (Spanish stemming after the
+  `unaccent` dictionary), so matching ignores accents as on SQLite.
+- Any other backend falls back to `icontains`.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q, Value
+
+# Text search configuration of the PostgreSQL indexes and queries
+POSTGRES_CONFIG = "spanish_unaccent"
+
+# Needs the unaccent extension (in contrib; trusted, so the database
+# owner can create it). There is no CREATE ... IF NOT EXISTS for text
+# search configurations.
+POSTGRES_CONFIG_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{POSTGRES_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {POSTGRES_CONFIG} (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION {POSTGRES_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END
+    $$
+    """,
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_document_fts_ai AFTER INSERT ON documents_document BEGIN
+        INSERT INTO documents_document_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_document_fts_ad AFTER DELETE ON documents_document BEGIN
+        INSERT INTO documents_document_fts(documents_document_fts, rowid, title)
+        VALUES ('delete', old.id, old.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_document_fts_au AFTER UPDATE OF title ON documents_document BEGIN
+        INSERT INTO documents_document_fts(documents_document_fts, rowid, title)
+        VALUES ('delete', old.id, old.title);
+        INSERT INTO documents_document_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_document_fts USING fts5(
+        title,
+        content='documents_document',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    *SQLITE_TRIGGERS,
+    "INSERT INTO documents_document_fts(documents_document_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS documents_document_fts_ai",
+    "DROP TRIGGER IF EXISTS documents_document_fts_ad",
+    "DROP TRIGGER IF EXISTS documents_document_fts_au",
+    "DROP TABLE IF EXISTS documents_document_fts",
+]
+
+# Must match the expression generated by SearchVector("title", config=POSTGRES_CONFIG).
+POSTGRES_FORWARD = [
+    *POSTGRES_CONFIG_FORWARD,
+    f"""
+    CREATE INDEX IF NOT EXISTS documents_document_title_tsv
+    ON documents_document
+    USING gin (to_tsvector('{POSTGRES_CONFIG}'::regconfig, COALESCE(title, '')))
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS documents_document_title_tsv",
+]
+
+
+SQLITE_CONTENT_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_documentcontent_fts USING fts5(
+        text,
+        content='documents_documentcontent',
+        content_rowid='document_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_documentcontent_fts_ai AFTER INSERT ON documents_documentcontent BEGIN
+        INSERT INTO documents_documentcontent_fts(rowid, text) VALUES (new.document_id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_documentcontent_fts_ad AFTER DELETE ON documents_documentcontent BEGIN
+        INSERT INTO documents_documentcontent_fts(documents_documentcontent_fts, rowid, text)
+        VALUES ('delete', old.document_id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_documentcontent_fts_au AFTER UPDATE OF text ON documents_documentcontent BEGIN
+        INSERT INTO documents_documentcontent_fts(documents_documentcontent_fts, rowid, text)
+        VALUES ('delete', old.document_id, old.text);
+        INSERT INTO documents_documentcontent_fts(rowid, text) VALUES (new.document_id, new.text);
+    END
+    """,
+    "INSERT INTO documents_documentcontent_fts(documents_documentcontent_fts) VALUES ('rebuild')",
+]
+
+SQLITE_CONTENT_BACKWARD = [
+    "DROP TRIGGER IF EXISTS documents_documentcontent_fts_ai",
+    "DROP TRIGGER IF EXISTS documents_documentcontent_fts_ad",
+    "DROP TRIGGER IF EXISTS documents_documentcontent_fts_au",
+    "DROP TABLE IF EXISTS documents_documentcontent_fts",
+]
+
+POSTGRES_CONTENT_FORWARD = [
+    *POSTGRES_CONFIG_FORWARD,
+    f"""
+    CREATE INDEX IF NOT EXISTS documents_documentcontent_text_tsv
+    ON documents_documentcontent
+    USING gin (to_tsvector('{POSTGRES_CONFIG}'::regconfig, COALESCE(text, '')))
+    """,
+]
+
+POSTGRES_CONTENT_BACKWARD = [
+    "DROP INDEX IF EXISTS documents_documentcontent_text_tsv",
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def install(apps, schema_editor):
+    """
+    Migration helper creating the search index for the current backend.
+    - Also used after migrations that rebuild `documents_document` on
+      SQLite, which drops its triggers: re-running it restores them and
+      rebuilds the index.
+    """
+    _execute(schema_editor, {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD})
+
+
+def uninstall(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD})
+
+
+def install_content(apps, schema_editor):
+    """
+    Migration helper creating the PDF text index; same contract as
+    `install` for `documents_documentcontent`.
+    """
+    _execute(schema_editor, {"sqlite": SQLITE_CONTENT_FORWARD, "postgresql": POSTGRES_CONTENT_FORWARD})
+
+
+def uninstall_content(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_CONTENT_BACKWARD, "postgresql": POSTGRES_CONTENT_BACKWARD})
+
+
+def reindex_unaccent(apps, schema_editor):
+    """
+    Migration helper rebuilding the PostgreSQL indexes, created with the
+    plain 'spanish' configuration, in POSTGRES_CONFIG; other backends
+    are unchanged.
+    """
+    _execute(schema_editor, {"postgresql": [
+        *POSTGRES_BACKWARD, *POSTGRES_CONTENT_BACKWARD, *POSTGRES_FORWARD, *POSTGRES_CONTENT_FORWARD,
+    ]})
+
+
+def _fts_query(text):
+    """
+    Turn user input into a safe FTS5 query: every word must appear,
+    the last one as a prefix so results update while typing.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_filter(text, prefix=""):
+    """
+    Q object matching documents whose title or PDF text matches `text`.
+    - `prefix` is the lookup path to the Document, e.g. "document__".
+    - Each index is queried in its own `IN` subquery: SQLite can't use
+      MATCH under an OR across joined tables.
+    """
+    if connection.vendor == "sqlite":
+        from .models import DocumentContentSearch, DocumentSearch
+
+        query = _fts_query(text)
+        if query is None:
+            return Q()
+        titles = DocumentSearch.objects.filter(title__match=query).values("document_id")
+        texts = DocumentContentSearch.objects.filter(text__match=query).values("content_id")
+        return Q(**{f"{prefix}id__in": titles}) | Q(**{f"{prefix}id__in": texts})
+
+    if connection.vendor == "postgresql":
+        from .models import Document, DocumentContent
+
+        search_query = SearchQuery(text, config=POSTGRES_CONFIG, search_type="websearch")
+        titles = Document.objects.annotate(
+            search_vector=SearchVector("title", config=POSTGRES_CONFIG)
+        ).filter(search_vector=search_query).values("id")
+        texts = DocumentContent.objects.annotate(
+            search_vector=SearchVector("text", config=POSTGRES_CONFIG)
+        ).filter(search_vector=search_query).values("document_id")
+        return Q(**{f"{prefix}id__in": titles}) | Q(**{f"{prefix}id__in": texts})
+
+    return Q(**{f"{prefix}title__icontains": text}) | Q(**{f"{prefix}content__text__icontains": text})
+
+
+def rank_documents(queryset, text):
+    """
+    Order a Document queryset already filtered by `search_filter(text)`
+    best matches first, newest first among equals.
+    - Title matches rank above matches found only in the PDF text.
+    - SQLite: a UNION of the title matches and the text-only matches,
+      each joined to its index so FTS5 computes bm25 in one scan. A
+      correlated rank subquery restarts the full-text query per row
+      (seconds on 10^4 matches). The result only supports ordering,
+      slicing and count(), which is all pagination needs.
+    """
+    if connection.vendor == "sqlite" and _fts_query(text):
+        from .models import DocumentSearch
+
+        # FTS5 rank is bm25(): lower is better.
+        query = _fts_query(text)
+        titles = queryset.filter(search__title__match=query).annotate(
+            match_group=Value(0), search_rank=F("search__rank"),
+        )
+        texts = queryset.filter(content__search__text__match=query).exclude(
+            id__in=DocumentSearch.objects.filter(title__match=query).values("document_id")
+        ).annotate(match_group=Value(1), search_rank=F("content__search__rank"))
+        return titles.union(texts, all=True).order_by("match_group", "search_rank", "-date")
+
+    if connection.vendor == "postgresql":
+        return queryset.annotate(search_rank=SearchRank(
+            SearchVector("title", config=POSTGRES_CONFIG),
+            SearchQuery(text, config=POSTGRES_CONFIG, search_type="websearch"),
+        )).order_by("-search_rank", "-date")
+
+    return queryset.order_by("-date")
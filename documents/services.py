@@ -0,0 +1,214 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+
+from . import counters
+from .models import Client, ClientDocumentPriority, Document
+
+PRIORITIES = {value for value, _ in ClientDocumentPriority.PRIORITY_CHOICES}
+
+
+def _document_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _pairs_filter(pairs):
+    """
+    Q object matching the rows of the given (client_id, document_id) pairs.
+    """
+    by_client = defaultdict(list)
+    for client_id, doc_id in pairs:
+        by_client[client_id].append(doc_id)
+    condition = Q()
+    for client_id, doc_ids in by_client.items():
+        condition |= Q(client_id=client_id, document_id__in=doc_ids)
+    return condition
+
+
+# Advisory lock namespace ("PRI") for `_lock_customer`
+_LOCK_NAMESPACE = 0x505249
+
+
+def _lock_customer(customer_id):
+    """
+    Serialize the priority writes of one customer's clients until the
+    transaction ends, so the rows read first are the ones the write
+    changes and the counter deltas hold, even for rows that don't exist
+    yet (which no row lock can cover).
+    - PostgreSQL: a transaction-level advisory lock per customer.
+    - SQLite needs nothing: transactions begin IMMEDIATE (settings), with
+      the database write lock held before the first read.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [_LOCK_NAMESPACE, customer_id])
+
+
+def _current_priorities(pairs):
+    return {
+        (client_id, doc_id): priority
+        for client_id, doc_id, priority in ClientDocumentPriority.objects.filter(
+            _pairs_filter(pairs)
+        ).values_list('client_id', 'document_id', 'priority')
+    }
+
+
+def _write(customer_id, rows):
+    """
+    Apply (client_id, document_id) -> priority changes for one customer's
+    clients, None meaning "remove the assignment".
+    - One read of the current rows, at most one DELETE and one
+      `bulk_create(update_conflicts=True)`, and one counters update.
+    - Must run inside a transaction; holds the customer's lock (see
+      `_lock_customer`) from the read on.
+    Returns:
+        tuple[int, int, int]: created, updated and deleted counts.
+    """
+    if not rows:
+        return 0, 0, 0
+
+    _lock_customer(customer_id)
+    existing = _current_priorities(rows)
+    deletes = [pair for pair, priority in rows.items() if priority is None and pair in existing]
+    upserts = {pair: priority for pair, priority in rows.items() if priority is not None}
+
+    if deletes:
+        ClientDocumentPriority.objects.filter(_pairs_filter(deletes)).delete()
+    if upserts:
+        ClientDocumentPriority.objects.bulk_create(
+            [
+                ClientDocumentPriority(client_id=client_id, document_id=doc_id, priority=priority)
+                for (client_id, doc_id), priority in upserts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['client', 'document'],
+            update_fields=['priority'],
+        )
+    counters.record(customer_id, [
+        (client_id, existing.get((client_id, doc_id)), priority)
+        for (client_id, doc_id), priority in rows.items()
+    ])
+
+    updated = sum(1 for pair in upserts if pair in existing)
+    return len(upserts) - updated, updated, len(deletes)
+
+
+def remove_priorities(customer_id, pairs):
+    """
+    Delete the (client_id, document_id) assignments of one customer's
+    clients with a single DELETE, keeping the counters in sync.
+    Must run inside a transaction.
+    Returns:
+        int: deleted rows.
+    """
+    return _write(customer_id, dict.fromkeys(pairs))[2]
+
+
+def set_priority(client, document, priority):
+    """
+    Create or update a single assignment, keeping the counters in sync.
+    - A row created by a writer that bypasses `_lock_customer` between the
+      read and the insert is updated instead.
+    Returns:
+        tuple[ClientDocumentPriority, bool]: the row and whether it was created.
+    """
+    with transaction.atomic():
+        _lock_customer(client.customer_id)
+        rows = ClientDocumentPriority.objects.select_for_update().filter(client=client, document=document)
+        obj = rows.first()
+        old = obj.priority if obj else None
+        if obj is None:
+            try:
+                with transaction.atomic():
+                    obj = ClientDocumentPriority.objects.create(client=client, document=document, priority=priority)
+            except IntegrityError:
+                obj = rows.get()
+                old = obj.priority
+        if old is not None and old != priority:
+            obj.priority = priority
+            obj.save(update_fields=['priority'])
+        counters.record(client.customer_id, [(client.id, old, priority)])
+    # Reuse the loaded instances instead of lazy-loading them per row render
+    obj.client, obj.document = client, document
+    return obj, old is None
+
+
+def assign_documents(client, priorities):
+    """
+    Assign documents to a client in one set-based, atomic operation.
+    - `priorities` maps document id -> priority; ids may be strings as
+      posted by forms. Unknown priorities fall back to 'media'.
+    - Valid ids are resolved with one `IN` query; all rows are upserted
+      with a single `bulk_create(update_conflicts=True)`, which keeps the
+      original `created_at` of existing assignments.
+    Returns:
+        dict: `created`, `updated` and `missing` counts.
+    """
+    requested = {}
+    missing = 0
+    for doc_id, priority in priorities.items():
+        key = _document_id(doc_id)
+        if key is None:
+            missing += 1
+            continue
+        requested[key] = priority if priority in PRIORITIES else 'media'
+
+    with transaction.atomic():
+        found = set(Document.objects.filter(id__in=requested).values_list('id', flat=True))
+        created, updated, _ = _write(client.customer_id, {(client.id, doc_id): requested[doc_id] for doc_id in found})
+
+    return {
+        'created': created,
+        'updated': updated,
+        'missing': missing + len(requested) - len(found),
+    }
+
+
+def apply_priority_operations(user, operations):
+    """
+    Apply many priority changes for `user`'s clients in one transaction.
+    - `operations` is a list of {"client", "document", "priority"} dicts;
+      priority "delete" removes the assignment.
+    - Clients not owned by `user`, unknown documents and invalid
+      priorities are counted as `invalid` and ignored.
+    - Upserts share one `bulk_create`, deletes one `DELETE` (see
+      `_write`); later operations on the same pair win.
+    Returns:
+        dict: `created`, `updated`, `deleted` and `invalid` counts.
+    """
+    pairs = {}
+    invalid = 0
+    for op in operations:
+        client_id = _document_id(op.get('client'))
+        doc_id = _document_id(op.get('document'))
+        priority = op.get('priority')
+        if client_id is None or doc_id is None or not isinstance(priority, str) or (
+            priority not in PRIORITIES and priority != 'delete'
+        ):
+            invalid += 1
+            continue
+        pairs[(client_id, doc_id)] = priority
+
+    with transaction.atomic():
+        owned = set(Client.objects.filter(
+            customer=user, id__in={client_id for client_id, _ in pairs}
+        ).values_list('id', flat=True))
+        found = set(Document.objects.filter(
+            id__in={doc_id for _, doc_id in pairs}
+        ).values_list('id', flat=True))
+
+        valid = {
+            pair: priority for pair, priority in pairs.items()
+            if pair[0] in owned and pair[1] in found
+        }
+        invalid += len(pairs) - len(valid)
+
+        created, updated, deleted = _write(user.id, {
+            pair: None if priority == 'delete' else priority for pair, priority in valid.items()
+        })
+
+    return {'created': created, 'updated': updated, 'deleted': deleted, 'invalid': invalid}
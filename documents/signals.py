@@ -0,0 +1,46 @@
+"""
+- Keep the denormalized counters right when assignments disappear
+  through a cascade (deleting a Client or a Document), which bypasses
+  services.py.
+- Invalidate cached fragments on single-object edits (admin, forms);
+  bulk ingestion bumps the version itself.
+- Tune every new SQLite connection (`settings.SQLITE_PRAGMAS`).
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import counters, fragments
+from .models import Client, ClientDocumentPriority, Document
+
+
+@receiver(pre_delete, sender=Client)
+def forget_client_priorities(sender, instance, **kwargs):
+    counters.forget(ClientDocumentPriority.objects.filter(client=instance))
+
+
+@receiver(pre_delete, sender=Document)
+def forget_document_priorities(sender, instance, **kwargs):
+    counters.forget(ClientDocumentPriority.objects.filter(document=instance))
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def invalidate_documents(sender, **kwargs):
+    fragments.bump(fragments.DOCUMENTS)
+
+
+@receiver(post_save, sender=Client)
+def invalidate_priorities(sender, instance, **kwargs):
+    # Client names are shown in the priority tables
+    fragments.bump(fragments.PRIORITIES, user_id=instance.customer_id)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
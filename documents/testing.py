@@ -0,0 +1,45 @@
+"""
+Test helpers for query budgets.
+"""
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+
+from .middleware import QueryRecorder
+
+
+@contextmanager
+def assert_max_queries(testcase, budget, label=""):
+    """
+    Fail `testcase` if the block runs more than `budget` queries.
+    - The failure message lists the repeated statements, which usually
+      point at the N+1 responsible.
+    Yields the QueryRecorder, for extra assertions.
+    """
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+
+    if recorder.count > budget:
+        repeated = "\n".join(f"  {n}x {sql}" for sql, n in recorder.duplicates) or "  (none)"
+        testcase.fail(
+            f"{label or 'Block'} ran {recorder.count} queries, budget is {budget}.\n"
+            f"Repeated statements:\n{repeated}"
+        )
+
+
+def consume(response):
+    """
+    Read a streaming response to the end, so the queries run while
+    producing it are counted; async streams are driven to completion.
+    """
+    if not getattr(response, "streaming", False):
+        return
+    if response.is_async:
+        async def drain():
+            return [chunk async for chunk in response.streaming_content]
+
+        async_to_sync(drain)()
+    else:
+        b"".join(response.streaming_content)
@@ -1,3 +1,1537 @@
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F, QuerySet
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import analysis, counters, enrichment, fragments, httpclient, search, services, views
+from .benchmarks import DEPARTMENTS, PdfFixtureHandler, build_summary_html
+from .factories import clear_seed, seed
+from .jobs import claim_next_job, enqueue_refresh, run_job
+from .management.commands import bench_concurrency
+from .pagination import encode_cursor, keyset_paginate
+from .pdfs import fetch_pdfs
+from .queries import document_filters, filter_documents
+from .scraping import PARSERS, fetch_documents, ingest_documents, parse_documents, record_hash
+from .services import apply_priority_operations, assign_documents, set_priority
+from .models import (
+    AnalysisCache, Client, ClientDocumentPriority, DataVersion, Document, DocumentChange, DocumentContent,
+    PriorityCounter, RefreshJob, SummaryCache,
+)
+from .testing import assert_max_queries, consume
+
+
+class FixtureBOEHandler(BaseHTTPRequestHandler):
+    """
+    Serves synthetic BOE summaries: 3 items on odd days, 404 on even days.
+    The first request for 2025-01-03 fails with 503 to exercise retries.
+    """
+    flaky = {"/boe/dias/2025/01/03/"}
+
+    def do_GET(self):
+        if self.path in self.flaky:
+            self.flaky.discard(self.path)
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        day = int(self.path.rstrip("/").split("/")[-1])
+        if day % 2 == 0:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = build_summary_html(3, start=day * 100).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for an OpenAI-compatible chat completions API: answers with
+    the user message in upper case and counts the calls. `stream: true`
+    requests get one server-sent event per word.
+    """
+    calls = 0
+
+    def do_POST(self):
+        FakeChatHandler.calls += 1
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        content = payload["messages"][-1]["content"]
+        if content.startswith("FAIL"):
+            self.send_response(500)
+            self.end_headers()
+            return
+        if payload.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in content.upper().split(" "):
+                chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        body = json.dumps({"choices": [{"message": {"role": "assistant", "content": content.upper()}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ETagBOEHandler(BaseHTTPRequestHandler):
+    """
+    Serves one summary with an ETag and answers 304 when it is sent back;
+    `version` changes the page, `requests` keeps the If-None-Match seen.
+    """
+    version = 1
+    requests = []
+
+    def do_GET(self):
+        cls = ETagBOEHandler
+        etag = f'"v{cls.version}"'
+        cls.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = build_summary_html(2 + cls.version).encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboundFixtureHandler(BaseHTTPRequestHandler):
+    """
+    `/down` always answers 503, anything else "ok" after 50 ms. Counts the
+    requests and the most it had in progress at once.
+    """
+    lock = threading.Lock()
+    hits = 0
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        cls = OutboundFixtureHandler
+        with cls.lock:
+            cls.hits += 1
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        if self.path != "/down":
+            time.sleep(0.05)
+        with cls.lock:
+            cls.active -= 1
+        self.send_response(503 if self.path == "/down" else 200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServerMixin:
+    handler = FixtureBOEHandler
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        httpclient.reset()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), cls.handler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class BackfillCommandTests(FixtureServerMixin, TestCase):
+    def run_backfill(self, checkpoint):
+        out = StringIO()
+        call_command(
+            "backfill_boe", "--from", "2025-01-01", "--to", "2025-01-05",
+            "--base-url", self.base_url, "--checkpoint", checkpoint,
+            "--backoff", "0", "--rate", "0", stdout=out,
+        )
+        return out.getvalue()
+
+    def test_backfill_ingests_range_and_resumes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "checkpoint.json")
+
+            output = self.run_backfill(checkpoint)
+            self.assertIn("5 day(s) processed (2 without BOE)", output)
+            self.assertEqual(Document.objects.count(), 9)
+            self.assertEqual(Document.objects.filter(date=date(2025, 1, 3)).count(), 3)
+
+            output = self.run_backfill(checkpoint)
+            self.assertIn("0 day(s) processed", output)
+            self.assertEqual(Document.objects.count(), 9)
+
+    def test_fetch_documents_skips_unchanged_summary(self):
+        day = date(2025, 1, 1)
+        first = fetch_documents(day, base_url=self.base_url)
+        self.assertEqual((first["inserted"], first["cache"]), (3, "miss"))
+
+        second = fetch_documents(day, base_url=self.base_url)
+        self.assertEqual(second, {"inserted": 0, "updated": 0, "skipped": 0, "cache": "hit"})
+        self.assertEqual(SummaryCache.objects.get().hits, 1)
+
+
+class ConditionalFetchTests(FixtureServerMixin, TestCase):
+    handler = ETagBOEHandler
+
+    def setUp(self):
+        ETagBOEHandler.version = 1
+        ETagBOEHandler.requests = []
+
+    def test_not_modified_summary_is_a_cache_hit(self):
+        day = date(2025, 1, 1)
+        self.assertEqual(fetch_documents(day, base_url=self.base_url)["inserted"], 3)
+
+        with self.assertNumQueries(2):  # cache entry lookup, hit counter
+            counts = fetch_documents(day, base_url=self.base_url)
+        self.assertEqual(counts, {"inserted": 0, "updated": 0, "skipped": 0, "cache": "hit"})
+        self.assertEqual(ETagBOEHandler.requests, [None, '"v1"'])
+
+        ETagBOEHandler.version = 2
+        counts = fetch_documents(day, base_url=self.base_url)
+        self.assertEqual((counts["inserted"], counts["skipped"], counts["cache"]), (1, 3, "miss"))
+        entry = SummaryCache.objects.get()
+        self.assertEqual((entry.etag, entry.hits, entry.misses), ('"v2"', 1, 2))
+
+
+class IngestTests(TestCase):
+    def test_counts_inserts_updates_and_skips(self):
+        day = date(2025, 1, 1)
+        records = [
+            {"number": "BOE-A-2025-1", "title": "Ley 1/2025", "url": "N/A"},
+            {"number": "BOE-A-2025-2", "title": "Orden 2/2025", "url": "N/A"},
+            {"number": "BOE-A-2025-1", "title": "Ley 1/2025 (repetida)", "url": "N/A"},
+        ]
+        self.assertEqual(ingest_documents(records, day), {"inserted": 2, "updated": 0, "skipped": 1})
+        self.assertEqual(Document.objects.get(number="BOE-A-2025-1").title, "Ley 1/2025")
+
+        records = [
+            {"number": "BOE-A-2025-1", "title": "Ley 1/2025", "url": "N/A"},
+            {"number": "BOE-A-2025-2", "title": "Orden 2/2025, corregida", "url": "N/A"},
+            {"number": "BOE-A-2025-3", "title": "Resolución 3/2025", "url": "N/A"},
+        ]
+        self.assertEqual(ingest_documents(records, day), {"inserted": 1, "updated": 1, "skipped": 1})
+        self.assertEqual(ingest_documents(records, day), {"inserted": 0, "updated": 0, "skipped": 3})
+        self.assertEqual(Document.objects.count(), 3)
+
+        # The same numbers on another day are other documents
+        self.assertEqual(ingest_documents(records, date(2025, 1, 2))["inserted"], 3)
+
+
+class RefreshJobTests(TestCase):
+    fetched = {"inserted": 2, "updated": 0, "skipped": 0, "cache": "miss"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("refresher", password="secret")
+
+    def test_enqueue_coalesces_active_jobs(self):
+        day = date(2025, 1, 1)
+        job = enqueue_refresh(day)
+        self.assertEqual(enqueue_refresh(day), job)
+        self.assertNotEqual(enqueue_refresh(date(2025, 1, 2)), job)
+
+        claim_next_job()
+        self.assertEqual(enqueue_refresh(day), job)  # running jobs coalesce too
+
+        job.status = "done"
+        job.save()
+        self.assertNotEqual(enqueue_refresh(day), job)
+
+    def test_enqueue_fails_stale_running_jobs(self):
+        day = date(2025, 1, 1)
+        job = enqueue_refresh(day)
+        RefreshJob.objects.filter(pk=job.pk).update(status="running", started_at=timezone.now() - timedelta(hours=1))
+
+        new = enqueue_refresh(day)
+        self.assertNotEqual(new, job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("failed", "Worker timeout"))
+
+    def test_enqueue_fails_stale_pending_jobs(self):
+        day = date(2025, 1, 1)
+        job = enqueue_refresh(day)
+        RefreshJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        new = enqueue_refresh(day)
+        self.assertNotEqual(new, job)
+        self.assertEqual(new.status, "pending")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("failed", "Worker timeout"))
+
+    def test_worker_survives_queue_errors(self):
+        with mock.patch("documents.management.commands.run_worker.run_pending_jobs",
+                        side_effect=[OperationalError("database is locked"), 0, KeyboardInterrupt]) as run:
+            with self.assertLogs("documents.management.commands.run_worker", "ERROR") as logs:
+                with self.assertRaises(KeyboardInterrupt):
+                    call_command("run_worker", "--interval", "0", stdout=StringIO())
+        self.assertEqual(run.call_count, 3)
+        self.assertIn("Refresh queue failed", logs.output[0])
+
+    def test_worker_runs_pending_jobs(self):
+        ok, broken = enqueue_refresh(date(2025, 1, 1)), enqueue_refresh(date(2025, 1, 2))
+        out = StringIO()
+        with mock.patch("documents.jobs.fetch_documents", side_effect=[self.fetched, RuntimeError("BOE caído")]):
+            call_command("run_worker", "--once", stdout=out)
+        self.assertIn("Processed 2 refresh job(s)", out.getvalue())
+
+        ok.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((ok.status, ok.result["inserted"]), ("done", 2))
+        self.assertEqual((broken.status, broken.error), ("failed", "BOE caído"))
+        self.assertIsNone(claim_next_job())
+
+    def test_refresh_view_queues_one_job(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("documents:refresh"))
+        job = RefreshJob.objects.get()
+        self.assertRedirects(response, reverse("documents:list") + f"?job={job.id}", fetch_redirect_response=False)
+
+        response = self.client.get(reverse("documents:refresh"), HTTP_HX_REQUEST="true")
+        self.assertContains(response, reverse("documents:job_status", args=[job.id]))
+        self.assertEqual(RefreshJob.objects.count(), 1)
+
+        with mock.patch("documents.jobs.fetch_documents", return_value=self.fetched):
+            run_job(claim_next_job())
+        response = self.client.get(reverse("documents:job_status", args=[job.id]))
+        self.assertEqual(response.json(), {
+            "id": job.id, "day": date.today().isoformat(), "status": "done", "result": self.fetched, "error": "",
+        })
+        self.assertContains(
+            self.client.get(reverse("documents:job_status", args=[job.id]), HTTP_HX_REQUEST="true"),
+            "2 documento(s) nuevo(s).",
+        )
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("exporter", password="secret")
+        cls.today = date.today()
+        cls.yesterday = cls.today - timedelta(days=1)
+        ingest_documents([
+            {"number": "BOE-A-2025-1", "title": "Ley 1/2025, de presupuestos", "url": "N/A"},
+            {"number": "BOE-A-2025-2", "title": "Orden 2/2025, de subvenciones", "url": "N/A"},
+        ], cls.today)
+        ingest_documents([
+            {"number": "BOE-A-2025-3", "title": "Ley 3/2025, de vivienda", "url": "N/A"},
+        ], cls.yesterday)
+        ingest_documents([
+            {"number": "BOE-A-2024-9", "title": "Ley 9/2024, de vivienda", "url": "N/A"},
+        ], date(2024, 1, 1))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse("documents:export_csv"), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_defaults_to_today(self):
+        response, body = self.export()
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            response["Content-Disposition"], f'attachment; filename="documents_{self.today}_{self.today}.csv"'
+        )
+        self.assertEqual(body.decode().splitlines(), [
+            "Title,Number,Date,Status,URL",
+            f'"Ley 1/2025, de presupuestos",BOE-A-2025-1,{self.today},Publicado,N/A',
+            f'"Orden 2/2025, de subvenciones",BOE-A-2025-2,{self.today},Publicado,N/A',
+        ])
+
+    def test_filters(self):
+        def numbers(**params):
+            return [line.split(",")[-4] for line in self.export(**params)[1].decode().splitlines()[1:]]
+
+        self.assertEqual(numbers(date_from=str(self.yesterday)), ["BOE-A-2025-3", "BOE-A-2025-1", "BOE-A-2025-2"])
+        self.assertEqual(numbers(date_to=str(self.yesterday)), ["BOE-A-2024-9", "BOE-A-2025-3"])
+        self.assertEqual(numbers(date_from="2024-01-01", type="ley"), ["BOE-A-2024-9", "BOE-A-2025-3", "BOE-A-2025-1"])
+        self.assertEqual(numbers(date_from="2024-01-01", q="vivienda"), ["BOE-A-2024-9", "BOE-A-2025-3"])
+        self.assertEqual(numbers(date_from="no-es-fecha"), ["BOE-A-2025-1", "BOE-A-2025-2"])
+
+    def test_ndjson(self):
+        response, body = self.export(format="ndjson", date_to=str(self.yesterday))
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn(f'filename="documents_all_{self.yesterday}.ndjson"', response["Content-Disposition"])
+        self.assertEqual([json.loads(line) for line in body.decode().splitlines()], [
+            {"title": "Ley 9/2024, de vivienda", "number": "BOE-A-2024-9", "date": "2024-01-01",
+             "status": "Publicado", "url": "N/A"},
+            {"title": "Ley 3/2025, de vivienda", "number": "BOE-A-2025-3", "date": str(self.yesterday),
+             "status": "Publicado", "url": "N/A"},
+        ])
+
+    def test_gzip(self):
+        for export_format in ("csv", "ndjson"):
+            with self.subTest(format=export_format):
+                plain = self.export(format=export_format)[1]
+                response, body = self.export(format=export_format, gzip="1")
+                self.assertEqual(response["Content-Type"], "application/gzip")
+                self.assertTrue(response["Content-Disposition"].endswith(f'.{export_format}.gz"'))
+                self.assertEqual(gzip.decompress(body), plain)
+
+    async def test_async_stream_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse("documents:export_csv")
+        for params in ({"date_from": "2024-01-01"}, {"date_from": "2024-01-01", "format": "ndjson", "gzip": "1"}):
+            with self.subTest(**params):
+                plain = await sync_to_async(self.export)(**params)
+                with mock.patch.object(views, "ASYNC_EXPORT_BATCH", 2):
+                    response = await self.async_client.get(url, params)
+                    self.assertTrue(response.is_async)
+                    body = b"".join([chunk async for chunk in response.streaming_content])
+                self.assertEqual(body, plain[1])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("searcher", password="secret")
+        ingest_documents([
+            {"number": "BOE-A-2025-1", "title": "Resolución de la Dirección General de Tráfico", "url": "N/A"},
+            {"number": "BOE-A-2025-2", "title": "Orden de subvenciones a la investigación", "url": "N/A"},
+            {"number": "BOE-A-2025-3", "title": "Ley de vivienda", "url": "N/A"},
+        ], date.today())
+
+    def numbers(self, q):
+        documents = filter_documents(document_filters({"q": q}))
+        return sorted(documents.values_list("number", flat=True))
+
+    def test_accents_and_case_are_ignored(self):
+        for q in ("resolucion", "RESOLUCIÓN", "direccion trafico", "Investigacion"):
+            with self.subTest(q=q):
+                self.assertEqual(len(self.numbers(q)), 1)
+        self.assertEqual(self.numbers("tráfico"), ["BOE-A-2025-1"])
+
+    def test_postgresql_indexes_fold_accents(self):
+        # Same behaviour as FTS5 remove_diacritics: both indexes are rebuilt
+        # with the unaccent configuration that search_filter queries
+        schema_editor = mock.Mock()
+        schema_editor.connection.vendor = "postgresql"
+        search.reindex_unaccent(None, schema_editor)
+        statements = [" ".join(call.args[0].split()) for call in schema_editor.execute.call_args_list]
+        self.assertEqual(statements[:2], [
+            "DROP INDEX IF EXISTS documents_document_title_tsv",
+            "DROP INDEX IF EXISTS documents_documentcontent_text_tsv",
+        ])
+        self.assertIn("CREATE EXTENSION IF NOT EXISTS unaccent", statements)
+        self.assertIn("WITH unaccent, spanish_stem", "\n".join(statements))
+        indexes = [statement for statement in statements if statement.startswith("CREATE INDEX")]
+        self.assertEqual(len(indexes), 2)
+        for statement in indexes:
+            self.assertIn("to_tsvector('spanish_unaccent'::regconfig", statement)
+
+        schema_editor.connection.vendor = "sqlite"
+        schema_editor.execute.reset_mock()
+        search.reindex_unaccent(None, schema_editor)
+        schema_editor.execute.assert_not_called()
+
+    def test_last_word_matches_as_prefix(self):
+        self.assertEqual(self.numbers("subven"), ["BOE-A-2025-2"])
+        self.assertEqual(self.numbers("orden subv"), ["BOE-A-2025-2"])
+        self.assertEqual(self.numbers("subv orden"), [])  # only the last word is a prefix
+        self.assertEqual(self.numbers("ley inv"), [])  # every word must match
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.numbers('vivienda" OR "orden'), [])
+        self.assertEqual(self.numbers("NEAR(ley vivienda)"), [])
+        self.assertEqual(len(self.numbers("¿?*")), 3)  # no words: no filter
+
+    def test_list_view_search(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("documents:list"), {"q": "vivi"}, HTTP_HX_REQUEST="true")
+        self.assertEqual([doc.number for doc in response.context["documents"]], ["BOE-A-2025-3"])
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("pager", password="secret")
+        # Several rows per date, so pages split ties on the id
+        Document.objects.bulk_create([
+            Document(title=f"Orden {i}", number=f"BOE-A-2025-{i}", date=date(2025, 1, 1 + i % 3),
+                     status="Publicado", url="N/A")
+            for i in range(25)
+        ])
+        cls.ordered = list(Document.objects.order_by("-date", "-id"))
+
+    def test_next_and_previous_walk_every_row_once(self):
+        pages = [keyset_paginate(Document.objects.all())]
+        while pages[-1].has_next():
+            pages.append(keyset_paginate(Document.objects.all(), pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual([doc for page in pages for doc in page], self.ordered)
+        self.assertFalse(pages[0].has_previous())
+        self.assertIsNone(pages[-1].next_cursor)
+
+        back = keyset_paginate(Document.objects.all(), pages[2].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertTrue(back.has_next() and back.has_previous())
+        first = keyset_paginate(Document.objects.all(), back.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+        self.assertEqual(list(keyset_paginate(Document.objects.all(), first.next_cursor)), list(pages[1]))
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        cursor = keyset_paginate(Document.objects.all()).next_cursor
+        for token in ("basura", cursor[:-2] + "xx", encode_cursor(["2025-01-01"], "next")[::-1]):
+            with self.subTest(cursor=token):
+                page = keyset_paginate(Document.objects.all(), token)
+                self.assertEqual(list(page), self.ordered[:10])
+                self.assertFalse(page.has_previous())
+
+    def test_list_view_pages(self):
+        self.client.force_login(self.user)
+        url = reverse("documents:list") + "?date_from=2025-01-01&date_to=2025-01-03"
+        first = self.client.get(url, HTTP_HX_REQUEST="true").context["page_obj"]
+        second = self.client.get(f"{url}&cursor={first.next_cursor}", HTTP_HX_REQUEST="true").context["page_obj"]
+        self.assertEqual(list(second), self.ordered[10:20])
+        response = self.client.get(f"{url}&cursor=no-valido", HTTP_HX_REQUEST="true")
+        self.assertEqual(list(response.context["page_obj"]), self.ordered[:10])
+
+
+class AssignDocumentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("assigner", password="secret")
+        cls.client_obj = Client.objects.create(customer=cls.user, name="Cliente")
+        cls.documents = Document.objects.bulk_create([
+            Document(title=f"Orden {i}", number=f"BOE-A-2025-{i}", date=date(2025, 1, 1),
+                     status="Publicado", url="N/A")
+            for i in range(4)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def priorities(self):
+        return dict(ClientDocumentPriority.objects.filter(client=self.client_obj).values_list("document_id", "priority"))
+
+    def test_counts_created_updated_and_missing(self):
+        first, second, third, _ = [doc.id for doc in self.documents]
+        result = assign_documents(self.client_obj, {first: "alta", str(second): "urgente", "x": "alta", 999999: "baja"})
+        self.assertEqual(result, {"created": 2, "updated": 0, "missing": 2})
+        self.assertEqual(self.priorities(), {first: "alta", second: "media"})
+
+        result = assign_documents(self.client_obj, {first: "baja", third: "baja"})
+        self.assertEqual(result, {"created": 1, "updated": 1, "missing": 0})
+        self.assertEqual(self.priorities(), {first: "baja", second: "media", third: "baja"})
+        self.assertEqual(Client.objects.get().document_count, 3)
+        self.assertEqual(counters.rebuild(), (0, 0))
+
+    def test_bulk_endpoint(self):
+        url = reverse("documents:assign_documents_bulk", args=[self.client_obj.id])
+        first, second, third, fourth = [doc.id for doc in self.documents]
+        response = self.client.post(url, json.dumps({
+            "documents": [first, second, 999999],
+            "priority": "alta",
+            "assignments": [{"document": second, "priority": "baja"}, {"document": third}],
+        }), content_type="application/json")
+        self.assertEqual(response.json(), {"success": True, "created": 3, "updated": 0, "missing": 1})
+        self.assertEqual(self.priorities(), {first: "alta", second: "baja", third: "alta"})
+
+        response = self.client.post(url, json.dumps({"documents": [first, fourth]}), content_type="application/json")
+        self.assertEqual(response.json(), {"success": True, "created": 1, "updated": 1, "missing": 0})
+        self.assertEqual(self.priorities()[first], "media")
+
+        for body in ("{", json.dumps([1, 2]), json.dumps({"assignments": [{"priority": "alta"}]})):
+            with self.subTest(body=body):
+                response = self.client.post(url, body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        other = Client.objects.create(customer=User.objects.create_user("otro"), name="Ajeno")
+        response = self.client.post(reverse("documents:assign_documents_bulk", args=[other.id]),
+                                    json.dumps({"documents": [first]}), content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(ClientDocumentPriority.objects.filter(client=other).exists())
+
+    def test_form_reports_counts(self):
+        url = reverse("documents:assign_documents", args=[self.client_obj.id])
+        ids = [doc.id for doc in self.documents[:2]]
+        assign_documents(self.client_obj, {ids[0]: "baja"})
+        response = self.client.post(url, {"documents": ids + [999999], "priority": "alta"}, HTTP_HX_REQUEST="true")
+        self.assertEqual(response.json(), {
+            "success": True, "message": "2 documentos asignados correctamente",
+            "created": 1, "updated": 1, "missing": 1,
+        })
+        response = self.client.post(url, {"documents": ids, "priority": "alta"})
+        self.assertRedirects(response, reverse("documents:client_documents", args=[self.client_obj.id]),
+                             fetch_redirect_response=False)
+
+
+class BatchPriorityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("batcher", password="secret")
+        cls.clients = [Client.objects.create(customer=cls.user, name=f"Cliente {i}") for i in range(2)]
+        cls.other = Client.objects.create(customer=User.objects.create_user("ajeno"), name="Ajeno")
+        cls.documents = Document.objects.bulk_create([
+            Document(title=f"Orden {i}", number=f"BOE-A-2025-{i}", date=date(2025, 1, 1),
+                     status="Publicado", url="N/A")
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        assign_documents(self.clients[0], {self.documents[0].id: "alta", self.documents[1].id: "media"})
+
+    def post_json(self, body):
+        return self.client.post(reverse("documents:batch_priority"), json.dumps(body), content_type="application/json")
+
+    def priorities(self):
+        return set(ClientDocumentPriority.objects.values_list("client_id", "document_id", "priority"))
+
+    def test_json_operations(self):
+        first, second = self.clients
+        doc1, doc2, doc3 = [doc.id for doc in self.documents]
+        response = self.post_json({"operations": [
+            {"client": first.id, "document": doc1, "priority": "delete"},
+            {"client": first.id, "document": doc2, "priority": "baja"},
+            {"client": second.id, "document": str(doc3), "priority": "alta"},
+            {"client": self.other.id, "document": doc3, "priority": "alta"},  # not the user's client
+            {"client": first.id, "document": 999999, "priority": "alta"},
+            {"client": first.id, "document": doc3, "priority": "urgente"},
+            {"client": first.id, "document": doc3, "priority": ["alta"]},
+        ]})
+        self.assertEqual(response.json(), {"success": True, "created": 1, "updated": 1, "deleted": 1, "invalid": 4})
+        self.assertEqual(self.priorities(), {(first.id, doc2, "baja"), (second.id, doc3, "alta")})
+        self.assertEqual(counters.rebuild(), (0, 0))
+
+    def test_malformed_json_is_rejected(self):
+        before = self.priorities()
+        for body in (
+            "{",
+            [],
+            {},
+            {"operations": "x"},
+            {"operations": ["x"]},
+            {"operations": [None]},
+            {"operations": [{"client": self.clients[0].id, "document": self.documents[2].id}]},
+        ):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    reverse("documents:batch_priority"), body if isinstance(body, str) else json.dumps(body),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": "JSON inválido"})
+        self.assertEqual(self.priorities(), before)
+        self.assertEqual(self.client.get(reverse("documents:batch_priority")).status_code, 405)
+
+    def test_htmx_form(self):
+        first, second = self.clients
+        doc1, doc2, doc3 = [doc.id for doc in self.documents]
+        url = reverse("documents:batch_priority")
+        response = self.client.post(url, {
+            "items": [f"{first.id}:{doc1}", f"{first.id}:{doc2}", "basura", f"{self.other.id}:{doc1}"],
+            "priority": "baja",
+        }, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "0 asignada(s), 2 actualizada(s), 0 eliminada(s)")
+        self.assertContains(response, "2 ignorada(s)")
+
+        response = self.client.post(url + "?priority=baja", {
+            "client": second.id, "documents": [doc1, doc3], "priority": "baja",
+        }, HTTP_HX_REQUEST="true", HTTP_HX_TARGET="priorities-container")
+        self.assertContains(response, 'id="priority-summary" hx-swap-oob="true"')
+        self.assertEqual(len(response.context["priorities"]), 4)
+        self.assertEqual(response.context["priority_summary"], {"baja": 4})
+
+        response = self.client.post(url, {"items": [f"{second.id}:{doc1}"], "priority": "delete"},
+                                    HTTP_HX_REQUEST="true")
+        self.assertContains(response, "0 asignada(s), 0 actualizada(s), 1 eliminada(s)")
+        self.assertNotContains(response, "ignorada(s)")
+        self.assertEqual(len(self.priorities()), 3)
+
+
+class PriorityRowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rows", password="secret")
+        cls.client_obj = Client.objects.create(customer=cls.user, name="Cliente")
+        cls.document = Document.objects.create(title="Orden 1", number="BOE-A-2025-1", date=date(2025, 1, 1),
+                                               status="Publicado", url="N/A")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.update_url = reverse("documents:update_priority", args=[self.client_obj.id, self.document.id])
+        self.delete_url = reverse("documents:delete_priority", args=[self.client_obj.id, self.document.id])
+        self.row_id = f'id="priority-{self.client_obj.id}-{self.document.id}"'
+
+    def test_update_returns_row_and_oob_summary(self):
+        response = self.client.post(self.update_url, {"priority": "alta"}, HTTP_HX_REQUEST="true")
+        self.assertContains(response, self.row_id)
+        self.assertContains(response, 'id="priority-summary" hx-swap-oob="true"')
+        self.assertEqual(response.context["priority_summary"], {"alta": 1})
+
+        # The row leaves a list filtered on another priority
+        response = self.client.post(self.update_url + "?priority=alta", {"priority": "baja"}, HTTP_HX_REQUEST="true")
+        self.assertNotContains(response, self.row_id)
+        self.assertContains(response, 'hx-swap-oob="true"')
+        self.assertEqual(response.context["priority_summary"], {"baja": 1})
+
+        response = self.client.post(self.update_url, {"priority": "urgente"}, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "Prioridad inválida", status_code=400)
+
+    def test_delete_returns_only_oob_summary(self):
+        set_priority(self.client_obj, self.document, "media")
+        response = self.client.delete(self.delete_url, HTTP_HX_REQUEST="true")
+        self.assertNotContains(response, self.row_id)
+        self.assertContains(response, 'id="priority-summary" hx-swap-oob="true"')
+        self.assertEqual(response.context["priority_summary"], {})
+        self.assertFalse(ClientDocumentPriority.objects.exists())
+
+        response = self.client.delete(self.delete_url, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "Prioridad no encontrada", status_code=404)
+
+    def test_other_users_rows_are_not_found(self):
+        self.client.force_login(User.objects.create_user("intruso"))
+        response = self.client.post(self.update_url, {"priority": "alta"}, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "Cliente o documento no encontrado", status_code=404)
+        response = self.client.delete(self.delete_url, HTTP_HX_REQUEST="true")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(ClientDocumentPriority.objects.exists())
+
+
+class HttpClientTests(FixtureServerMixin, TestCase):
+    handler = OutboundFixtureHandler
+
+    def setUp(self):
+        httpclient.reset()
+        OutboundFixtureHandler.hits = OutboundFixtureHandler.peak = 0
+        self.host = self.base_url.split("//")[1]
+
+    def test_retries_then_opens_circuit(self):
+        client = httpclient.HttpClient(retries=1, backoff=0)
+        with self.settings(HTTP_BREAKER_THRESHOLD=2, HTTP_BREAKER_RESET=60):
+            with self.assertLogs("documents.httpclient", "WARNING"):
+                for _ in range(2):
+                    self.assertEqual(client.get(self.base_url + "/down").status_code, 503)
+            with self.assertRaises(httpclient.CircuitOpenError):
+                client.get(self.base_url + "/ok")
+            self.assertEqual(OutboundFixtureHandler.hits, 4)
+
+            stats = httpclient.metrics()[self.host]
+            self.assertEqual((stats["requests"], stats["errors"], stats["retries"], stats["rejected"]), (2, 2, 2, 1))
+            self.assertEqual(stats["circuit"], "open")
+
+        # After the reset time one probe goes through and closes it again
+        with self.settings(HTTP_BREAKER_THRESHOLD=2, HTTP_BREAKER_RESET=0):
+            self.assertEqual(client.get(self.base_url + "/ok").content, b"ok")
+            self.assertEqual(httpclient.metrics()[self.host]["circuit"], "closed")
+
+    def test_limiter_paces_every_attempt(self):
+        limiter = mock.Mock()
+        client = httpclient.HttpClient(retries=2, backoff=0, limiter=limiter)
+        self.assertEqual(client.get(self.base_url + "/down").status_code, 503)
+        self.assertEqual(OutboundFixtureHandler.hits, 3)
+        self.assertEqual(limiter.wait.call_count, 3)
+
+    def test_limits_requests_in_flight_per_host(self):
+        client = httpclient.HttpClient()
+        with self.settings(HTTP_MAX_PER_HOST=2):
+            threads = [threading.Thread(target=client.get, args=(self.base_url + "/ok",)) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(OutboundFixtureHandler.hits, 6)
+        self.assertEqual(OutboundFixtureHandler.peak, 2)
+        self.assertEqual(httpclient.metrics()[self.host]["bytes"], 12)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every query a view runs against the documents tables must be answered
+    from an index, checked with SQLite's EXPLAIN QUERY PLAN.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("planner", password="secret")
+        cls.client_obj = Client.objects.create(customer=cls.user, name="Cliente")
+        documents = Document.objects.bulk_create([
+            Document(title=f"Resolución {i}", number=f"BOE-A-2025-{i}", date=date(2025, 1, 1 + i % 5),
+                     status="Publicado", url="N/A")
+            for i in range(30)
+        ])
+        ClientDocumentPriority.objects.bulk_create([
+            ClientDocumentPriority(client=cls.client_obj, document=doc, priority="alta")
+            for doc in documents[:15]
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assert_indexed(self, url, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **headers)
+            consume(response)
+        self.assertLess(response.status_code, 400, url)
+
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT") or "documents_" not in sql:
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    self.assertNotRegex(
+                        detail, r"^SCAN documents_\w+$",
+                        f"{url} runs a full table scan:\n{sql}\n{detail}",
+                    )
+
+    def test_document_list(self):
+        self.assert_indexed(reverse("documents:list"))
+        self.assert_indexed(reverse("documents:list") + "?date_from=2025-01-02&date_to=2025-01-03")
+        self.assert_indexed(reverse("documents:list") + "?q=resolucion", HTTP_HX_REQUEST="true")
+        self.assert_indexed(reverse("documents:list") + "?type=resolucion")
+
+    def test_document_list_next_page(self):
+        response = self.client.get(reverse("documents:list"))
+        cursor = response.context["page_obj"].next_cursor
+        self.assert_indexed(reverse("documents:list") + f"?cursor={cursor}", HTTP_HX_REQUEST="true")
+
+    def test_export(self):
+        self.assert_indexed(reverse("documents:export_csv") + "?date_from=2025-01-01&date_to=2025-01-02")
+
+    def test_priority_list(self):
+        url = reverse("documents:priority_list")
+        self.assert_indexed(url)
+        self.assert_indexed(url + "?priority=alta")
+        self.assert_indexed(url + f"?client={self.client_obj.id}&priority=media")
+        self.assert_indexed(url + "?search=resolucion")
+
+    def test_clients(self):
+        self.assert_indexed(reverse("documents:client_list"))
+        self.assert_indexed(reverse("documents:client_documents", args=[self.client_obj.id]))
+        self.assert_indexed(reverse("documents:assign_documents", args=[self.client_obj.id]))
+
+    def test_refresh_job_queue(self):
+        job = enqueue_refresh(date(2025, 1, 1))
+        self.assert_indexed(reverse("documents:job_status", args=[job.id]))
+        with CaptureQueriesContext(connection) as ctx:
+            claim_next_job()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {ctx.captured_queries[0]['sql']}")
+            for row in cursor.fetchall():
+                self.assertNotRegex(row[-1], r"^SCAN documents_\w+$")
+
+
+# Maximum queries per view, including the session and user lookups and,
+# for conditional views, the data version stamps (fragments.py).
+QUERY_BUDGETS = {
+    "list": 7,  # + cached total count on a cache miss, + clients for batch actions, + type facets
+    "refresh": 4,
+    "job_status": 3,
+    "export_csv": 4,
+    "analyze_document": 6,  # + analysis cache lookup and, on a miss, its insert
+    "analyze_document_stream": 5,
+    "client_list": 3,
+    "client_documents": 4,
+    "client_update": 3,
+    "priority_list": 6,
+    # Writes to priorities include up to 3 counter statements (counters.py).
+    "update_priority": 11,
+    "delete_priority": 11,
+    "assign_documents": 11,
+    "assign_documents_bulk": 11,
+    "batch_priority": 13,
+}
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Each view in documents/urls.py must stay within QUERY_BUDGETS, however
+    many rows it lists; repeated statements in the failure point at N+1s.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("budget", password="secret")
+        cls.clients = Client.objects.bulk_create([
+            Client(customer=cls.user, name=f"Cliente {i}") for i in range(5)
+        ])
+        cls.documents = Document.objects.bulk_create([
+            Document(title=f"Ley {i}/2025", number=f"BOE-A-2025-{i}", date=date.today(),
+                     status="Publicado", url="N/A")
+            for i in range(40)
+        ])
+        ClientDocumentPriority.objects.bulk_create([
+            ClientDocumentPriority(client=client, document=doc)
+            for client in cls.clients for doc in cls.documents[:8]
+        ])
+        counters.rebuild()
+        cls.job = enqueue_refresh(date.today())
+
+    def setUp(self):
+        cache.clear()  # budgets assume cold cached counts and fragments
+        self.client.force_login(self.user)
+
+    def requests(self):
+        client_id = self.clients[0].id
+        doc_id = self.documents[0].id
+        htmx = {"HTTP_HX_REQUEST": "true"}
+        return [
+            ("list", "get", reverse("documents:list"), {}, {}),
+            ("list", "get", reverse("documents:list") + "?q=ley", {}, htmx),
+            ("refresh", "get", reverse("documents:refresh"), {}, htmx),
+            ("job_status", "get", reverse("documents:job_status", args=[self.job.id]), {}, htmx),
+            ("export_csv", "get", reverse("documents:export_csv"), {}, {}),
+            ("analyze_document", "post", reverse("documents:analyze_document", args=[doc_id]), {}, {}),
+            ("analyze_document_stream", "get", reverse("documents:analyze_document_stream", args=[doc_id + 1]), {}, {}),
+            ("client_list", "get", reverse("documents:client_list"), {}, {}),
+            ("client_documents", "get", reverse("documents:client_documents", args=[client_id]), {}, {}),
+            ("client_update", "get", reverse("documents:client_update", args=[client_id]), {}, {}),
+            ("priority_list", "get", reverse("documents:priority_list"), {}, {}),
+            ("update_priority", "post", reverse("documents:update_priority", args=[client_id, doc_id]),
+             {"priority": "alta"}, htmx),
+            ("delete_priority", "delete", reverse("documents:delete_priority", args=[client_id, doc_id]), {}, htmx),
+            ("assign_documents", "get", reverse("documents:assign_documents", args=[client_id]), {}, {}),
+            ("assign_documents", "post", reverse("documents:assign_documents", args=[client_id]),
+             {"documents": [d.id for d in self.documents[10:30]], "priority": "baja"}, {}),
+            ("assign_documents_bulk", "post", reverse("documents:assign_documents_bulk", args=[client_id]),
+             json.dumps({"documents": [d.id for d in self.documents[:40]], "priority": "alta"}),
+             {"content_type": "application/json"}),
+            ("batch_priority", "post", reverse("documents:batch_priority"),
+             json.dumps({"operations": [
+                 {"client": c.id, "document": d.id, "priority": "delete" if d.id % 2 else "alta"}
+                 for c in self.clients for d in self.documents[:12]
+             ]}),
+             {"content_type": "application/json"}),
+            ("batch_priority", "post", reverse("documents:batch_priority") + "?priority=alta",
+             {"items": [f"{client_id}:{d.id}" for d in self.documents[:20]], "priority": "baja"},
+             {**htmx, "HTTP_HX_TARGET": "priorities-container"}),
+        ]
+
+    def test_every_view_has_a_budget(self):
+        from .urls import urlpatterns
+
+        self.assertEqual({p.name for p in urlpatterns}, set(QUERY_BUDGETS))
+
+    def test_views_within_budget(self):
+        for name, method, url, data, headers in self.requests():
+            with self.subTest(view=name, method=method, url=url):
+                with assert_max_queries(self, QUERY_BUDGETS[name], f"{method.upper()} {url}"):
+                    response = getattr(self.client, method)(url, data, **headers)
+                    consume(response)
+                self.assertLess(response.status_code, 400)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("documents:list"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries"')
+
+    async def test_server_timing_header_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        for url in (reverse("documents:list"), reverse("documents:job_status", args=[self.job.id])):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+
+class CounterTests(TestCase):
+    """
+    The denormalized counters must match a full recount after every kind
+    of write.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("counted", password="secret")
+        cls.clients = [Client.objects.create(customer=cls.user, name=f"Cliente {i}") for i in range(2)]
+        cls.documents = Document.objects.bulk_create([
+            Document(title=f"Orden {i}", number=f"BOE-A-2025-{i}", date=date(2025, 1, 1),
+                     status="Publicado", url="N/A")
+            for i in range(10)
+        ])
+
+    def assert_in_sync(self):
+        self.assertEqual(counters.rebuild(), (0, 0))
+
+    def test_writes_keep_counters_in_sync(self):
+        first, second = self.clients
+        assign_documents(first, {doc.id: "alta" for doc in self.documents[:6]})
+        set_priority(second, self.documents[0], "media")
+        set_priority(second, self.documents[0], "baja")
+        apply_priority_operations(self.user, [
+            {"client": first.id, "document": self.documents[0].id, "priority": "delete"},
+            {"client": first.id, "document": self.documents[1].id, "priority": "media"},
+            {"client": second.id, "document": self.documents[9].id, "priority": "alta"},
+        ])
+        self.assert_in_sync()
+        self.assertEqual(counters.summary(self.user), {"alta": 5, "media": 1, "baja": 1})
+
+        self.documents[2].delete()
+        first.delete()
+        self.assert_in_sync()
+        self.assertEqual(counters.summary(self.user), {"alta": 1, "baja": 1})
+
+    def test_set_priority_updates_a_row_created_concurrently(self):
+        client, document = self.clients[0], self.documents[0]
+
+        def racing_first(queryset):
+            # Another writer inserts the pair right after set_priority found no row
+            ClientDocumentPriority.objects.bulk_create([ClientDocumentPriority(client=client, document=document, priority="baja")])
+            counters.record(self.user.id, [(client.id, None, "baja")])
+            return None
+
+        with mock.patch.object(QuerySet, "first", autospec=True, side_effect=racing_first):
+            obj, created = set_priority(client, document, "alta")
+        self.assertFalse(created)
+        self.assertEqual(ClientDocumentPriority.objects.get(client=client, document=document).priority, "alta")
+        self.assert_in_sync()
+        self.assertEqual(counters.summary(self.user), {"alta": 1})
+
+    @mock.patch("documents.services.connection")
+    def test_postgresql_writes_take_the_customer_lock(self, db):
+        db.vendor = "postgresql"
+        cursor = db.cursor.return_value.__enter__.return_value
+        set_priority(self.clients[0], self.documents[0], "alta")
+        assign_documents(self.clients[1], {self.documents[1].id: "media"})
+        self.assertEqual(
+            [call.args[1] for call in cursor.execute.call_args_list],
+            [[services._LOCK_NAMESPACE, self.user.id]] * 2,
+        )
+        self.assert_in_sync()
+
+    def test_rebuild_counters_fixes_drift(self):
+        assign_documents(self.clients[0], {doc.id: "media" for doc in self.documents})
+        PriorityCounter.objects.filter(customer=self.user).update(count=0)
+        Client.objects.update(document_count=42)
+
+        out = StringIO()
+        call_command("rebuild_counters", stdout=out)
+        self.assertIn("2 client(s) and 1 priority counter(s) corrected", out.getvalue())
+        self.assert_in_sync()
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cached", password="secret")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_table(self):
+        return self.client.get(reverse("documents:list"), HTTP_HX_REQUEST="true")
+
+    def test_table_is_cached_until_ingestion(self):
+        ingest_documents([{"number": "BOE-A-2025-1", "title": "Ley 1/2025", "url": "N/A"}], date.today())
+        self.assertEqual(self.get_table()["X-Fragment-Cache"], "miss")
+        with self.assertNumQueries(3):  # session, user and version stamps only
+            self.assertEqual(self.get_table()["X-Fragment-Cache"], "hit")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_documents([{"number": "BOE-A-2025-2", "title": "Real Decreto 2/2025", "url": "N/A"}], date.today())
+        response = self.get_table()
+        self.assertEqual(response["X-Fragment-Cache"], "miss")
+        self.assertContains(response, "Real Decreto 2/2025")
+        self.assertEqual(fragments.stats(), {"hits": 1, "misses": 2, "ratio": 1 / 3})
+
+    def test_stamps_are_shared_through_the_database(self):
+        self.assertEqual(self.get_table()["X-Fragment-Cache"], "miss")
+        self.assertEqual(self.get_table()["X-Fragment-Cache"], "hit")
+
+        # A write in the worker process: nothing reaches this process' cache
+        Document.objects.bulk_create([
+            Document(title="Orden 3/2025", number="BOE-A-2025-3", date=date.today(), status="Publicado", url="N/A")
+        ])
+        DataVersion.objects.filter(namespace=fragments.DOCUMENTS).update(version=F("version") + 1)
+        response = self.get_table()
+        self.assertEqual(response["X-Fragment-Cache"], "miss")
+        self.assertContains(response, "Orden 3/2025")
+
+
+class ConditionalResponseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("conditional", password="secret")
+        ingest_documents([{"number": "BOE-A-2025-1", "title": "Ley 1/2025", "url": "N/A"}], date.today())
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_unchanged_responses_are_304(self):
+        doc = Document.objects.get()
+        for url in [reverse("documents:list"), reverse("documents:priority_list"),
+                    reverse("documents:export_csv"), reverse("documents:analyze_document", args=[doc.id])]:
+            with self.subTest(url=url):
+                self.client.get(url)  # sets the CSRF cookie, part of per-user ETags
+                etag = self.client.get(url)["ETag"]
+                with self.assertNumQueries(3):  # session, user and version stamps only
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        url = reverse("documents:list")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(self.client.get(url, HTTP_HX_REQUEST="true")["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_documents([{"number": "BOE-A-2025-2", "title": "Orden 2/2025", "url": "N/A"}], date.today())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_writes_from_other_processes_invalidate_etag(self):
+        url = reverse("documents:export_csv")
+        etag = self.client.get(url)["ETag"]
+        # The scheduler bumps the stamp in its own process and cache
+        DataVersion.objects.filter(namespace=fragments.DOCUMENTS).update(version=F("version") + 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_priority_etags_are_per_user(self):
+        other = User.objects.create_user("vecino", password="secret")
+        client_obj = Client.objects.create(customer=self.user, name="Cliente")
+        assign_documents(client_obj, {Document.objects.get().id: "alta"})
+        documents = Document.objects.bulk_create([
+            Document(title="Orden 2/2025", number="BOE-A-2025-2", date=date.today(), status="Publicado", url="N/A")
+        ])
+        assign_documents(client_obj, {documents[0].id: "baja"})
+        url = reverse("documents:priority_list")
+
+        def etags():
+            result = {}
+            for user in (self.user, other):
+                self.client.force_login(user)
+                self.client.get(url)  # CSRF cookie
+                result[user.username] = self.client.get(url)["ETag"]
+            return result
+
+        before = etags()
+        # Swapping two priorities leaves every total unchanged
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_documents(client_obj, {Document.objects.get(number="BOE-A-2025-1").id: "baja",
+                                          documents[0].id: "alta"})
+        after = etags()
+        self.assertNotEqual(after["conditional"], before["conditional"])
+        self.assertEqual(after["vecino"], before["vecino"])
+
+
+class ParserTests(TestCase):
+    html = (
+        '<html><head><meta charset="utf-8"></head><body>'
+        '<li class="dispo"><p>Anuncio sin departamento</p>'
+        '<ul><li class="puntoPDF"><a href="/boe/dias/2025/01/01/pdfs/BOE-A-2025-7.pdf">PDF</a></li></ul></li>'
+        '<h4>MINISTERIO DE CULTURA &amp; DEPORTE</h4><ul>'
+        '<li class="dispo destacado"><p> Resolución de la Dirección General </p>'
+        '<ul><li class="puntoPDF"><a href="/boe/dias/2025/01/01/pdfs/BOE-A-2025-8.pdf">PDF</a></li></ul></li>'
+        '<li class="dispo"><p>Sin PDF</p><ul><li class="puntoHTML"><a href="/txt">HTML</a></li></ul></li>'
+        '<li class="dispo"><ul><li class="puntoPDF"><a href="/boe/dias/2025/01/01/pdfs/BOE-B-2025-9.pdf">PDF</a></li></ul></li>'
+        '<li class="nodispo"><p>Ignorado</p></li>'
+        '</ul></body></html>'
+    )
+
+    def test_backends_agree_on_edge_cases(self):
+        department = "MINISTERIO DE CULTURA & DEPORTE"
+        expected = [
+            {"number": "BOE-A-2025-7", "title": "Anuncio sin departamento",
+             "url": "https://www.boe.es/boe/dias/2025/01/01/pdfs/BOE-A-2025-7.pdf", "department": ""},
+            {"number": "BOE-A-2025-8", "title": "Resolución de la Dirección General",
+             "url": "https://www.boe.es/boe/dias/2025/01/01/pdfs/BOE-A-2025-8.pdf", "department": department},
+            {"number": "N/A", "title": "Sin PDF", "url": "N/A", "department": department},
+            {"number": "N/A", "title": "Sin título",
+             "url": "https://www.boe.es/boe/dias/2025/01/01/pdfs/BOE-B-2025-9.pdf", "department": department},
+        ]
+        pages = {
+            "utf-8": self.html.encode(),
+            "latin-1": self.html.replace('charset="utf-8"', 'charset="iso-8859-1"').encode("latin-1"),
+        }
+        for backend in PARSERS:
+            for encoding, content in pages.items():
+                with self.subTest(backend=backend, encoding=encoding):
+                    self.assertEqual(parse_documents(content, backend=backend), expected)
+
+    def test_default_backend_falls_back_without_lxml(self):
+        with mock.patch.dict("sys.modules", {"lxml": None}):
+            self.assertEqual(parse_documents(self.html.encode(), backend="auto"),
+                             parse_documents(self.html.encode(), backend="strainer"))
+            with self.assertRaises(ImportError):
+                parse_documents(self.html.encode(), backend="lxml")
+
+
+class EnrichmentTests(TestCase):
+    def test_parsers_agree_on_departments(self):
+        html = build_summary_html(25).encode()
+        records = parse_documents(html, backend="soup")
+        self.assertEqual([r["department"] for r in records[9:12]], [DEPARTMENTS[0], DEPARTMENTS[1], DEPARTMENTS[1]])
+        for backend in PARSERS:
+            with self.subTest(backend=backend):
+                self.assertEqual(parse_documents(html, backend=backend), records)
+
+    def test_ingest_stores_enrichment(self):
+        ingest_documents([{
+            "number": "BOE-A-2025-1",
+            "title": "Real Decreto 12/2025, por el que se modifica la Ley 39/2015 y la Orden HAC/3/2024.",
+            "url": "N/A",
+            "department": "MINISTERIO DE HACIENDA",
+        }], date.today())
+        doc = Document.objects.get()
+        self.assertEqual(doc.doc_type, "real_decreto")
+        self.assertEqual(doc.references, ["Real Decreto 12/2025", "Ley 39/2015", "Orden HAC/3/2024"])
+        self.assertEqual(doc.word_count, 15)
+        self.assertEqual(doc.department, "MINISTERIO DE HACIENDA")
+
+        user = User.objects.create_user("facets", password="secret")
+        self.client.force_login(user)
+        response = self.client.get(reverse("documents:list") + "?type=ley")
+        self.assertEqual(response.context["type_facets"], [{"value": "real_decreto", "label": "Real Decreto", "count": 1}])
+        self.assertEqual(list(response.context["documents"]), [])
+
+    def test_enrich_documents_backfills_in_batches(self):
+        Document.objects.bulk_create([
+            Document(title=f"Ley {i}/2025, de medidas", number=f"BOE-A-2025-{i}", date=date(2025, 1, 1),
+                     status="Publicado", url="N/A")
+            for i in range(5)
+        ])
+        out = StringIO()
+        call_command("enrich_documents", "--batch-size", "2", stdout=out)
+        self.assertIn("5 document(s) processed in 3 batch(es), 5 updated", out.getvalue())
+        self.assertFalse(Document.objects.exclude(doc_type="ley").exists())
+        self.assertEqual(Document.objects.get(number="BOE-A-2025-3").references, ["Ley 3/2025"])
+
+
+class ChangeDetectionTests(TestCase):
+    records = [
+        {"number": "BOE-A-2025-1", "title": "Ley 1/2025", "url": "N/A"},
+        {"number": "BOE-A-2025-2", "title": "Orden 2/2025", "url": "N/A"},
+    ]
+
+    def test_ingest_logs_inserts_and_real_changes(self):
+        day = date(2025, 1, 1)
+        self.assertEqual(ingest_documents(self.records, day)["inserted"], 2)
+        self.assertEqual(DocumentChange.objects.filter(kind=DocumentChange.CREATED).count(), 2)
+
+        with self.assertNumQueries(3):  # savepoint, stored hashes, release
+            counts = ingest_documents(self.records, day)
+        self.assertEqual((counts["updated"], counts["skipped"]), (0, 2))
+
+        corrected = [self.records[0], {**self.records[1], "title": "Real Decreto 2/2025", "status": "Corregido"}]
+        self.assertEqual(ingest_documents(corrected, day)["updated"], 1)
+        change = DocumentChange.objects.get(kind=DocumentChange.UPDATED)
+        self.assertEqual(change.document.number, "BOE-A-2025-2")
+        self.assertEqual(change.changes, {
+            "title": ["Orden 2/2025", "Real Decreto 2/2025"],
+            "status": ["Publicado", "Corregido"],
+        })
+        self.assertEqual(change.document.doc_type, "real_decreto")
+        self.assertEqual(DocumentChange.objects.count(), 3)
+
+    def test_migration_hash_matches_ingest(self):
+        # 0014 keeps its own copy; documents hashed by it must not all look changed
+        migration = importlib.import_module("documents.migrations.0014_document_changes")
+        record = {**self.records[0], "department": "Jefatura del Estado", "status": "Publicado"}
+        self.assertEqual(migration.record_hash(record), record_hash(record))
+
+    def test_created_log_skips_rows_inserted_concurrently(self):
+        day = date(2025, 1, 1)
+        enrich = enrichment.enrich
+
+        def racing_enrich(title):
+            # Another writer stores the first number after the stored rows were read
+            if not Document.objects.filter(date=day).exists():
+                Document.objects.create(number="BOE-A-2025-1", date=day, title="Ley 1/2025", url="N/A")
+            return enrich(title)
+
+        with mock.patch("documents.scraping.enrichment.enrich", side_effect=racing_enrich):
+            counts = ingest_documents(self.records, day)
+        self.assertEqual(counts["inserted"], 1)
+        self.assertEqual(
+            list(DocumentChange.objects.filter(kind=DocumentChange.CREATED).values_list("document__number", flat=True)),
+            ["BOE-A-2025-2"],
+        )
+
+    def test_run_scheduler_survives_failed_polls(self):
+        with mock.patch("documents.management.commands.run_scheduler.poll",
+                        side_effect=[OperationalError("database is locked"), [], KeyboardInterrupt]) as poll:
+            with self.assertLogs("documents.management.commands.run_scheduler", "ERROR") as logs:
+                with self.assertRaises(KeyboardInterrupt):
+                    call_command("run_scheduler", "--interval", "0", stdout=StringIO())
+        self.assertEqual(poll.call_count, 3)
+        self.assertIn("BOE poll failed", logs.output[0])
+
+    def test_run_scheduler_polls_recent_days(self):
+        unchanged = {"inserted": 0, "updated": 0, "skipped": 3, "cache": "hit"}
+        out = StringIO()
+        with mock.patch("documents.jobs.fetch_documents", return_value=unchanged) as fetch:
+            call_command("run_scheduler", "--once", "--days", "2", stdout=out)
+        today = date.today()
+        self.assertEqual(sorted(call.args[0] for call in fetch.call_args_list), [today - timedelta(days=1), today])
+        self.assertEqual(RefreshJob.objects.filter(status="done").count(), 2)
+        self.assertIn(f"{today}: 0 inserted, 0 updated (unchanged)", out.getvalue())
+
+
+class AnalysisTests(FixtureServerMixin, TestCase):
+    handler = FakeChatHandler
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("analyst", password="secret")
+        ingest_documents([
+            {"number": f"BOE-A-2025-{i}", "title": title, "url": "N/A"}
+            for i, title in enumerate(["Ley 1/2025", "Orden HAC/2/2025", "FAIL Resolución", "Ley 1/2025"])
+        ], date.today())
+
+    def setUp(self):
+        FakeChatHandler.calls = 0
+
+    def test_analyze_document_reads_the_cache(self):
+        doc = Document.objects.get(number="BOE-A-2025-0")
+        self.client.force_login(self.user)
+        url = reverse("documents:analyze_document", args=[doc.id])
+        self.assertIn("Ley 1/2025", self.client.get(url).json()["analysis"])
+        with self.assertNumQueries(5):  # session, user, stamps, document, cache
+            self.assertIn("Ley 1/2025", self.client.post(url).json()["analysis"])
+        self.assertEqual(AnalysisCache.objects.get().analyzer, "mock:1")
+
+    def test_batch_with_remote_analyzer(self):
+        with self.settings(ANALYZER="openai", ANALYZER_URL=self.base_url, ANALYZER_WORKERS=2), \
+                self.assertLogs("documents.analysis", "WARNING"):
+            totals = analysis.analyze_many(Document.objects.all())
+            self.assertEqual(totals, {"analyzed": 2, "cached": 0, "failed": 1})
+            self.assertEqual(FakeChatHandler.calls, 3)  # duplicate titles share one call
+
+            totals = analysis.analyze_many(Document.objects.all())
+            self.assertEqual(totals, {"analyzed": 0, "cached": 2, "failed": 1})
+            self.assertEqual(analysis.analyze(Document.objects.get(number="BOE-A-2025-3"))[:10], "LEY 1/2025")
+            self.assertEqual(FakeChatHandler.calls, 4)
+
+            self.client.force_login(self.user)
+            failing = Document.objects.get(number="BOE-A-2025-2")
+            response = self.client.get(reverse("documents:analyze_document", args=[failing.id]))
+            self.assertEqual(response.status_code, 502)
+
+    def test_refresh_job_pre_analyzes_the_day(self):
+        job = enqueue_refresh(date.today())
+        with mock.patch("documents.jobs.fetch_documents", return_value={"inserted": 4, "updated": 0}):
+            run_job(job)
+        self.assertEqual(job.result["analysis"], {"analyzed": 3, "cached": 0, "failed": 0})
+
+    def test_content_hash_covers_every_prompt_field(self):
+        doc = Document.objects.get(number="BOE-A-2025-1")
+        with self.settings(ANALYZER_URL=self.base_url):
+            remote = analysis.get_analyzer("openai")
+            digest = analysis.content_hash(doc, remote)
+            self.assertNotEqual(analysis.content_hash(doc, analysis.get_analyzer("mock")), digest)
+            with self.settings(ANALYZER_MODEL="otro-modelo"):
+                self.assertNotEqual(analysis.content_hash(doc, analysis.get_analyzer("openai")), digest)
+
+            analysis.analyze(doc, remote)
+            doc.department = "MINISTERIO DE HACIENDA"
+            self.assertNotEqual(analysis.content_hash(doc, remote), digest)
+            self.assertIn("MINISTERIO DE HACIENDA", analysis.analyze(doc, remote))
+            self.assertEqual(FakeChatHandler.calls, 2)
+
+        # The mock analyzer does not read the department
+        mock_analyzer = analysis.get_analyzer("mock")
+        self.assertEqual(analysis.content_hash(doc, mock_analyzer),
+                         analysis.content_hash(Document.objects.get(pk=doc.pk), mock_analyzer))
+
+
+class StreamingAnalysisTests(FixtureServerMixin, TestCase):
+    handler = FakeChatHandler
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("streamer", password="secret")
+        ingest_documents([
+            {"number": "BOE-A-2025-1", "title": "Ley 1/2025, de medidas", "url": "N/A"},
+            {"number": "BOE-A-2025-2", "title": "FAIL Resolución", "url": "N/A"},
+        ], date.today())
+
+    async def events(self, number):
+        document = await Document.objects.aget(number=number)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("documents:analyze_document_stream", args=[document.id]))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        return [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in body.strip().split("\n\n")
+        ]
+
+    async def test_tokens_are_streamed_then_cached(self):
+        events = await self.events("BOE-A-2025-1")
+        self.assertEqual(events[0][0], "start")
+        tokens = [data["text"] for event, data in events if event == "token"]
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(events[-1][0], "done")
+        self.assertFalse(events[-1][1]["cached"])
+        self.assertEqual(await AnalysisCache.objects.values_list("result", flat=True).aget(), "".join(tokens))
+
+        events = await self.events("BOE-A-2025-1")
+        self.assertEqual([event for event, _ in events], ["start", "token", "done"])
+        self.assertTrue(events[-1][1]["cached"])
+
+    async def test_remote_stream_and_failures(self):
+        with self.settings(ANALYZER="openai", ANALYZER_URL=self.base_url):
+            events = await self.events("BOE-A-2025-1")
+            text = "".join(data["text"] for event, data in events if event == "token")
+            self.assertTrue(text.startswith("LEY 1/2025, DE MEDIDAS"), text)
+            with self.assertLogs("documents.views", "WARNING"):
+                events = await self.events("BOE-A-2025-2")
+            self.assertEqual(events[-1][0], "failed")
+        self.assertEqual(await AnalysisCache.objects.acount(), 1)
+
+    async def test_disconnect_cancels_the_analysis(self):
+        document = await Document.objects.aget(number="BOE-A-2025-1")
+        events = views._analysis_events(document, analysis.get_analyzer(), 0)
+        await anext(events)  # start
+        await anext(events)  # first token
+        with self.assertRaises(asyncio.CancelledError), self.assertLogs("documents.views", "INFO"):
+            await events.athrow(asyncio.CancelledError())
+        self.assertFalse(await AnalysisCache.objects.aexists())
+
+
+class PdfPipelineTests(FixtureServerMixin, TestCase):
+    handler = PdfFixtureHandler
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store_dir = tmp.name
+        ingest_documents([
+            {"number": "BOE-A-2025-1", "title": "Ley 1/2025", "url": f"{self.base_url}/pdfs/1.pdf"},
+            {"number": "BOE-A-2025-2", "title": "Orden 2/2025", "url": f"{self.base_url}/pdfs/same/2.pdf"},
+            {"number": "BOE-A-2025-3", "title": "Orden 3/2025", "url": f"{self.base_url}/pdfs/same/3.pdf"},
+            {"number": "BOE-A-2025-4", "title": "Anuncio sin PDF", "url": "N/A"},
+            {"number": "BOE-A-2025-5", "title": "Enlace roto", "url": f"{self.base_url}/pdfs/missing.pdf"},
+        ], date.today())
+
+    def fetch(self):
+        with self.settings(CONTENT_STORE_DIR=self.store_dir), self.assertLogs("documents.pdfs", "WARNING"):
+            return fetch_pdfs(Document.objects.all(), workers=4, backend="raw")
+
+    def test_fetch_dedupes_and_skips_on_rerun(self):
+        totals = self.fetch()
+        self.assertEqual(totals["fetched"], 3)
+        self.assertEqual(totals["deduplicated"], 1)
+        self.assertEqual(totals["failed"], 1)
+        stored = [name for _, _, files in os.walk(self.store_dir) for name in files]
+        self.assertEqual(len(stored), 2)
+
+        content = DocumentContent.objects.get(document__number="BOE-A-2025-1")
+        self.assertEqual(content.pages, 3)
+        self.assertIn("Artículo 40. Texto del expediente 1", content.text)
+
+        requests_before = PdfFixtureHandler.requests
+        totals = self.fetch()  # only the broken link is requested again
+        self.assertEqual((totals["fetched"], totals["skipped"]), (0, 3))
+        self.assertEqual(PdfFixtureHandler.requests, requests_before + 1)
+
+    def test_pdf_text_is_searchable(self):
+        self.fetch()
+        found = filter_documents(document_filters({"q": "contratacion expediente"}))
+        self.assertEqual(sorted(found.values_list("number", flat=True)),
+                         ["BOE-A-2025-1", "BOE-A-2025-2", "BOE-A-2025-3"])
+        # Title matches still rank first
+        self.client.force_login(User.objects.create_user("reader", password="secret"))
+        response = self.client.get(reverse("documents:list") + "?q=ley")
+        self.assertEqual(response.context["documents"][0].number, "BOE-A-2025-1")
+
+
+class SQLiteTuningTests(TestCase):
+    def test_connection_pragmas(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            synchronous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+            busy_timeout = cursor.execute("PRAGMA busy_timeout").fetchone()[0]
+        self.assertEqual(synchronous, 1)  # NORMAL
+        self.assertEqual(busy_timeout, 5000)
+
+
+class BenchmarkHarnessTests(TestCase):
+    def setUp(self):
+        self.created = seed(documents=50, customers=2, clients=4, priorities=5)
+
+    def test_seed_and_clear(self):
+        self.assertEqual(self.created, {"documents": 50, "customers": 2, "clients": 4, "priorities": 20})
+        self.assertEqual(Document.objects.filter(number__startswith="SEED-").count(), 50)
+        seeded = Document.objects.filter(number__startswith="SEED-").first()
+        self.assertEqual(seeded.doc_type, enrichment.classify(seeded.title))
+        self.assertEqual(sum(PriorityCounter.objects.values_list("count", flat=True)), 20)
+
+        self.assertEqual(clear_seed(), 50)
+        self.assertFalse(Document.objects.filter(number__startswith="SEED-").exists())
+        self.assertFalse(Client.objects.exists())
+
+    def test_bench_concurrency_clears_only_its_days(self):
+        first_day = bench_concurrency.FIRST_DAY
+        for offset in (-1, 0, 1, 2):
+            ingest_documents(parse_documents(build_summary_html(3, start=offset * 10 + 100)), first_day + timedelta(days=offset))
+        written = Document.objects.filter(date=first_day).first()
+        client = Client.objects.first()
+        before = client.document_count
+        set_priority(client, written, "alta")
+
+        self.assertEqual(bench_concurrency.clear_days(2), 6)
+        self.assertEqual(
+            sorted(Document.objects.filter(date__lt=date(1901, 1, 1)).values_list("date", flat=True).distinct()),
+            [first_day - timedelta(days=1), first_day + timedelta(days=2)],
+        )
+        self.assertFalse(DocumentChange.objects.filter(document_id=written.pk).exists())
+        client.refresh_from_db()
+        self.assertEqual(client.document_count, before)
+        self.assertEqual(counters.rebuild(), (0, 0))
 
-# Create your tests here.
+    def test_bench_views_writes_comparable_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "views.json")
+            call_command("bench_views", repeat=2, items=20, output=path, stdout=StringIO())
+            with open(path) as f:
+                run = json.load(f)
+        self.assertEqual(run["benchmark"], "views")
+        self.assertEqual(run["database"], connection.vendor)
+        for name in ("ingest", "document_list", "export_csv", "priority_list", "update_priority"):
+            self.assertEqual(run["results"][name]["runs"], 2)
+            self.assertGreater(run["results"][name]["queries"], 0)
+        self.assertLessEqual(run["results"]["document_list"]["p50"], run["results"]["document_list"]["p99"])
@@ -6,8 +6,10 @@ app_name = "documents"
 urlpatterns = [
     path("", views.document_list, name="list"),
     path("refresh/", views.refresh, name="refresh"),
+    path("refresh/<int:pk>/", views.job_status, name="job_status"),
     path("export/", views.export_csv, name="export_csv"),
     path("analyze/<int:pk>/", views.analyze_document, name="analyze_document"),
+    path("analyze/<int:pk>/stream/", views.analyze_document_stream, name="analyze_document_stream"),
 
     path("clients/", views.ClientView.as_view(), name="client_list"),
     path("clients/<int:pk>/", views.ClientDocumentsView.as_view(), name="client_documents"),
@@ -19,6 +21,9 @@ urlpatterns = [
          views.update_document_priority, name="update_priority"),
     path("priority/delete/<int:client_id>/<int:document_id>/", 
          views.delete_document_priority, name="delete_priority"),
+    path("priority/batch/", views.batch_update_priorities, name="batch_priority"),
     path("clients/<int:client_id>/assign-documents/", 
          views.assign_documents_to_client, name="assign_documents"),
+    path("clients/<int:client_id>/assign-documents/bulk/",
+         views.assign_documents_bulk, name="assign_documents_bulk"),
 ]
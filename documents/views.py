@@ -1,10 +1,19 @@
-import re
+import asyncio
 import csv
+import itertools
+import json
+import logging
+import time
+import zlib
 from datetime import date
 
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import models, transaction
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse
+from django.urls import reverse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
 from django.views.generic import ListView, DetailView, UpdateView
@@ -12,97 +21,319 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from rest_framework.reverse import reverse_lazy
 
+from . import analysis, fragments
 from .forms import ClientForm
-from .models import Document, Client, ClientDocumentPriority
-from .scraping import fetch_documents
-
-
-@login_required
-def document_list(request):
+from .conditional import conditional
+from .fragments import render_fragment
+from .jobs import enqueue_refresh
+from .models import Document, Client, ClientDocumentPriority, RefreshJob
+from .pagination import keyset_paginate
+from .queries import (
+    document_filters, filter_documents, filter_priorities, priority_filters, priority_summary,
+    type_facets,
+)
+from .search import rank_documents
+from .services import apply_priority_operations, assign_documents, remove_priorities, set_priority
+
+logger = logging.getLogger(__name__)
+
+
+def _filter_params(request):
     """
-    View to list only today's documents with optional search and pagination.
-    - Filters documents by today's date.
-    - Supports search by document title using query parameter `q`.
-    - Pagination: 10 items per page.
-    - HTMX requests return only the table partial.
+    Current filters as a query string, for pagination and export links.
     """
-    today = date.today()
-    query = request.GET.get("q", "")
-    page = request.GET.get("page", 1)
+    params = request.GET.copy()
+    for key in ("page", "cursor", "job"):
+        params.pop(key, None)
+    return params.urlencode()
 
-    # Filter only today's documents
-    documents = Document.objects.all().order_by('-date')
-    if query:
-        documents = documents.filter(title__icontains=query)
 
-    # Paginate results
-    paginator = Paginator(documents, 10)
-    page_obj = paginator.get_page(page)
+def _document_list_context(request):
+    filters = document_filters(request.GET)
+    query = filters["q"]
+    page = request.GET.get("page", 1)
 
-    context = {
+    documents = filter_documents(filters)
+    if query:
+        # Relevance order has no stable key to seek on
+        paginator = Paginator(rank_documents(documents, query), 10)
+        page_obj = paginator.get_page(page)
+    else:
+        paginator = None
+        page_obj = keyset_paginate(documents, request.GET.get("cursor"), keys=("date", "id"), count=True)
+
+    return {
         "documents": page_obj.object_list,
         "page_obj": page_obj,
         "paginator": paginator,
         "query": query,
+        "date_from": filters["date_from"],
+        "date_to": filters["date_to"],
+        "doc_type": filters["type"],
+        "filter_params": _filter_params(request),
     }
 
-    # HTMX partial response
+
+@login_required
+@conditional(fragments.DOCUMENTS, fragments.PRIORITIES, per_user=True)
+def document_list(request):
+    """
+    View to list only today's documents with optional search and pagination.
+    - Filters documents by today's date.
+    - Supports full-text search by document title using query parameter
+      `q`; results are ranked by relevance.
+    - Optional `date_from` / `date_to` bounds (YYYY-MM-DD) and `type`
+      filter; the full page shows per-type counts (`type_facets`).
+    - Pagination: 10 items per page, keyset-based (`cursor`) on
+      (date, id); ranked search results use page numbers instead.
+    - HTMX requests return only the table partial, served from the
+      fragment cache (see `fragments.py`).
+    - `job` shows the progress of a queued refresh (see `refresh`).
+    - Answers 304 when nothing changed (see `conditional.py`).
+    """
+    # HTMX partial response, cached until the documents change
     if request.headers.get("HX-Request"):
-        return render(request, "partials/table.html", context)
+        return render_fragment(
+            request, "partials/table.html", lambda: _document_list_context(request), [fragments.DOCUMENTS]
+        )
+
+    context = _document_list_context(request)
+    context["user_clients"] = Client.objects.filter(customer=request.user)
+    context["type_facets"] = type_facets(document_filters(request.GET))
+
+    job_id = request.GET.get("job")
+    if job_id and job_id.isdigit():
+        context["job"] = RefreshJob.objects.filter(pk=job_id).first()
 
     return render(request, "documents/list.html", context)
 
 
 @login_required
-def refresh(request):
+async def refresh(request):
     """
-    Refresh today's documents list by scraping new data.
-    Reuses the main listing logic.
+    Queue a background refresh of today's documents.
+    - Returns immediately; the scraping runs in the `run_worker` process.
+    - Concurrent refreshes for the same day share one job.
+    - HTMX requests get the polling status partial, others are redirected
+      to the list, which shows the same partial.
     """
-    fetch_documents()
-    return document_list(request)
+    job = await sync_to_async(enqueue_refresh)(date.today())
+
+    if request.headers.get("HX-Request"):
+        return render(request, "partials/refresh_status.html", {"job": job})
+
+    return redirect(f"{reverse('documents:list')}?job={job.id}")
 
 
 @login_required
+async def job_status(request, pk):
+    """
+    Report the state of a refresh job.
+    - HTMX requests get the status partial, which keeps polling while the
+      job is pending/running and reloads the table once it finishes.
+    - Other requests get JSON.
+    - Async: every open page polls this while a refresh runs.
+    """
+    job = await RefreshJob.objects.filter(pk=pk).afirst()
+    if job is None:
+        raise Http404("No RefreshJob matches the given query.")
+
+    if request.headers.get("HX-Request"):
+        return render(request, "partials/refresh_status.html", {"job": job})
+
+    return JsonResponse({
+        "id": job.id,
+        "day": job.day.isoformat(),
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+    })
+
+
+class Echo:
+    """
+    File-like object whose `write` returns the value, so `csv.writer`
+    can format rows for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+EXPORT_FIELDS = ("title", "number", "date", "status", "url")
+
+
+def _export_rows(documents, export_format):
+    """
+    Yield the export as text chunks, one per row after the header.
+    """
+    rows = documents.values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+
+    if export_format == "ndjson":
+        for row in rows:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record["date"] = record["date"].isoformat()
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(["Title", "Number", "Date", "Status", "URL"])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _gzip_chunks(chunks):
+    """
+    Compress a stream of text chunks on the fly.
+    """
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Export chunks produced per worker thread hop under ASGI
+ASYNC_EXPORT_BATCH = 500
+
+
+async def _aiter_chunks(chunks):
+    """
+    Async iterator over a sync stream of chunks, producing them in
+    batches of ASYNC_EXPORT_BATCH in the request's thread-sensitive
+    worker thread, where the queryset cursor lives.
+    - Under ASGI a sync iterator would be read to the end, in memory,
+      before the first byte is sent.
+    """
+    batch = sync_to_async(lambda: list(itertools.islice(chunks, ASYNC_EXPORT_BATCH)))
+    while items := await batch():
+        for item in items:
+            yield item
+
+
+@login_required
+@conditional(fragments.DOCUMENTS)
 def export_csv(request):
     """
-    Export only today's documents as CSV.
+    Stream documents as CSV (or NDJSON) without loading them in memory.
+    - Takes the same `q`, `date_from`, `date_to` and `type` filters as
+      `document_list`; without date filters only today's documents are
+      exported, as before.
+    - `format=ndjson` emits one JSON object per line.
+    - `gzip=1` compresses the stream into a `.gz` attachment.
+    - Under ASGI the stream is an async iterator (`_aiter_chunks`).
     - Columns: Title, Number, Date, Status, URL
+    - Answers 304 when the documents did not change.
     """
-    today = date.today()
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = 'attachment; filename="documents_today.csv"'
-    writer = csv.writer(response)
-    writer.writerow(["Title", "Number", "Date", "Status", "URL"])
-
-    for doc in Document.objects.filter(date=today):
-        writer.writerow([doc.title, doc.number, doc.date, doc.status, doc.url])
+    filters = document_filters(request.GET)
+    if not filters["date_from"] and not filters["date_to"]:
+        filters["date_from"] = filters["date_to"] = date.today()
+    documents = filter_documents(filters).order_by("date", "id")
+
+    export_format = "ndjson" if request.GET.get("format") == "ndjson" else "csv"
+    content_type = "application/x-ndjson" if export_format == "ndjson" else "text/csv"
+    filename = f"documents_{filters['date_from'] or 'all'}_{filters['date_to'] or 'all'}.{export_format}"
+    chunks = _export_rows(documents, export_format)
+
+    if request.GET.get("gzip") == "1":
+        chunks = _gzip_chunks(chunks)
+        content_type = "application/gzip"
+        filename += ".gz"
+
+    if isinstance(request, ASGIRequest):
+        chunks = _aiter_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
 @login_required
 @csrf_exempt
-def analyze_document(request, pk):
+@conditional(fragments.DOCUMENTS)
+async def analyze_document(request, pk):
     """
     Analyze a document using AI (mocked version by default).
     - Works only with today's documents.
+    - Results come from the analysis cache, filled by the refresh jobs
+      (see `analysis.py`); a miss runs the configured analyzer once.
+    - Async: under ASGI a miss waits for the model on the event loop
+      instead of holding a worker.
+    - GET is cacheable: repeated analyses of an unchanged document are
+      answered with 304.
     """
+    document = await Document.objects.filter(pk=pk, date=date.today()).afirst()
+    if document is None:
+        return JsonResponse({"error": "Document not found"}, status=404)
     try:
-        today = date.today()
-        document = Document.objects.get(pk=pk, date=today)
-
-        # --- DEMO MODE (mock AI analysis) ---
-        entities = re.findall(r"(Ley|Decreto|Resoluci[oó]n)\s+\d+\/\d{4}", document.title)
-        ai_message = (
-            f"Summary (simulated AI): This document titled '{document.title}' "
-            f"contains {len(document.title.split())} words. "
-            f"Detected entities: {', '.join(entities) if entities else 'None'}."
-        )
+        return JsonResponse({"analysis": await analysis.aanalyze(document)})
+    except analysis.AnalysisError:
+        return JsonResponse({"error": "Analysis unavailable"}, status=502)
+
 
-        return JsonResponse({"analysis": ai_message})
-    except Document.DoesNotExist:
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _analysis_events(document, analyzer, started):
+    """
+    Server-sent events for one analysis: `start` right away, `token`
+    per chunk, then `done` with the timings, or `failed`.
+    - A client disconnect cancels the generator, which closes the
+      upstream call and stores nothing.
+    """
+    yield _sse("start", {"document": document.pk})
+    first_token = None
+    cached = await analysis.acached(document, analyzer)
+    try:
+        if cached is not None:
+            first_token = time.perf_counter() - started
+            yield _sse("token", {"text": cached})
+        else:
+            async for chunk in analysis.astream(document, analyzer):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                yield _sse("token", {"text": chunk})
+    except analysis.AnalysisError:
+        logger.warning("Streaming analysis of document %s failed", document.pk, exc_info=True)
+        yield _sse("failed", {"error": "Analysis unavailable"})
+        return
+    except asyncio.CancelledError:
+        logger.info("Streaming analysis of document %s cancelled by the client", document.pk)
+        raise
+
+    timings = {
+        "cached": cached is not None,
+        "first_token_ms": round((first_token or 0) * 1000, 1),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    logger.info("Streamed analysis of document %s: %s", document.pk, timings)
+    yield _sse("done", timings)
+
+
+@login_required
+async def analyze_document_stream(request, pk):
+    """
+    Stream the analysis of one of today's documents as server-sent events.
+    - Async view: under ASGI the stream is served from the event loop,
+      without holding a worker thread while the model answers.
+    - Cached analyses are sent as a single token; otherwise tokens are
+      relayed as the analyzer produces them and cached at the end.
+    - `done` reports time to first token and total time, also logged.
+    """
+    started = time.perf_counter()
+    document = await Document.objects.filter(pk=pk, date=date.today()).afirst()
+    if document is None:
         return JsonResponse({"error": "Document not found"}, status=404)
 
+    response = StreamingHttpResponse(
+        _analysis_events(document, analysis.get_analyzer(), started), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # no proxy buffering between tokens
+    return response
+
 
 class ClientView(LoginRequiredMixin, ListView):
     model = Client
@@ -110,7 +341,8 @@ class ClientView(LoginRequiredMixin, ListView):
     context_object_name = "clients"
 
     def get_queryset(self):
-        return Client.objects.filter(customer=self.request.user).annotate(count_docu=models.Count("documents"))
+        # count_docu is what the templates read; served from the counter column
+        return Client.objects.filter(customer=self.request.user).annotate(count_docu=models.F("document_count"))
 
 
 class ClientDocumentsView(LoginRequiredMixin, DetailView):
@@ -134,46 +366,47 @@ class ClientUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy("documents:client_list")
 
 
+@method_decorator(conditional(fragments.DOCUMENTS, fragments.PRIORITIES, per_user=True), name="get")
 class ClientDocumentPriorityView(LoginRequiredMixin, ListView):
     model = ClientDocumentPriority
     template_name = "client/priority_list.html"
     context_object_name = "priorities"
     paginate_by = 10
 
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Keyset pagination on (created_at, id) driven by the `cursor`
+        parameter, instead of COUNT(*) + OFFSET page numbers.
+        """
+        page = keyset_paginate(
+            queryset, self.request.GET.get("cursor"), keys=("created_at", "id"), per_page=page_size
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
     def get_queryset(self):
-        queryset = ClientDocumentPriority.objects.filter(
-            client__customer=self.request.user
-        ).select_related('client', 'document').order_by('-created_at')
-        
-        # Filter by priority if specified
-        priority_filter = self.request.GET.get('priority')
-        if priority_filter and priority_filter in ['alta', 'media', 'baja']:
-            queryset = queryset.filter(priority=priority_filter)
-        
-        # Filter by client if specified
-        client_filter = self.request.GET.get('client')
-        if client_filter:
-            try:
-                client_id = int(client_filter)
-                queryset = queryset.filter(client_id=client_id)
-            except (ValueError, TypeError):
-                pass
-        
-        # Search by document title
-        search_query = self.request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(document__title__icontains=search_query)
-        
-        return queryset
+        return filter_priorities(self.request.user, priority_filters(self.request.GET))
+
+    def get(self, request, *args, **kwargs):
+        """
+        HTMX filter requests get just the table, from the fragment cache.
+        """
+        if not request.headers.get('HX-Request'):
+            return super().get(request, *args, **kwargs)
+
+        def context():
+            page = keyset_paginate(
+                self.get_queryset(), request.GET.get("cursor"), keys=("created_at", "id"), per_page=self.paginate_by
+            )
+            return {'priorities': page.object_list, 'filter_params': _filter_params(request)}
+
+        return render_fragment(
+            request, 'partials/priority_table.html', context,
+            fragments.scoped([fragments.DOCUMENTS, fragments.PRIORITIES], request.user.pk), scope=request.user.pk,
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        # Get priority summary for the user's clients
-        user_priorities = ClientDocumentPriority.objects.filter(
-            client__customer=self.request.user
-        ).values('priority').annotate(count=models.Count('priority'))
-        context['priority_summary'] = {item['priority']: item['count'] for item in user_priorities}
+        context['priority_summary'] = priority_summary(self.request.user)
         
         # Get user's clients for filter dropdown
         context['user_clients'] = Client.objects.filter(customer=self.request.user)
@@ -182,10 +415,23 @@ class ClientDocumentPriorityView(LoginRequiredMixin, ListView):
         context['current_priority'] = self.request.GET.get('priority', '')
         context['current_client'] = self.request.GET.get('client', '')
         context['current_search'] = self.request.GET.get('search', '')
+        context['filter_params'] = _filter_params(self.request)
         
         return context
 
 
+def _priority_row_response(request, priority):
+    """
+    HTMX response for a single-row change on the priority dashboard: the
+    row itself (empty to remove it) plus out-of-band summary counters.
+    """
+    return render(request, 'partials/priority_row_update.html', {
+        'priority': priority,
+        'priority_summary': priority_summary(request.user),
+        'filter_params': _filter_params(request),
+    })
+
+
 @login_required
 @csrf_exempt
 def update_document_priority(request, client_id, document_id):
@@ -204,37 +450,14 @@ def update_document_priority(request, client_id, document_id):
             document = Document.objects.get(id=document_id)
             
             # Create or update priority
-            priority_obj, created = ClientDocumentPriority.objects.update_or_create(
-                client=client,
-                document=document,
-                defaults={'priority': priority}
-            )
+            priority_obj, created = set_priority(client, document, priority)
             
-            # HTMX request - return partial template
+            # HTMX request - return the updated row only
             if request.headers.get('HX-Request'):
-                # Get updated priorities list for the partial
-                priorities = ClientDocumentPriority.objects.filter(
-                    client__customer=request.user
-                ).select_related('client', 'document').order_by('-created_at')
-                
-                # Apply current filters if any
-                priority_filter = request.GET.get('priority')
-                if priority_filter and priority_filter in ['alta', 'media', 'baja']:
-                    priorities = priorities.filter(priority=priority_filter)
-                
-                client_filter = request.GET.get('client')
-                if client_filter:
-                    try:
-                        client_id_filter = int(client_filter)
-                        priorities = priorities.filter(client_id=client_id_filter)
-                    except (ValueError, TypeError):
-                        pass
-                
-                search_query = request.GET.get('search')
-                if search_query:
-                    priorities = priorities.filter(document__title__icontains=search_query)
-                
-                return render(request, 'partials/priority_table.html', {'priorities': priorities})
+                # Drop the row when it no longer matches the priority filter
+                filters = priority_filters(request.GET)
+                row = priority_obj if filters['priority'] in (None, priority) else None
+                return _priority_row_response(request, row)
             
             # Regular AJAX request
             return JsonResponse({
@@ -266,37 +489,13 @@ def delete_document_priority(request, client_id, document_id):
             client = Client.objects.get(id=client_id, customer=request.user)
             document = Document.objects.get(id=document_id)
             
-            priority_obj = ClientDocumentPriority.objects.get(
-                client=client,
-                document=document
-            )
-            priority_obj.delete()
+            with transaction.atomic():
+                if not remove_priorities(client.customer_id, [(client.id, document.id)]):
+                    raise ClientDocumentPriority.DoesNotExist
             
-            # HTMX request - return updated partial template
+            # HTMX request - the row is removed client side
             if request.headers.get('HX-Request'):
-                # Get updated priorities list for the partial
-                priorities = ClientDocumentPriority.objects.filter(
-                    client__customer=request.user
-                ).select_related('client', 'document').order_by('-created_at')
-                
-                # Apply current filters if any (same logic as update)
-                priority_filter = request.GET.get('priority')
-                if priority_filter and priority_filter in ['alta', 'media', 'baja']:
-                    priorities = priorities.filter(priority=priority_filter)
-                
-                client_filter = request.GET.get('client')
-                if client_filter:
-                    try:
-                        client_id_filter = int(client_filter)
-                        priorities = priorities.filter(client_id=client_id_filter)
-                    except (ValueError, TypeError):
-                        pass
-                
-                search_query = request.GET.get('search')
-                if search_query:
-                    priorities = priorities.filter(document__title__icontains=search_query)
-                
-                return render(request, 'partials/priority_table.html', {'priorities': priorities})
+                return _priority_row_response(request, None)
             
             # Regular AJAX request
             return JsonResponse({'success': True})
@@ -334,24 +533,13 @@ def assign_documents_to_client(request, client_id):
         if priority not in ['alta', 'media', 'baja']:
             priority = 'media'
         
-        success_count = 0
-        for doc_id in document_ids:
-            try:
-                document = Document.objects.get(id=doc_id)
-                _, created = ClientDocumentPriority.objects.update_or_create(
-                    client=client,
-                    document=document,
-                    defaults={'priority': priority}
-                )
-                if created:
-                    success_count += 1
-            except Document.DoesNotExist:
-                continue
+        result = assign_documents(client, {doc_id: priority for doc_id in document_ids})
         
         if request.headers.get('HX-Request'):
             return JsonResponse({
                 'success': True,
-                'message': f'{success_count} documentos asignados correctamente'
+                'message': f"{result['created'] + result['updated']} documentos asignados correctamente",
+                **result,
             })
         
         return redirect('documents:client_documents', pk=client.id)
@@ -367,3 +555,99 @@ def assign_documents_to_client(request, client_id):
     }
     
     return render(request, 'client/assign_documents.html', context)
+
+
+@login_required
+@csrf_exempt
+def assign_documents_bulk(request, client_id):
+    """
+    JSON endpoint to assign many documents to a client at once.
+    - Body: {"documents": [ids], "priority": "alta"} and/or
+      {"assignments": [{"document": id, "priority": "baja"}, ...]}.
+    - Applied atomically; returns created/updated/missing counts.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        client = Client.objects.get(id=client_id, customer=request.user)
+    except Client.DoesNotExist:
+        return JsonResponse({'error': 'Cliente no encontrado'}, status=404)
+
+    try:
+        payload = json.loads(request.body)
+        priority = payload.get('priority', 'media')
+        priorities = {doc_id: priority for doc_id in payload.get('documents', [])}
+        for item in payload.get('assignments', []):
+            priorities[item['document']] = item.get('priority', priority)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    return JsonResponse({'success': True, **assign_documents(client, priorities)})
+
+
+OPERATION_KEYS = {'client', 'document', 'priority'}
+
+
+def _priority_operations(request):
+    """
+    Read batch operations from a JSON body ({"operations": [...]}) or a
+    form: `priority` applied to every `items` entry ("client:document")
+    and/or to every `documents` id for the given `client`.
+    - Raises ValueError unless every JSON operation is an object with
+      `client`, `document` and `priority` keys.
+    """
+    if request.content_type == 'application/json':
+        operations = json.loads(request.body)['operations']
+        if not isinstance(operations, list):
+            raise ValueError('operations must be a list')
+        for op in operations:
+            if not isinstance(op, dict) or not OPERATION_KEYS <= op.keys():
+                raise ValueError(f'invalid operation: {op!r}')
+        return operations
+
+    priority = request.POST.get('priority')
+    operations = []
+    for item in request.POST.getlist('items'):
+        client_id, _, document_id = item.partition(':')
+        operations.append({'client': client_id, 'document': document_id, 'priority': priority})
+    client_id = request.POST.get('client')
+    for document_id in request.POST.getlist('documents'):
+        operations.append({'client': client_id, 'document': document_id, 'priority': priority})
+    return operations
+
+
+@login_required
+@csrf_exempt
+def batch_update_priorities(request):
+    """
+    Apply many priority updates/deletions in one request and transaction.
+    - Operations are (client, document, priority) triples where priority
+      "delete" removes the assignment; see `_priority_operations`.
+    - HTMX requests targeting #priorities-container get the filtered
+      priority table back (filters come from the query string); other
+      HTMX requests get a short summary. Plain requests get JSON counts.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        operations = _priority_operations(request)
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    result = apply_priority_operations(request.user, operations)
+
+    if request.headers.get('HX-Request'):
+        if request.headers.get('HX-Target') == 'priorities-container':
+            priorities = filter_priorities(request.user, priority_filters(request.GET))
+            page = keyset_paginate(priorities, keys=("created_at", "id"))
+            return render(request, 'partials/priority_table.html', {
+                'priorities': page.object_list,
+                'priority_summary': priority_summary(request.user),
+                'filter_params': _filter_params(request),
+                'oob_summary': True,
+            })
+        return render(request, 'partials/batch_result.html', {'result': result})
+
+    return JsonResponse({'success': True, **result})
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for the Docker image and `manage.py load_test`.
+
+SERVER_MODE selects the deployment mode:
+- "wsgi" (default): sync workers, one request per worker at a time.
+- "asgi": uvicorn workers running AssembliaChallenge.asgi; async views
+  (analysis, refresh polling, streams) wait on I/O without holding a
+  worker, sync views run in a thread pool.
+"""
+import os
+
+mode = os.getenv("SERVER_MODE", "wsgi")
+if mode == "asgi":
+    wsgi_app = "AssembliaChallenge.asgi:application"
+    # Deprecated in favour of the uvicorn-worker package, still shipped with uvicorn 0.35
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "AssembliaChallenge.wsgi:application"
+    worker_class = "sync"
+
+# Worker count: WEB_CONCURRENCY (read by gunicorn itself), 1 by default
+bind = os.getenv("BIND", "0.0.0.0:8000")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))